@@ -0,0 +1,87 @@
+"""
+benchmark of the official records normalization (names, coordinates and ids)
+row-wise reference implementation vs. columnar implementation on synthetic records
+
+usage: python -m benchmarks.infrastructure [rows]
+"""
+
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.processing.infrastructure import _join, _jam_coords, normalize_official
+
+def synthetic(n = 500_000, seed = 0):
+    # Synthetic raw records with the shape of the Ministry of Health files
+    rng  = np.random.default_rng(seed)
+    lon  = rng.uniform(76, 78, n)
+    lat  = rng.uniform(17, 19, n)
+    text = np.array(["Clinic","Hospital","Health Centre","Posto de Saude"])
+
+    file = pd.DataFrame({"Name"     : rng.choice(text, n),
+                         "MUNICIPIO": rng.choice(text, n),
+                         "PROVINCIA": rng.choice(text, n),
+                         "GeoJSON"  : [f'{{"type":"Point","coordinates":[-{x:.6f},{y:.6f}]}}' for x, y in zip(lon, lat)]})
+
+    infrastructure = pd.DataFrame({"isoalpha3": "JAM",
+                                   "source"   : "Ministry of Health",
+                                   "source_id": rng.integers(0, 10**6, n).astype(object),
+                                   "amenity"  : rng.choice(text, n),
+                                   "name"     : file.Name,
+                                   "lat"      : pd.Series(lat.round(6).astype(str), dtype = object),
+                                   "lon"      : pd.Series((-lon).round(6).astype(str), dtype = object)})
+    infrastructure.loc[::50, "lat"]       = None
+    infrastructure.loc[::3, "source_id"]  = "JAM" + infrastructure.source_id[::3].astype(str)
+
+    return file, infrastructure
+
+def rowwise(file, infrastructure):
+    # Reference implementation (per-row apply)
+    name = file[['Name','MUNICIPIO','PROVINCIA']].apply(lambda x : '{}, {}, {}'.format(x.iloc[0], x.iloc[1], x.iloc[2]), axis = 1)
+    lat  = file.GeoJSON.apply(lambda x: re.findall(r"\d+\.\d+", x)[1]).astype(float)
+    lon  = file.GeoJSON.apply(lambda x: re.findall(r"\d+\.\d+", x)[0]).astype(float) * -1
+
+    infrastructure = infrastructure.copy()
+    infrastructure.lat = infrastructure.lat.apply(pd.to_numeric, errors = 'coerce', downcast = 'float')
+    infrastructure.lon = infrastructure.lon.apply(pd.to_numeric, errors = 'coerce', downcast = 'float')
+    infrastructure = infrastructure[~infrastructure.lat.isna()].copy()
+    infrastructure['source_id'] = infrastructure.apply(
+        lambda row: str(row['isoalpha3']) + str(int(row['source_id'])) if re.match(r'^\d', str(row['source_id'])) else row['source_id'],
+        axis = 1)
+
+    return name, lat, lon, infrastructure
+
+def columnar(file, infrastructure):
+    # Columnar implementation
+    name = _join(['Name','MUNICIPIO','PROVINCIA'])(file)
+    lat  = _jam_coords("lat")(file)
+    lon  = _jam_coords("lon")(file)
+
+    return name, lat, lon, normalize_official(infrastructure)
+
+def timed(function, *args):
+    start  = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    file, infrastructure = synthetic(n)
+
+    # Run implementations
+    reference, t_rowwise  = timed(rowwise, file, infrastructure)
+    result,    t_columnar = timed(columnar, file, infrastructure)
+
+    # Outputs must be identical
+    for a, b in zip(reference[:3], result[:3]):
+        pd.testing.assert_series_equal(a, b, check_dtype = False, check_names = False, check_exact = True)
+    pd.testing.assert_frame_equal(reference[3], result[3], check_dtype = False, check_exact = True)
+
+    print(f"rows     : {n:,}")
+    print(f"row-wise : {t_rowwise:.2f} s")
+    print(f"columnar : {t_columnar:.2f} s")
+    print(f"speedup  : {t_rowwise / t_columnar:.1f}x")
@@ -0,0 +1,84 @@
+"""
+benchmark of the connectivity aggregation (test-weighted speeds and total tests)
+groupby.apply reference implementation vs. vectorized implementation on
+synthetic tiles at admin-2 scale, and the three admin levels in one call
+
+usage: python -m benchmarks.stats [rows] [units]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.statistics.aggregate import weighted_aggregate
+
+LEVELS = [["ADM0_PCODE"],
+          ["ADM0_PCODE","ADM1_PCODE"],
+          ["ADM0_PCODE","ADM1_PCODE","ADM2_PCODE"]]
+
+def synthetic(n = 1_000_000, units = 15_000, seed = 0):
+    # Synthetic tiles joined to admin units (26 countries, ~20 admin-2 units per admin-1)
+    rng  = np.random.default_rng(seed)
+    adm2 = rng.integers(0, units, n)
+    adm1 = adm2 // 20
+    adm0 = adm1 % 26
+
+    data = pd.DataFrame({"ADM0_PCODE": pd.Series(adm0).map("C{:02d}".format),
+                         "ADM1_PCODE": pd.Series(adm1).map("A{:04d}".format),
+                         "ADM2_PCODE": pd.Series(adm2).map("B{:05d}".format),
+                         "avg_d_mbps": rng.gamma(2, 20, n),
+                         "avg_u_mbps": rng.gamma(2, 5, n),
+                         "tests"     : rng.integers(1, 200, n)})
+
+    return data
+
+def reference(data, group_fields):
+    # Reference implementation (groupby.apply and a second groupby for tests)
+    return (
+        data.groupby(group_fields)
+        .apply(
+            lambda x: pd.Series(
+                {"avg_d_mbps_wt": np.average(x["avg_d_mbps"], weights=x["tests"]),
+                "avg_u_mbps_wt": np.average(x["avg_u_mbps"], weights=x["tests"])
+                }
+            )
+        )
+        .reset_index()
+        .merge(
+            data.groupby(group_fields)
+            .agg(tests=("tests", "sum"))
+            .reset_index(),
+            on=group_fields,
+        )
+    )
+
+def vectorized(data, levels):
+    return weighted_aggregate(data, levels, means = ["avg_d_mbps","avg_u_mbps"], weight = "tests", sums = ["tests"])
+
+def timed(function, *args):
+    start  = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    n     = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    units = int(sys.argv[2]) if len(sys.argv) > 2 else 15_000
+    data  = synthetic(n, units)
+
+    # Admin-2 level
+    expected, t_apply      = timed(reference, data, LEVELS[-1])
+    result,   t_vectorized = timed(vectorized, data, LEVELS[-1])
+    pd.testing.assert_frame_equal(expected, result, check_dtype = False, rtol = 1e-12)
+
+    # Every admin level (one groupby.apply per level vs. one rollup)
+    expected, t_apply_all      = timed(lambda : [reference(data, level) for level in LEVELS])
+    result,   t_vectorized_all = timed(vectorized, data, LEVELS)
+    for a, b in zip(expected, result):
+        pd.testing.assert_frame_equal(a, b, check_dtype = False, rtol = 1e-12)
+
+    print(f"rows       : {n:,} ({data.ADM2_PCODE.nunique():,} admin-2 units)")
+    print(f"admin-2    : {t_apply:.2f} s (groupby.apply) vs {t_vectorized:.2f} s (vectorized), {t_apply / t_vectorized:.1f}x")
+    print(f"all levels : {t_apply_all:.2f} s (groupby.apply) vs {t_vectorized_all:.2f} s (rollup), {t_apply_all / t_vectorized_all:.1f}x")
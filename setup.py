@@ -15,7 +15,11 @@ setup(
         'io',
         'matplotlib',
         'numpy',
+        'osmium',
         'pandas',
+        'pyarrow',
+        'pyogrio',
+        'rasterio',
         'requests',
         'shapely',
         'sodapy',
@@ -0,0 +1,93 @@
+"""
+Geospatial Analytics SCL
+    Functions are imported lazily from the sub-packages on first access, 
+    importing `src` does not load third-party libraries or create clients
+"""
+
+import importlib
+
+# Sub-package of each function accessible via 'from src import *'
+_modules = {
+    'get_meta_url'           : '.processing',
+    'get_population'         : '.processing',
+    'get_raster_windows'     : '.processing',
+    'get_population_raster'  : '.processing',
+    'get_amenity_official'   : '.processing',
+    'get_official_country'   : '.processing',
+    'normalize_official'     : '.processing',
+    'get_amenity'            : '.processing',
+    'get_amenity_public'     : '.processing',
+    'refresh_amenity'        : '.processing',
+    'deduplicate_amenity'    : '.processing',
+    'get_facilities'         : '.processing',
+    'get_amenity_osm'        : '.processing',
+    'get_tile_url'           : '.processing',
+    'quadkey_to_tile'        : '.processing',
+    'tile_to_quadkey'        : '.processing',
+    'tile_bounds'            : '.processing',
+    'get_lac_quadkeys'       : '.processing',
+    'get_tiles'              : '.processing',
+    'get_crosswalk'          : '.processing',
+    'join_admin'             : '.processing',
+    'aggregate_tiles'        : '.processing',
+    'update_panel'           : '.processing',
+    'read_panel'             : '.processing',
+    'get_h3_crosswalk'       : '.processing',
+    'aggregate_h3'           : '.processing',
+    'get_desinventar'        : '.processing',
+    'get_emdat'              : '.processing',
+    'get_desastres'          : '.processing',
+    'get_coordinates'        : '.geospatial',
+    'geocode_batch'          : '.geospatial',
+    'get_isochrone'          : '.geospatial',
+    'get_isochrones_country' : '.geospatial',
+    'get_access'             : '.geospatial',
+    'AdminLocator'           : '.geospatial',
+    'Gazetteer'              : '.geospatial',
+    'get_iadb'               : '.utilities',
+    'get_iadb_lookup'        : '.utilities',
+    'get_country_shp'        : '.utilities',
+    'get_boundaries'         : '.utilities',
+    'get_env'                : '.utilities',
+    'get_s3'                 : '.utilities',
+    'get_s3_bucket'          : '.utilities',
+    'get_storage'            : '.utilities',
+    'set_storage'            : '.utilities',
+    'S3Storage'              : '.utilities',
+    'LocalStorage'           : '.utilities',
+    'MemoryStorage'          : '.utilities',
+    'quarter_start'          : '.utilities',
+    'find_best_match'        : '.utilities',
+    'normalize_text'         : '.utilities',
+    'get_cache_dir'          : '.utilities',
+    'get_metadata'           : '.utilities',
+    'extract_metadata'       : '.utilities',
+    'read_defaults'          : '.utilities',
+    'catalog_metadata'       : '.utilities',
+    'get_data_types'         : '.utilities',
+    'check_import_time'      : '.utilities',
+    'calculate_stats'        : '.statistics',
+    'weighted_aggregate'     : '.statistics',
+    'palettes'               : '.statistics',
+    'expand_colors'          : '.statistics',
+    'create_bivariate'       : '.statistics',
+    'project_geometries'     : '.statistics',
+    'rasterize_polygons'     : '.statistics',
+    'bivariate_legend'       : '.statistics',
+    'export_maps'            : '.statistics',
+    'QuantileSketch'         : '.statistics',
+    'iter_parquet'           : '.statistics',
+    'quantile_breaks'        : '.statistics',
+    'classify'               : '.statistics',
+    'bivariate_classes'      : '.statistics'
+}
+
+__all__ = list(_modules)
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return __all__
@@ -1,11 +1,22 @@
-from .coordinates  import get_coordinates
-from .isochrones   import get_isochrone, get_isochrones_country
-from .accesibility import get_access
-
-__all__ = [
-    'get_coordinates',
-    'get_isochrone',
-    'get_isochrones_country',
-    'get_access'
-]
-            
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first access (see `__getattr__`)
+_modules = {
+    'get_coordinates'        : '.coordinates',
+    'geocode_batch'          : '.coordinates',
+    'get_isochrone'          : '.isochrones',
+    'get_isochrones_country' : '.isochrones',
+    'get_access'             : '.accesibility',
+    'AdminLocator'           : '.locator',
+    'Gazetteer'              : '.gazetteer'
+}
+
+__all__ = list(_modules)
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return __all__
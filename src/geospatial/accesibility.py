@@ -1,3 +1,11 @@
+import fiona
+import pandas as pd
+import geopandas as gpd
+from h3 import geo_to_h3, h3_to_geo_boundary
+from shapely.geometry import Polygon
+
+from src.utilities import get_country_shp, get_boundaries
+
 def get_access(code, amenity, profile, minute, group, popgroup = "total_population"):
     # TODO: Generalize function
     """
@@ -41,11 +49,9 @@ def get_access(code, amenity, profile, minute, group, popgroup = "total_populati
     # Inputs 
     #--------------------------------------------------------
         # Shapefile
-    if code in ["BHS","BRB","BLZ","JAM","TTO"]:
-        adm2_shp = get_country_shp(code, level = 1)
-        adm2_shp["ADM2_PCODE"] = adm2_shp.ADM1_PCODE
-    else: 
-        adm2_shp = get_country_shp(code, level = 2)
+    level = 1 if code in ["BHS","BRB","BLZ","JAM","TTO"] else 2
+    adm2_shp = get_country_shp(code, level = level)
+    adm2_shp["ADM2_PCODE"] = adm2_shp[f"ADM{level}_PCODE"]
     
         # Population and isochrones
     with fiona.Env(OGR_GEOJSON_MAX_OBJ_SIZE = 2000):  
@@ -60,12 +66,15 @@ def get_access(code, amenity, profile, minute, group, popgroup = "total_populati
     # Coverage at admin-2 level 
     #--------------------------------------------------------
         # Population in admin-2 level 
-    pop_adm2 = gpd.sjoin(population, adm2_shp)
+        # Note: joins reuse the cached spatial index of the boundaries
+    pop_adm2 = get_boundaries().sjoin(population, code, level)
+    pop_adm2["ADM2_PCODE"] = pop_adm2[f"ADM{level}_PCODE"]
     pop_adm2 = pop_adm2[["ADM2_PCODE","population"]].groupby("ADM2_PCODE").sum().reset_index()
     pop_adm2 = pop_adm2.rename(columns = {"population":"pop_tot"})
     
         # Covered population in admin-2 level
-    pop_adm2_cov = gpd.sjoin(pop_iso, adm2_shp)
+    pop_adm2_cov = get_boundaries().sjoin(pop_iso, code, level)
+    pop_adm2_cov["ADM2_PCODE"] = pop_adm2_cov[f"ADM{level}_PCODE"]
     pop_adm2_cov = pop_adm2_cov[["ADM2_PCODE","population"]].groupby("ADM2_PCODE").sum().reset_index()
     pop_adm2_cov = pop_adm2_cov.rename(columns = {"population":"pop_cov"})
     
@@ -1,3 +1,213 @@
+import time
+import sqlite3
+import urllib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utilities.auxiliary_data import get_iadb_lookup
+from src.utilities.clients import get_env
+from src.utilities.general import get_cache_dir, normalize_text
+from src.geospatial.gazetteer import Gazetteer
+
+# Country names (Spanish) of IADB borrowing members
+# Note: isoalpha3 codes are resolved without reading the IADB country file from the Data Lake
+COUNTRIES = {'ARG':'Argentina','BHS':'Bahamas','BRB':'Barbados','BLZ':'Belice',
+             'BOL':'Bolivia','BRA':'Brasil','CHL':'Chile','COL':'Colombia',
+             'CRI':'Costa Rica','DOM':'República Dominicana','ECU':'Ecuador','SLV':'El Salvador',
+             'GTM':'Guatemala','GUY':'Guyana','HTI':'Haití','HND':'Honduras',
+             'JAM':'Jamaica','MEX':'México','NIC':'Nicaragua','PAN':'Panamá',
+             'PRY':'Paraguay','PER':'Perú','SUR':'Surinam','TTO':'Trinidad y Tabago',
+             'URY':'Uruguay','VEN':'Venezuela'}
+
+def _country(code):
+    # Country name (Spanish) from isoalpha3 code, names are kept as they are
+    return COUNTRIES.get(str(code).upper(), code)
+
+def _iso(code):
+    # Isoalpha3 code from code or country name (names are looked up in the IADB country file)
+    return str(code).upper() if str(code).upper() in COUNTRIES else get_iadb_lookup().code(code)
+
+def _address(address, country):
+    # Address with country name, extra whitespace removed (None for missing addresses)
+    if pd.isna(address) or not str(address).strip():
+        return None
+    address = " ".join(str(address).split())
+
+    return address if country in address else f"{address} {country}"
+
+def _mapbox_url(address, token):
+    # Mapbox geocoding request
+    address = urllib.parse.quote(address.encode('utf-8'))
+
+    return f'https://api.mapbox.com/geocoding/v5/mapbox.places/{address}.json?access_token={token}'
+
+class _RateLimit:
+    # Requests per second shared between threads
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next     = time.monotonic()
+        self.lock     = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now       = time.monotonic()
+            start     = max(now, self.next)
+            self.next = start + self.interval
+        time.sleep(max(0, start - now))
+
+class _GeocodeCache:
+    # Persistent geocoding results (sqlite), addresses without results are also stored
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, lon REAL, lat REAL, relevance REAL, place_name TEXT)")
+
+    def get(self, keys):
+        data = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows  = self.db.execute(f"SELECT * FROM geocode WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            data.update({row[0]: row[1:] for row in rows})
+        return data
+
+    def put(self, rows):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.db.close()
+
+def geocode_batch(addresses, code, max_workers = 8, rate = 10, cache = True, adm2 = None, adm1 = None, retries = 3):
+    """
+    gets the coordinates for a batch of addresses
+    addresses are normalized and deduplicated, results are stored in a
+    persistent cache and only missing addresses are requested, concurrently,
+    under a rate limit and reusing connections; throttled (429) and failed
+    requests are retried with exponential backoff under the same rate limit
+
+    Parameters
+    ----------
+    addresses : list or pandas.Series
+        addresses, including, if possible, admin1, admin2 and country name
+        (missing or empty addresses are not requested)
+    code : str
+        country isoalpha3 code (or country name)
+    max_workers : int, optional
+        number of concurrent requests (default is 8)
+    rate : float, optional
+        maximum requests per second (default is 10)
+    cache : bool, optional
+        use the persistent cache (default is True)
+    adm2 : list or pandas.Series, optional
+        admin-2 names per address (e.g. municipio), addresses without results
+        are located with the offline `Gazetteer`
+    adm1 : list or pandas.Series, optional
+        admin-1 names per address (e.g. provincia)
+    retries : int, optional
+        retries per address after a failed request (default is 3)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with the best match per address (same order and index), including:
+            address   : requested address
+            lon       : longitude
+            lat       : latitude
+            relevance : Mapbox relevance
+            place_name: Mapbox place name
+            precision : `address` for Mapbox results, gazetteer precision otherwise
+        addresses whose requests failed are listed in `data.attrs['failed']`
+    """
+
+    # Inputs
+    token     = get_env("access_token_dp")
+    country   = _country(code)
+    index     = addresses.index if isinstance(addresses, pd.Series) else None
+    addresses = pd.Series([_address(address, country) for address in addresses], index = index, dtype = object)
+
+    # Unique addresses by normalized key
+    keys    = normalize_text(addresses.astype("string"))
+    keys    = pd.Series(keys.to_numpy(dtype = object), index = addresses.index)
+    unique  = addresses.groupby(keys.to_numpy(), sort = False).first()
+
+    # Cached results
+    db      = _GeocodeCache(get_cache_dir("geocoding") / "mapbox.sqlite") if cache else None
+    results = db.get(unique.index) if cache else {}
+    missing = [key for key in unique.index if key not in results]
+
+    # Requests with shared connections (one session per thread)
+    limit   = _RateLimit(rate)
+    local   = threading.local()
+
+    def geocode(key):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.mount("https://", HTTPAdapter(pool_connections = 1, pool_maxsize = 1, max_retries = 0))
+
+        # Note: every attempt waits for the rate limit, backoff never bursts above it
+        for attempt in range(retries + 1):
+            limit.wait()
+            try:
+                response = local.session.get(_mapbox_url(unique[key], token), timeout = 30)
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+            if attempt < retries:
+                time.sleep(0.5 * 2**attempt)
+        response.raise_for_status()
+        response = [j for j in response.json()['features'] if country in j["place_name"]]
+        if len(response) == 0:
+            return (key, None, None, None, None)
+        response = response[0]
+        return (key, response['geometry']['coordinates'][0], response['geometry']['coordinates'][1], response['relevance'], response['place_name'])
+
+    # Note: failed requests are not cached, they are requested again on the next call
+    rows   = []
+    failed = []
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        futures = {pool.submit(geocode, key): key for key in missing}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except (requests.RequestException, ValueError, KeyError):
+                failed.append(futures[future])
+                continue
+            if cache and len(rows) % 500 == 0:
+                db.put(rows[-500:])
+
+    if cache:
+        db.put(rows[len(rows) - len(rows) % 500:])
+        db.close()
+    results.update({row[0]: row[1:] for row in rows})
+    if len(failed) > 0:
+        print(f"Failed requests: {len(failed)} of {len(missing)} addresses (not cached, requested again on the next call)")
+
+    # Results per address
+    data = pd.DataFrame([results.get(key, (None, None, None, None)) for key in keys],
+                        columns = ['lon','lat','relevance','place_name'], index = addresses.index)
+    data.insert(0, 'address', addresses)
+    data[['lon','lat','relevance']] = data[['lon','lat','relevance']].astype(float)
+    data['precision'] = np.where(data.lon.isna(), None, "address")
+
+    # Offline fallback from admin names
+    missing = data.lon.isna().to_numpy()
+    if missing.any() and (adm2 is not None or adm1 is not None):
+        iso    = _iso(code)
+        names  = lambda names : None if names is None else pd.Series(list(names), dtype = object)[missing].tolist()
+        coords = Gazetteer(iso).lookup(names(adm2), names(adm1))
+        data.loc[missing, ['lon','lat','precision']] = coords[['lon','lat','precision']].to_numpy()
+    data.attrs['failed'] = unique[failed].tolist()
+
+    return data
+
 def get_coordinates(address, code):
     """
     gets the coordinates for address
@@ -6,6 +216,8 @@ def get_coordinates(address, code):
     ----------
     address : str
         address, including, if possible, admin1, admin2 and country name
+    code : str
+        country isoalpha3 code (or country name)
     
     Returns
     ----------
@@ -13,29 +225,10 @@ def get_coordinates(address, code):
         list of possible coordinates [longitude,latitude]
     """    
     # Inputs
-    token   = os.environ.get("access_token_dp")
-    country = get_iadb()
-    country = country[country.isoalpha3 == code].country_name_es.tolist()[0]
-    address = address if country in address else f"{address} {country}"
-    address = urllib.parse.quote(address.encode('utf-8')) 
-    url     = f'https://api.mapbox.com/geocoding/v5/mapbox.places/{address}.json?access_token={token}'
-    
-    # Request
-    try: 
-        response = requests.get(url).json()
-        response = response['features']
-        response = [j for j in response if country in j["place_name"]]
-    except: 
-        response = []
-        
-    return response
-
-def get_coordinates(address, country):
-   
-    # Inputs
-    token   = os.environ.get("access_token_dp")
-    address = urllib.parse.quote(address.encode('utf-8')) 
-    url     = f'https://api.mapbox.com/geocoding/v5/mapbox.places/{address}.json?access_token={token}'
+    # Note: country names come from the memoized lookup, no S3 reads per address
+    token   = get_env("access_token_dp")
+    country = _country(code)
+    url     = _mapbox_url(_address(address, country), token)
     
     # Request
     try: 
@@ -47,49 +240,31 @@ def get_coordinates(address, country):
         
     return response
 
+# Example: geocoding Bogota's REPS registry
+if __name__ == "__main__":
+    col = pd.read_csv('../../32-IDB Atlas/raw/infrastructure/COL/reps.csv')
+    col = col.drop_duplicates()
+    col = col[col.MunicipioPrestador == 11001]
+    col.CodigoHabilitacionSede = col.CodigoHabilitacionSede.apply(lambda x: str(x).replace(' ',''))
+    col.CodigoHabilitacionSede = col.CodigoHabilitacionSede.astype(int)
+    col['is_duplicate_sede']   = col.duplicated(subset=['CodigoPrestador','DireccionSede'], keep = 'first').astype(int)
+    col['is_duplicate_pres']   = col.duplicated(subset=['CodigoPrestador','DireccionPrestador'], keep = 'first').astype(int)
 
+    col = col[col.is_duplicate_sede == 0]
+    col = col[col.ClasePrestadorDesc == 'Instituciones Prestadoras de Servicios de Salud - IPS']
 
-col = pd.read_csv('../../32-IDB Atlas/raw/infrastructure/COL/reps.csv')
-col = col.drop_duplicates()
-col = col[col.MunicipioPrestador == 11001]
-col.CodigoHabilitacionSede = col.CodigoHabilitacionSede.apply(lambda x: str(x).replace(' ',''))
-col.CodigoHabilitacionSede = col.CodigoHabilitacionSede.astype(int)
-col['is_duplicate_sede']   = col.duplicated(subset=['CodigoPrestador','DireccionSede'], keep = 'first').astype(int)
-col['is_duplicate_pres']   = col.duplicated(subset=['CodigoPrestador','DireccionPrestador'], keep = 'first').astype(int)
-
-col = col[col.is_duplicate_sede == 0]
-col = col[col.ClasePrestadorDesc == 'Instituciones Prestadoras de Servicios de Salud - IPS']
-
-col = col[['MunicipioPrestador','CodigoPrestador','NombrePrestador','DireccionPrestador','ClasePrestadorDesc','CodigoHabilitacionSede','NombreSede','DireccionSede']]
-col = col[~col.DireccionSede.isna()]
-
-relevance,lon,lat = [],[],[]
-for i in range(0,len(col)):
-    print(i)
-    address1 = f"{col.iloc[i].DireccionSede}, BOGOTA D.C."
-    response = get_coordinates(address1,"Colombia")
-    
-    if len(response) > 0:
-        response = response[0]
-        relevance.append(response['relevance'])
-        lon      .append(response['geometry']['coordinates'][0])
-        lat      .append(response['geometry']['coordinates'][1])
-    
-    else:
-        relevance.append('')
-        lon      .append('')
-        lat      .append('')
-
-col['mapbox_relevance'] = relevance
-col['lon']       = lon
-col['lat']       = lat
-col['lon'] = np.where(col['lon'] == '', np.nan, col['lon'])
-col['lat'] = np.where(col['lat'] == '', np.nan, col['lat'])
-col['is_duplicated'] = col.duplicated(subset = ['lon','lat'])
+    col = col[['MunicipioPrestador','CodigoPrestador','NombrePrestador','DireccionPrestador','ClasePrestadorDesc','CodigoHabilitacionSede','NombreSede','DireccionSede']]
+    col = col[~col.DireccionSede.isna()]
 
-geom  = gpd.points_from_xy(col['lon'], col['lat'])
-col = gpd.GeoDataFrame(col.copy(), geometry = geom)
+    # Geocode addresses (repeated addresses are requested once)
+    coords = geocode_batch(col.DireccionSede + ", BOGOTA D.C.", "Colombia")
 
-col.to_csv('../../32-IDB Atlas/raw/infrastructure/COL/bogota-reps.csv', index = False)
+    col['mapbox_relevance'] = coords.relevance
+    col['lon']              = coords.lon
+    col['lat']              = coords.lat
+    col['is_duplicated']    = col.duplicated(subset = ['lon','lat'])
 
+    geom = gpd.points_from_xy(col['lon'], col['lat'])
+    col  = gpd.GeoDataFrame(col.copy(), geometry = geom)
 
+    col.to_csv('../../32-IDB Atlas/raw/infrastructure/COL/bogota-reps.csv', index = False)
\ No newline at end of file
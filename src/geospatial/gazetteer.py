@@ -0,0 +1,194 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from src.utilities.boundaries import NO_ADM2, get_boundaries
+from src.utilities.general import normalize_text
+
+def _normalize(names):
+    # Names without accents, punctuation and extra whitespace
+    names = normalize_text(pd.Series(names, dtype = "string").fillna(""))
+
+    return names.str.replace(r"[^a-z0-9]+", " ", regex = True).str.strip().tolist()
+
+def _trigrams(name):
+    # Character trigrams of a name
+    name = f" {name} "
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+class Gazetteer:
+    """
+    offline geocoder for admin-1 and admin-2 names (e.g. municipio, provincia)
+    names come from the admin boundaries (every ADM1_xx/ADM2_xx name column),
+    normalized with `normalize_text`; lookups are exact, then fuzzy through a
+    character trigram index (Dice coefficient)
+    admin-2 names are searched within the matched admin-1 unit when it is given,
+    units are located at a representative point (always inside the unit), or
+    at their population-weighted centroid if `population` is given
+
+    Parameters
+    ----------
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    population : geopandas.GeoDataFrame, optional
+        population points or polygons (EPSG:4326) with a `population` column,
+        e.g. population hexagons (default is the admin units centroids)
+    threshold : float, optional
+        minimum fuzzy similarity between 0 and 1 (default is 0.75)
+    """
+
+    def __init__(self, code = "", population = None, threshold = 0.75):
+        self.threshold = threshold
+        repo = get_boundaries()
+
+        # Admin units
+        # Note: countries without admin-2 boundaries (see `NO_ADM2`) are searched at admin-1 only
+        units = []
+        for level in [1] if code.upper() in NO_ADM2 else [1, 2]:
+            shp  = repo.get(code, level = level)
+            cols = [col for col in shp.columns if re.match(rf"^ADM{level}(_|ALT\d+)[A-Z]{{2}}$", col)]
+            unit = pd.DataFrame({"level"     : level,
+                                 "pcode"     : shp[f"ADM{level}_PCODE"],
+                                 "parent"    : shp.ADM1_PCODE if level == 2 else shp.ADM0_PCODE,
+                                 "isoalpha3" : shp.ADM0_PCODE})
+
+            # Location: representative centroid inside the unit, or population-weighted centroid
+            point = shapely.point_on_surface(np.asarray(shp.geometry.values))
+            unit["lon"], unit["lat"] = shapely.get_x(point), shapely.get_y(point)
+            unit["weighted"] = False
+            if population is not None:
+                unit = self._weighted(unit, shp, population, code, level)
+
+            # Name variants (e.g. ADM2_ES, ADM2_EN, ADM2ALT1ES)
+            names = [_normalize(shp[col]) for col in cols]
+            unit["names"] = [list(dict.fromkeys(name for name in row if name)) for row in zip(*names)] if names else [[]] * len(shp)
+            units.append(unit)
+
+        self.units  = pd.concat(units, ignore_index = True)
+        self.level  = self.units.level.to_numpy()
+        self.parent = self.units.parent.to_numpy()
+        self.pcode  = self.units.pcode.to_numpy()
+
+        # Exact and trigram indexes: name -> unit positions, trigram -> names
+        self.exact   = defaultdict(list)
+        self.grams   = defaultdict(set)
+        self.ngrams  = {}
+        for pos, names in enumerate(self.units.names):
+            for name in names:
+                self.exact[name].append(pos)
+        for name in self.exact:
+            grams = _trigrams(name)
+            self.ngrams[name] = len(grams)
+            for gram in grams:
+                self.grams[gram].add(name)
+
+    def _weighted(self, unit, shp, population, code, level):
+        # Population-weighted centroid per admin unit
+        points = population.copy()
+        points["geometry"] = points.geometry.representative_point()
+        points = get_boundaries().sjoin(points, code, level)
+        points = points[points.population > 0]
+
+        x = points.geometry.x * points.population
+        y = points.geometry.y * points.population
+        sums = pd.DataFrame({"x": x, "y": y, "w": points.population, "pcode": points[f"ADM{level}_PCODE"]}).groupby("pcode").sum()
+        sums = sums.reindex(unit.pcode)
+
+        found = sums.w.to_numpy() > 0
+        unit.loc[found, "lon"]      = (sums.x / sums.w).to_numpy()[found]
+        unit.loc[found, "lat"]      = (sums.y / sums.w).to_numpy()[found]
+        unit.loc[found, "weighted"] = True
+
+        return unit
+
+    def _fuzzy(self, name):
+        # Best names by trigram Dice coefficient
+        grams  = _trigrams(name)
+        counts = defaultdict(int)
+        for gram in grams:
+            for candidate in self.grams.get(gram, ()):
+                counts[candidate] += 1
+        scores = {candidate: 2 * count / (len(grams) + self.ngrams[candidate]) for candidate, count in counts.items()}
+        scores = {candidate: score for candidate, score in scores.items() if score >= self.threshold}
+
+        return sorted(scores.items(), key = lambda item : -item[1])
+
+    def _match(self, name, level, parent = None):
+        # Unit position and score for a name (exact first, then fuzzy)
+        if not name:
+            return -1, np.nan
+        matches = [(name, 1.0)] if name in self.exact else self._fuzzy(name)
+        for candidate, score in matches:
+            pos = [pos for pos in self.exact[candidate]
+                   if self.level[pos] == level and (parent is None or self.parent[pos] == parent)]
+            if len(pos) > 0:
+                return pos[0], score
+
+        return -1, np.nan
+
+    def lookup(self, adm2 = None, adm1 = None):
+        """
+        locates admin names
+
+        Parameters
+        ----------
+        adm2 : list or pandas.Series, optional
+            admin-2 names (e.g. municipio)
+        adm1 : list or pandas.Series, optional
+            admin-1 names (e.g. provincia, departamento)
+
+        Returns
+        ----------
+        pandas.DataFrame
+            dataframe with one row per name (same order), including:
+                pcode    : matched admin code
+                lon      : longitude
+                lat      : latitude
+                score    : name similarity (1 for exact matches)
+                precision: location precision, including:
+                               adm2-population: admin-2 population-weighted centroid
+                               adm2           : admin-2 centroid
+                               adm1-population: admin-1 population-weighted centroid
+                               adm1           : admin-1 centroid
+                               None           : no match
+        """
+
+        # Inputs
+        n    = len(adm2) if adm2 is not None else len(adm1)
+        adm2 = _normalize(adm2) if adm2 is not None else [""] * n
+        adm1 = _normalize(adm1) if adm1 is not None else [""] * n
+
+        # Unique pairs of names
+        pairs, inverse = np.unique(np.array([f"{a1}|{a2}" for a1, a2 in zip(adm1, adm2)], dtype = object), return_inverse = True)
+        pos   = np.full(len(pairs), -1, dtype = "int64")
+        score = np.full(len(pairs), np.nan)
+
+        for i, pair in enumerate(pairs):
+            a1, a2 = pair.split("|", 1)
+            pos1, score1 = self._match(a1, 1)
+            parent = self.pcode[pos1] if pos1 >= 0 else None
+            pos2, score2 = self._match(a2, 2, parent)
+
+            # Admin-2 match, or admin-1 if the admin-2 name is missing or unknown
+            if pos2 >= 0:
+                pos[i], score[i] = pos2, score2
+            elif pos1 >= 0:
+                pos[i], score[i] = pos1, score1
+
+        # Results
+        pos   = pos[inverse.ravel()]
+        units = self.units.iloc[np.where(pos >= 0, pos, 0)].reset_index(drop = True)
+        found = pos >= 0
+
+        precision = np.where(units.level == 2, "adm2", "adm1").astype(object)
+        precision = np.where(units.weighted, precision + "-population", precision)
+        data = pd.DataFrame({"pcode"    : np.where(found, units.pcode, None),
+                             "lon"      : np.where(found, units.lon, np.nan),
+                             "lat"      : np.where(found, units.lat, np.nan),
+                             "score"    : score[inverse.ravel()],
+                             "precision": np.where(found, precision, None)})
+
+        return data
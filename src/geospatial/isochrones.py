@@ -1,3 +1,9 @@
+import pandas as pd
+import geopandas as gpd
+import requests
+
+from src.utilities.clients import get_env
+
 def get_isochrone(lon, lat, minute, profile, generalize = 500):
     """
     calculates the individual isochrones based on lat-lon
@@ -25,7 +31,7 @@ def get_isochrone(lon, lat, minute, profile, generalize = 500):
     """
     
     # Define url 
-    token = os.environ.get("access_token_dp")
+    token = get_env("access_token_dp")
     url   = "https://api.mapbox.com/isochrone/v1/mapbox/"
     url   = f'{url}{profile}/{lon},{lat}?contours_minutes={minute}&generalize={generalize}&polygons=true&access_token={token}'
     
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+from src.utilities.boundaries import get_boundaries
+
+class AdminLocator:
+    """
+    locates points in the admin hierarchy (ADM0/ADM1/ADM2) in one call
+    interior points are resolved with a coarse lookup grid, the remaining
+    points are tested against ADM1 and then only against the ADM2 children
+    of the matched ADM1 (pcode hierarchy)
+    admin-1 units without admin-2 boundaries (e.g. BHS, BRB, BLZ, JAM, TTO)
+    use the admin-1 code as admin-2 code
+
+    Parameters
+    ----------
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    cell : float, optional
+        lookup grid cell size in degrees (default is 0.05)
+    """
+
+    def __init__(self, code = "", cell = 0.05):
+        self.cell = cell
+
+        # Admin boundaries
+        repo = get_boundaries()
+        # Note: admin-1 units without admin-2 boundaries are their own children (see `units`)
+        adm1    = repo.get(code, level = 1)
+        adm2, _ = repo.units(code)
+
+        # Codes and geometries
+        # Note: admin-2 units must have a parent in the admin-1 layer
+        parent = pd.Index(adm1.ADM1_PCODE).get_indexer(adm2.ADM1_PCODE)
+        adm2   = adm2[parent >= 0].reset_index(drop = True)
+
+        self.adm0_code   = adm1.ADM0_PCODE.to_numpy()
+        self.adm1_code   = adm1.ADM1_PCODE.to_numpy()
+        self.adm2_code   = adm2.ADM2_PCODE.to_numpy()
+        self.adm2_parent = parent[parent >= 0]
+        self.adm1_geom   = np.asarray(adm1.geometry.values)
+        self.adm2_geom   = np.asarray(adm2.geometry.values)
+
+        # Spatial indexes
+        self.adm1_tree = STRtree(self.adm1_geom)
+        self.adm2_tree = STRtree(self.adm2_geom)
+        self.children  = {}
+
+        # Lookup grid: cell id -> admin-2 position (-1 for cells near boundaries)
+        self.grid = {}
+
+    def _cells(self, lon, lat):
+        # Cell ids (positive integers) for coordinates
+        ix = np.floor((lon + 180) / self.cell).astype("int64")
+        iy = np.floor((lat +  90) / self.cell).astype("int64")
+
+        return ix * 2**32 + iy
+
+    def _classify(self, cells):
+        # Cells fully inside a single admin-2 unit
+        ix = (cells // 2**32) * self.cell - 180
+        iy = (cells %  2**32) * self.cell -  90
+        boxes = shapely.box(ix, iy, ix + self.cell, iy + self.cell)
+
+        cls = np.full(len(cells), -1, dtype = "int64")
+        idx, jdx = self.adm2_tree.query(boxes, predicate = "within")
+        cls[idx] = jdx
+
+        self.grid.update(zip(cells.tolist(), cls.tolist()))
+
+    def _children(self, i):
+        # Admin-2 positions and index for children of admin-1 unit
+        if i not in self.children:
+            pos = np.flatnonzero(self.adm2_parent == i)
+            self.children[i] = (pos, STRtree(self.adm2_geom[pos]))
+
+        return self.children[i]
+
+    def locate(self, lon, lat):
+        """
+        gets the admin codes for coordinates
+
+        Parameters
+        ----------
+        lon : array-like
+            longitudes (EPSG:4326)
+        lat : array-like
+            latitudes (EPSG:4326)
+
+        Returns
+        ----------
+        pandas.DataFrame
+            dataframe with ADM0_PCODE, ADM1_PCODE and ADM2_PCODE per point
+            (missing if the point is outside the boundaries)
+        """
+
+        lon = np.asarray(lon, dtype = "float64")
+        lat = np.asarray(lat, dtype = "float64")
+        pos1 = np.full(len(lon), -1, dtype = "int64")
+        pos2 = np.full(len(lon), -1, dtype = "int64")
+
+        # Interior points from lookup grid
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        cells, inverse = np.unique(self._cells(lon[valid], lat[valid]), return_inverse = True)
+        new = np.array([cell for cell in cells.tolist() if cell not in self.grid], dtype = "int64")
+        if len(new) > 0:
+            self._classify(new)
+
+        cls = np.array([self.grid[cell] for cell in cells.tolist()], dtype = "int64")
+        pos2[valid] = cls[inverse]
+        pos1[pos2 >= 0] = self.adm2_parent[pos2[pos2 >= 0]]
+
+        # Points near boundaries: admin-1 first, then its admin-2 children
+        near   = np.flatnonzero(valid & (pos2 < 0))
+        points = shapely.points(lon[near], lat[near])
+        idx, jdx = self.adm1_tree.query(points, predicate = "intersects")
+        idx, first = np.unique(idx, return_index = True)
+        parent = jdx[first]
+        pos1[near[idx]] = parent
+
+        for i in np.unique(parent):
+            sel = idx[parent == i]
+            children, tree = self._children(i)
+            kdx, ldx = tree.query(points[sel], predicate = "intersects")
+            kdx, first = np.unique(kdx, return_index = True)
+            pos2[near[sel[kdx]]] = children[ldx[first]]
+
+        # Admin codes
+        data = pd.DataFrame({"ADM0_PCODE": _take(self.adm0_code, pos1),
+                             "ADM1_PCODE": _take(self.adm1_code, pos1),
+                             "ADM2_PCODE": _take(self.adm2_code, pos2)})
+
+        return data
+
+    def join(self, points):
+        """
+        adds the admin codes to a points geo dataframe
+
+        Parameters
+        ----------
+        points : geopandas.GeoDataFrame
+            point geometries (EPSG:4326)
+
+        Returns
+        ----------
+        geopandas.GeoDataFrame
+            points with ADM0_PCODE, ADM1_PCODE and ADM2_PCODE
+        """
+
+        codes = self.locate(points.geometry.x, points.geometry.y)
+        codes.index = points.index
+
+        return points.join(codes)
+
+def _take(codes, pos):
+    # Codes by position, missing for negative positions
+    data = np.full(len(pos), None, dtype = object)
+    data[pos >= 0] = codes[pos[pos >= 0]]
+
+    return data
@@ -1,83 +1,102 @@
 """
 Import libraries
-    Standard
-    Thrid-party 
     Local modules
         Initialize the `src` package
+        Functions, clients and environment variables are loaded on first access,
+        importing this module does not load third-party libraries
 """
 
-# Standard 
-import io
-import os
-import re
-import time
-from datetime import datetime
-import urllib
-
-# AWS and environment
-import boto3
-import dotenv
-
-# Data management and processing
-import numpy as np
-import pandas as pd
-import geopandas as gpd
-from sodapy import Socrata
-
-# Web scraping and requests
-import requests
-from bs4 import BeautifulSoup
-
-# Geospatial 
-import fiona
-import rasterio
-from geopandas.tools import sjoin
-from shapely.geometry import Polygon
-from h3 import geo_to_h3, h3_to_geo_boundary
-
-# Visualization
-import matplotlib.pyplot as plt
-
 # Local Application/Library Imports
-from src.processing import *
-from src.geospatial import *
-from src.utilities  import *
-from src.statistics import *
+import src
+from src.utilities.clients import get_env, get_s3, get_s3_bucket
 
-# Working environments
-dotenv.load_dotenv()
-dotenv.load_dotenv("/Users/lauragoyeneche/Google Drive/My Drive/02-Work/10-IDB Consultant/1-Social Protection & Health/32-IDB Atlas/src/.env")
-sclbucket   = os.environ.get("sclbucket")
-scldatalake = os.environ.get("scldatalake")
+# Working environments, resources and buckets (created on first access)
+_resources = {
+    'sclbucket'  : lambda: get_env("sclbucket"),
+    'scldatalake': lambda: get_env("scldatalake"),
+    's3'         : get_s3,
+    's3_bucket'  : get_s3_bucket
+}
 
-# Resources and buckets
-s3  = boto3.client('s3')
-s3_ = boto3.resource("s3")
-s3_bucket = s3_.Bucket(sclbucket)
+def __getattr__(name):
+    if name in _resources:
+        return _resources[name]()
+    if name in src.__all__:
+        return getattr(src, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Define funcionts accessible via 'from src import *'
 __all__ = [
     'get_iadb',
+    'get_iadb_lookup',
     'get_country_shp',
+    'get_boundaries',
+    'get_env',
+    'get_s3',
+    'get_s3_bucket',
+    'get_storage',
+    'set_storage',
+    'S3Storage',
+    'LocalStorage',
+    'MemoryStorage',
     'get_meta_url',
     'get_population',
+    'get_raster_windows',
+    'get_population_raster',
     'get_coordinates',
+    'geocode_batch',
     'get_isochrone',
     'get_isochrones_country',
     'get_tile_url',
+    'quadkey_to_tile',
+    'tile_to_quadkey',
+    'tile_bounds',
+    'get_lac_quadkeys',
+    'get_tiles',
+    'get_crosswalk',
+    'join_admin',
+    'aggregate_tiles',
+    'update_panel',
+    'read_panel',
+    'get_h3_crosswalk',
+    'aggregate_h3',
     'get_amenity_official',
+    'get_official_country',
+    'normalize_official',
     'get_amenity',
+    'get_amenity_public',
+    'refresh_amenity',
+    'deduplicate_amenity',
+    'get_facilities',
+    'get_amenity_osm',
     'get_access',
+    'AdminLocator',
+    'Gazetteer',
     'quarter_start',
     'find_best_match',
     'calculate_stats',
+    'weighted_aggregate',
     'palettes',
     'expand_colors',
     'create_bivariate',
+    'project_geometries',
+    'rasterize_polygons',
+    'bivariate_legend',
+    'export_maps',
+    'QuantileSketch',
+    'iter_parquet',
+    'quantile_breaks',
+    'classify',
+    'bivariate_classes',
     'get_desinventar',
     'get_emdat',
     'get_desastres',
     'normalize_text',
+    'get_cache_dir',
+    'check_import_time',
     'get_metadata',
+    'extract_metadata',
+    'read_defaults',
+    'catalog_metadata',
     'get_data_types'
 ]
@@ -1,17 +1,44 @@
-from .population     import get_population, get_meta_url
-from .infrastructure import get_amenity_official, get_amenity
-from .connectivity   import get_tile_url
-from .nat_disasters  import get_desinventar, get_emdat, get_desastres
-#from .ecosystems     import 
+import importlib
 
-__all__ = [
-    'get_meta_url',
-    'get_population',
-    'get_amenity_official',
-    'get_amenity',
-    'get_tile_url',
-    'get_desinventar',
-    'get_emdat',
-    'get_desastres'
-]
-            
\ No newline at end of file
+# Submodules are imported on first access (see `__getattr__`)
+_modules = {
+    'get_meta_url'          : '.population',
+    'get_population'        : '.population',
+    'get_raster_windows'    : '.population',
+    'get_population_raster' : '.population',
+    'get_amenity_official'  : '.infrastructure',
+    'get_official_country'  : '.infrastructure',
+    'normalize_official'    : '.infrastructure',
+    'get_amenity'           : '.infrastructure',
+    'get_amenity_public'    : '.infrastructure',
+    'refresh_amenity'       : '.infrastructure',
+    'deduplicate_amenity'   : '.infrastructure',
+    'get_facilities'        : '.infrastructure',
+    'get_amenity_osm'       : '.infrastructure',
+    'get_tile_url'          : '.connectivity',
+    'quadkey_to_tile'       : '.tiles',
+    'tile_to_quadkey'       : '.tiles',
+    'tile_bounds'           : '.tiles',
+    'get_lac_quadkeys'      : '.tiles',
+    'get_tiles'             : '.tiles',
+    'get_crosswalk'         : '.tiles',
+    'join_admin'            : '.tiles',
+    'aggregate_tiles'       : '.tiles',
+    'update_panel'          : '.tiles',
+    'read_panel'            : '.tiles',
+    'get_h3_crosswalk'      : '.tiles',
+    'aggregate_h3'          : '.tiles',
+    'get_desinventar'       : '.nat_disasters',
+    'get_emdat'             : '.nat_disasters',
+    'get_desastres'         : '.nat_disasters'
+}
+
+__all__ = list(_modules)
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return __all__
@@ -1,3 +1,5 @@
+from src.utilities.general import quarter_start
+
 def get_tile_url(service: str, year: int, q: int) -> str:
     """
     returns the URL of a tile
@@ -22,4 +24,4 @@ def get_tile_url(service: str, year: int, q: int) -> str:
     base_url = "https://ookla-open-data.s3-us-west-2.amazonaws.com/shapefiles/performance"
     url      = f"{base_url}/type%3D{service}/year%3D{dt:%Y}/quarter%3D{q}/{dt:%Y-%m-%d}_performance_{service}_tiles.zip"
     
-    return url 
\ No newline at end of file
+    return url
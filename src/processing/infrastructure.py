@@ -1,492 +1,636 @@
-def get_amenity_official(amenity, official):
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from src.utilities import get_iadb, get_storage, get_cache_dir, normalize_text, get_boundaries
+
+# Official records
+#------------------------------------------------------------
+# Note: normalization is columnar (vectorized string operations), raw tables
+# can have hundreds of thousands of records
+def _join(cols, sep = ", ", title = False):
+    # Name built from several columns (e.g. facility, municipality, province)
+    # missing values are written as `nan`, as in `str.format`
+    def join(file):
+        values = [file[col].astype(str) for col in cols]
+        if title:
+            values = [value.str.title() for value in values]
+        return values[0].str.cat(values[1:], sep = sep, na_rep = "nan")
+
+    return join
+
+def _jam_coords(axis):
+    # Jamaica's coordinates are stored as GeoJSON text (west longitudes without sign)
+    # first and second decimal numbers are longitude and latitude
+    def coords(file):
+        coords = file.GeoJSON.str.extract(r"(\d+\.\d+).*?(\d+\.\d+)").astype(float)
+        return coords[1] if axis == "lat" else coords[0] * -1
+
+    return coords
+
+def _to_numeric(values):
+    # Same values as the element-wise `pd.to_numeric(x, errors = 'coerce', downcast = 'float')`
+    # text is parsed with float32 precision, numbers are kept as they are
+    numbers = pd.to_numeric(values, errors = 'coerce')
+    if pd.api.types.is_numeric_dtype(values):
+        return numbers
+
+    text    = values.map(type).eq(str).to_numpy()
+    numbers = numbers.astype("float64")
+    numbers[text] = numbers[text].astype("float32").astype("float64")
+
+    return numbers
+
+def _source_id(infrastructure):
+    # Add country code to numeric source ids (e.g. 123 -> BRA123)
+    source_id = infrastructure.source_id.astype(str)
+    numeric   = source_id.str.match(r'^\d').fillna(False).to_numpy(dtype = bool)
+
+    data = infrastructure.source_id.astype(object).copy()
+    if numeric.any():
+        number = pd.to_numeric(source_id[numeric]).astype("int64").astype(str)
+        data[numeric] = (infrastructure.isoalpha3[numeric].astype(str) + number).to_numpy()
+
+    return data
+
+def normalize_official(infrastructure):
     """
-    process official records by country
-    each country's raw data is different, preprocessing is done individually
-    
+    normalizes official records (coordinates and ids), vectorized over columns
+
+    Parameters
+    ----------
+    infrastructure : pandas.DataFrame
+        dataframe with isoalpha3, source, source_id, amenity, name, lat and lon
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with numeric coordinates, records without coordinates are
+        removed and numeric ids are prefixed with the country code
+    """
+
+    # Convert lat-lon to numeric
+    infrastructure = infrastructure.copy()
+    infrastructure.lat = _to_numeric(infrastructure.lat)
+    infrastructure.lon = _to_numeric(infrastructure.lon)
+
+    # Remove NAs
+    infrastructure = infrastructure[~infrastructure.lat.isna()].copy()
+
+    # Add country code to soure_id
+    infrastructure['source_id'] = _source_id(infrastructure)
+
+    return infrastructure
+
+# Amenities name (Brazil's CNES)
+UNID_NAME = {1 :"Posto de Saude",
+             2 :"Centro de Saude/Unidade Basica",
+             4 :"Policlinica",
+             5 :"Hospital Geral",
+             7 :"Hospital Especializado",
+             15:"Unidade Mista",
+             20:"Pronto Socorro General",
+             21:"Pronto Socorro Especializado",
+             36:"Clinica/Centro de Especialidade",
+             61:"Centro de Parto Normal - Isolado",
+             62:"Hospital/Dia - Isolado",
+             69:"Centro de Atencao Hemoterapica E Ou Hematologica",
+             70:"Centro de Atencao Psicossocial",
+             71:"Centro de Apoio a Saude da Familia",
+             72:"Unidade de Atencao a Saude Indigena",
+             73:"Pronto Atendimento",
+             83:"Polo de Prevencao de Doencas e Agravos e Promocao da Saude",
+             85:"Centro de Imunizacao"}
+
+# Amenities name (Peru's RENAES categories)
+PER_CARE = dict(zip(['I-1','I-2','I-3','I-4','II-1','II-2','II-E','III-1','III-2','III-E','SD'],
+                    ["Primary care"] * 4 + ["Secondary care"] * 3 + ["Tertiary care"] * 3 + [""]))
+
+# Official sources by amenity and country
+# Each source is described by:
+#     pattern : text in the file name (and extension `ext` if several formats are stored)
+#     multiple: all matching files are processed (otherwise the first one)
+#     reader  : file reader (csv, excel or shp) and its `options`
+#     filter  : rows of interest
+#     source  : source name (default is Ministry of Health)
+#     id      : column with the facility id, or `sequential` for generated ids
+#     columns : output variables from a column name or a function of the raw table
+OFFICIAL_SOURCES = {
+    "Healthcare": {
+        "ARG": {"pattern": "ARG",
+                "reader" : "csv",
+                "filter" : lambda file : ~file.tipologia_id.isin([53,80]),
+                "id"     : "sequential",
+                "columns": {"amenity": "tipologia_sigla",
+                            "name"   : "establecimiento_nombre",
+                            "lat"    : "y",
+                            "lon"    : "x"}},
+        "BOL": {"pattern" : "BOL",
+                "ext"     : ".shp",
+                "multiple": True,
+                "reader"  : "shp",
+                "id"      : "sequential",
+                "columns" : {"amenity": lambda file : file.CLASE.str.lower(),
+                             "name"   : _join(['Name','MUNICIPIO','PROVINCIA']),
+                             "lat"    : "LATITUD",
+                             "lon"    : "LONGITUD"}},
+        "BRA": {"pattern": "BRA",
+                "reader" : "csv",
+                "options": {"sep": ";", "encoding": "unicode_escape"},
+                "filter" : lambda file : file.TP_UNIDADE.isin(list(UNID_NAME)),
+                "id"     : "CO_CNES",
+                "columns": {"amenity": lambda file : file.TP_UNIDADE.replace(UNID_NAME),
+                            "name"   : "NO_FANTASIA",
+                            "lat"    : "NU_LATITUDE",
+                            "lon"    : "NU_LONGITUDE"}},
+        "CHL": {"pattern": "CHL",
+                "ext"    : ".shp",
+                "reader" : "shp",
+                "id"     : "C_VIG",
+                "columns": {"amenity": "TIPO",
+                            "name"   : "NOMBRE",
+                            "lat"    : "LATITUD",
+                            "lon"    : "LONGITUD"}},
+        "COL": {"pattern": "COL",
+                "reader" : "csv",
+                "options": {"encoding": "unicode_escape"},
+                "filter" : lambda file : ~file["latitute"].isna(),
+                "source" : "Ministry of Health REPS",
+                "id"     : "codigohabilitacionsede",
+                "columns": {"amenity": lambda file : "IPS",
+                            "name"   : "nombresede",
+                            "lat"    : "latitute",
+                            "lon"    : "longitude"}},
+        "DOM": {"pattern": "DOM",
+                "reader" : "csv",
+                "options": {"sep": ";", "encoding": "latin1"},
+                "id"     : "sequential",
+                "columns": {"amenity": "TIPO DE CENTRO",
+                            "name"   : _join(['NOMBRE DEL ESTABLECIMIENTO','MUNICIPIO','PROVINCIA']),
+                            "lat"    : lambda file : file.COORDENADAS.str.split(',', expand = True)[0],
+                            "lon"    : lambda file : file.COORDENADAS.str.split(',', expand = True)[1]}},
+        "ECU": {"pattern": "ECU",
+                "reader" : "csv",
+                "filter" : lambda file : file["nivel de atencion"].isin(["NIVEL 1","NIVEL 2","NIVEL 3"]),
+                "id"     : "unicodigo",
+                "columns": {"amenity": "tipologia",
+                            "name"   : "nombre oficial",
+                            "lat"    : "y",
+                            "lon"    : "x"}},
+        "GTM": {"pattern": "GTM",
+                "reader" : "csv",
+                "filter" : lambda file : file.tipo_serv.isin(["CENTRO CONVERGENCIA",
+                                                              "PUESTO DE SALUD",
+                                                              "CENTRO DE SALUD",
+                                                              "HOSPITAL",
+                                                              "CENTRO ATENCION PERMANEN*",
+                                                              "UNIDAD TECNICA SALUD",
+                                                              "CENTRO URGENCIAS MEDICAS",
+                                                              "UNIDAD 24 HORAS"]),
+                "id"     : "gid",
+                "columns": {"amenity": "tipo_serv",
+                            "name"   : "servicio",
+                            "lat"    : "lat",
+                            "lon"    : "lon"}},
+        "GUY": {"pattern": "GUY",
+                "reader" : "excel",
+                "id"     : "sequential",
+                "columns": {"amenity": "Facility Type",
+                            "name"   : "Name",
+                            "lat"    : " latitude",
+                            "lon"    : " longitude"}},
+        "HTI": {"pattern": "HTI",
+                "reader" : "csv",
+                "id"     : "HealthC_ID",
+                "columns": {"source" : "SourceHosp",
+                            "amenity": "Categorie",
+                            "name"   : _join(['NomInstitu','Commune','DistrictNo']),
+                            "lat"    : "X_DDS",
+                            "lon"    : "Y_DDS"}},
+        "HND": {"pattern": "HND",
+                "reader" : "excel",
+                "options": {"sheet_name": "coordenadas"},
+                "id"     : "codigo",
+                "columns": {"amenity": lambda file : np.nan,
+                            "name"   : "Nombre US",
+                            "lat"    : "lat",
+                            "lon"    : "lon"}},
+        "JAM": {"pattern": "JAM",
+                "reader" : "csv",
+                "id"     : "sequential",
+                "columns": {"amenity": lambda file : file.Type.str.lower(),
+                            "name"   : _join(['H_Name','Parish'], sep = " in "),
+                            "lat"    : _jam_coords("lat"),
+                            "lon"    : _jam_coords("lon")}},
+        "MEX": {"pattern": "MEX",
+                "reader" : "excel",
+                "filter" : lambda file : ~file["CLAVE DE TIPOLOGIA"].isin(["CAF","99","W","F","OFI","ALM","BS","X","ANT","NES","UM","HM",
+                                                                          "OTR","UM TEMPORAL COVID","OTCE","BS","MR","NA","P","PERICIALES"]),
+                "id"     : "ID",
+                "columns": {"amenity": lambda file : file["NOMBRE TIPO ESTABLECIMIENTO"].str.replace("DE ",""),
+                            "name"   : "NOMBRE DE LA UNIDAD",
+                            "lat"    : "LATITUD",
+                            "lon"    : "LONGITUD"}},
+        "PER": {"pattern": "PER",
+                "reader" : "csv",
+                "id"     : "codigo_renaes",
+                "columns": {"amenity": lambda file : file.categoria.replace(PER_CARE),
+                            "name"   : _join(['nombre','diresa'], sep = " in ", title = True),
+                            "lat"    : "latitud",
+                            "lon"    : "longitud"}},
+        "SLV": {"pattern" : "SLV",
+                "multiple": True,
+                "reader"  : "csv",
+                "id"      : "sequential",
+                "columns" : {"amenity": lambda file : file.ESPECIALIZACION.str.lower(),
+                             "name"   : _join(['Name','MUNICIPIO','REGION']),
+                             "lat"    : "Y",
+                             "lon"    : "X"}},
+        "TTO": {"pattern" : "TTO",
+                "ext"     : ".shp",
+                "multiple": True,
+                "reader"  : "shp",
+                "id"      : "sequential",
+                "columns" : {"amenity": lambda file : file.attrs["type"],
+                             "name"   : "Name",
+                             "lat"    : lambda file : file['geometry'].y,
+                             "lon"    : lambda file : file['geometry'].x}}
+    }
+}
+
+def _read_official(storage, key, spec):
+    # Import data with the source's reader
+    options = spec.get("options", {})
+    if spec["reader"] == "csv":
+        file = pd.read_csv(storage.open(key), **options)
+    elif spec["reader"] == "excel":
+        file = pd.read_excel(storage.open(key, seekable = True), engine = 'openpyxl', **options)
+    else:
+        file = gpd.read_file(storage.uri(key), **options)
+
+    return file
+
+def get_official_country(amenity, code, official, storage = None):
+    """
+    process official records for a single country using its source registry entry
+
     Parameters
     ----------
     amenity : str
         string with amenity name, including:
             financial
             healthcare
+    code : str
+        country's isoalpha3 code
     official : list
-        list of countries with official data
-    
+        list of files with official data
+    storage : Storage, optional
+        storage backend (default is the active backend)
+
     Returns
     ----------
     pandas.DataFrame
-        dataframe amenity information per country and site, including:
+        dataframe amenity information per site, including:
             isoalpha3: country name
             source   : source name
+            source_id: source id
+            amenity  : amenity type
             name     : amenity name
             lat      : latitude
             lon      : longitude
     """
-    
+
     # Inputs
-    path = f"Geospatial infrastructure/{amenity} Facilities"
-    
-    # Master table 
+    amenity = amenity.title()
+    storage = storage or get_storage()
+    path    = f"Geospatial infrastructure/{amenity} Facilities"
+    spec    = OFFICIAL_SOURCES[amenity][code]
+
+    # Files of interest
+    files = [file for file in official if (spec["pattern"] in file) and (spec.get("ext", "") in file)]
+    files = files if spec.get("multiple", False) else files[:1]
+
+    # Country table
     infrastructure = []
-    
-    # Financial Facilities
-    # No official records yet
-    
-    # Healthcare Facilities
-    if amenity == "Healthcare":
-        # Argentina
-        #--------------------------------------------------------
-        # Import data
-        file  = [file for file in official if "ARG" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
-        
+    id_n           = 0
+
+    for file in files:
+        type_ = file.split("/")[-1].split(".")[0]
+        file  = _read_official(storage, f"{path}/{file}", spec)
+
         # Filter amenities
-        file = file[~file.tipologia_id.isin([53,80])]
+        if "filter" in spec:
+            file = file[spec["filter"](file)]
+
+        # File type (e.g. Trinidad and Tobago's amenity per file)
+        file.attrs["type"] = type_
 
         # Create variables
-        file['isoalpha3'] = "ARG"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = ['ARG' + str(i) for i in range(len(file))]
-        file['amenity']   = file.tipologia_sigla
-        file['name']      = file.establecimiento_nombre
-        file['lat']       = file.y
-        file['lon']       = file.x
+        data = pd.DataFrame(index = file.index)
+        data['isoalpha3'] = code
+        data['source']    = spec.get("source", "Ministry of Health")
+        if spec["id"] == "sequential":
+            data['source_id'] = [code + str(i) for i in range(id_n, id_n + len(file))]
+        else:
+            data['source_id'] = file[spec["id"]]
+        data['amenity']   = np.nan
+        data['name']      = np.nan
+        data['lat']       = np.nan
+        data['lon']       = np.nan
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+        for col, value in spec["columns"].items():
+            data[col] = value(file) if callable(value) else file[value]
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Bolivia
-        #--------------------------------------------------------
-        file_ = [file for file in official if ("BOL" in file) and (".shp" in file)]
-        id_n = 0
-        
-        for file in file_:
-            path_ = f"{scldatalake}{path}/{file}"
-            file  = gpd.read_file(path_)
-
-            # Create variables
-            file['isoalpha3'] = "BOL"
-            file['source']    = "Ministry of Health"
-            file['source_id'] = ['BOL' + str(i) for i in range(id_n, id_n + len(file))]
-            file['amenity']   = file.CLASE.str.lower()
-            file['name']      = file[['Name','MUNICIPIO','PROVINCIA']].apply(lambda x : '{}, {}, {}'.format(x[0], x[1], x[2]), axis = 1)
-            file['lat']       = file.LATITUD
-            file['lon']       = file.LONGITUD
-
-            # Keep variables of interest
-            file = file[file.columns[-7::]]
-
-            # Add to master table
-            infrastructure.append(file)
-            id_n += len(file)
-        
-        # Brazil 
-        #--------------------------------------------------------
-        # Import data
-        file  = [file for file in official if "BRA" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_, sep = ";", encoding = "unicode_escape")
-        
-        # Filter amenities
-        file = file[file.TP_UNIDADE.isin([1,2,4,5,7,15,20,21,36,61,62,69,70,71,72,73,83,85])]
-        
-        # Amenities name 
-        UNID_NAME = {1 :"Posto de Saude",
-                     2 :"Centro de Saude/Unidade Basica",
-                     4 :"Policlinica",
-                     5 :"Hospital Geral",
-                     7 :"Hospital Especializado",
-                     15:"Unidade Mista",
-                     20:"Pronto Socorro General",
-                     21:"Pronto Socorro Especializado",
-                     36:"Clinica/Centro de Especialidade",
-                     61:"Centro de Parto Normal - Isolado",
-                     62:"Hospital/Dia - Isolado",
-                     69:"Centro de Atencao Hemoterapica E Ou Hematologica",
-                     70:"Centro de Atencao Psicossocial",
-                     71:"Centro de Apoio a Saude da Familia",
-                     72:"Unidade de Atencao a Saude Indigena",
-                     73:"Pronto Atendimento",
-                     83:"Polo de Prevencao de Doencas e Agravos e Promocao da Saude",
-                     85:"Centro de Imunizacao"}
-        
-        # Replace codes with unit name
-        file.TP_UNIDADE = file.TP_UNIDADE.replace(UNID_NAME)
-        
-        # Create variables
-        file['isoalpha3'] = "BRA"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.CO_CNES
-        file['amenity']   = file.TP_UNIDADE
-        file['name']      = file.NO_FANTASIA
-        file['lat']       = file.NU_LATITUDE
-        file['lon']       = file.NU_LONGITUDE
+        # Add to country table
+        infrastructure.append(data)
+        id_n += len(file)
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    # Country table
+    infrastructure = pd.concat(infrastructure)
+    infrastructure = infrastructure.reset_index(drop = True)
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Chile
-        #--------------------------------------------------------
-        file  = [file for file in official if ("CHL" in file) and (".shp" in file)][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = gpd.read_file(path_)
-        
-        # Create variables
-        file['isoalpha3'] = "CHL"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.C_VIG
-        file['amenity']   = file.TIPO
-        file['name']      = file.NOMBRE
-        file['lat']       = file.LATITUD
-        file['lon']       = file.LONGITUD
+    # Coordinates and ids
+    infrastructure = normalize_official(infrastructure)
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    return infrastructure
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Colombia 
-        #--------------------------------------------------------
-        file  = [file for file in official if "COL" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_, encoding = "unicode_escape")
-        
-        # Filter amenities
-        file = file[~file["latitute"].isna()]
-        
-        # Create variables
-        file['isoalpha3'] = "COL"
-        file['source']    = "Ministry of Health REPS"
-        file['source_id'] = file.codigohabilitacionsede
-        file['amenity']   = "IPS"
-        file['name']      = file.nombresede
-        file['lat']       = file.latitute
-        file['lon']       = file.longitude
+def get_amenity_official(amenity, official, countries = None, max_workers = 8):
+    """
+    process official records by country
+    each country's raw data is different, preprocessing is defined per country
+    in `OFFICIAL_SOURCES`, only the requested countries are read (concurrently)
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    Parameters
+    ----------
+    amenity : str
+        string with amenity name, including:
+            financial
+            healthcare
+    official : list
+        list of files with official data
+    countries : list, optional
+        list of isoalpha3 codes (default is every country with official data)
+    max_workers : int, optional
+        number of countries processed concurrently (default is 8)
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Dominican Republic
-        #--------------------------------------------------------
-        file  = [file for file in official if "DOM" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_, sep = ";", encoding = "latin1")
-        
-         # Create variables
-        file['isoalpha3'] = "DOM"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = ['DOM' + str(i) for i in range(len(file))]
-        file['amenity']   = file["TIPO DE CENTRO"]
-        file['name']      = file[['NOMBRE DEL ESTABLECIMIENTO','MUNICIPIO','PROVINCIA']].apply(lambda x : '{}, {}, {}'.format(x[0], x[1], x[2]), axis = 1)
-        file['lat']       = file.COORDENADAS.str.split(',', expand = True)[0]
-        file['lon']       = file.COORDENADAS.str.split(',', expand = True)[1]
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe amenity information per country and site, including:
+            isoalpha3: country name
+            source   : source name
+            name     : amenity name
+            lat      : latitude
+            lon      : longitude
+    """
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    # Inputs
+    amenity = amenity.title()
+    storage = get_storage()
+    sources = OFFICIAL_SOURCES.get(amenity, {})
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Ecuador
-        #--------------------------------------------------------
+    # Countries of interest
+    # Note: financial facilities have no official records yet
+    codes = [code for code in sources if any(sources[code]["pattern"] in file for file in official)]
+    if countries is not None:
+        codes = [code for code in codes if code in [country.upper() for country in countries]]
+    if len(codes) == 0:
+        return pd.DataFrame(columns = ['isoalpha3','source','source_id','amenity','name','lat','lon'])
+
+    # Process countries concurrently, in registry order
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        infrastructure = list(pool.map(lambda code : get_official_country(amenity, code, official, storage), codes))
+
+    # Master table
+    infrastructure = pd.concat(infrastructure)
+    infrastructure = infrastructure.reset_index(drop = True)
+
+    return infrastructure
+
+def get_amenity_public(amenity, public, overlap = "country"):
+    """
+    process public records (healthsites.io and OSM)
+
+    Parameters
+    ----------
+    amenity : str
+        string with amenity name, including:
+            financial
+            healthcare
+    public : list
+        list of files with public data
+    overlap : str, optional
+        how overlapping healthsites.io and OSM records are handled, including:
+            country: OSM records are only kept for countries without
+                     healthsites.io records (default)
+            record : every record is kept, duplicates are resolved per
+                     facility with `deduplicate_amenity`
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe amenity information per country and site, including:
+            isoalpha3: country name
+            source   : source name
+            name     : amenity name
+            lat      : latitude
+            lon      : longitude
+    """
+
+    # Inputs
+    data    = get_iadb()
+    amenity = amenity.title()
+    storage = get_storage()
+    path    = f"Geospatial infrastructure/{amenity} Facilities"
+
+    # Create master table
+    infrastructure = []
+    name           = []
+
+    # Records different from OSM
+    file = [file for file in public if "OSM" not in file]
+    if len(file) > 0:
         # Import data
-        file  = [file for file in official if "ECU" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
-        
-        # Filter amenities
-        file = file[file["nivel de atencion"].isin(["NIVEL 1","NIVEL 2","NIVEL 3"])]
-        
-        # Create variables
-        file['isoalpha3'] = "ECU"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.unicodigo
-        file['amenity']   = file.tipologia
-        file['name']      = file["nombre oficial"]
-        file['lat']       = file.y
-        file['lon']       = file.x
+        file  = file[0]
+        path_ = f"{path}/{file}"
+        file  = pd.read_csv(storage.open(path_))
+
+        # Keep rows of interest
+        file = file[~file.isoalpha3.isin(name)]
+        file = file[~file.isoalpha3.isna()]
 
         # Keep variables of interest
-        file = file[file.columns[-7::]]
+        file = file.drop(columns = "geometry")
 
-        # Add to master table
+        # Add to master tables
         infrastructure.append(file)
-        
-        # Guatemala
-        #--------------------------------------------------------
-        # Import data 
-        file  = [file for file in official if "GTM" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
-        
-        # Filter amenities 
-        tipo_serv = ["CENTRO CONVERGENCIA",
-                     "PUESTO DE SALUD",
-                     "CENTRO DE SALUD",
-                     "HOSPITAL",
-                     "CENTRO ATENCION PERMANEN*",
-                     "UNIDAD TECNICA SALUD",
-                     "CENTRO URGENCIAS MEDICAS",
-                     "UNIDAD 24 HORAS"]
-        file = file[file.tipo_serv.isin(tipo_serv)]
-        
-        # Create variables
-        file['isoalpha3'] = "GTM"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.gid
-        file['amenity']   = file.tipo_serv
-        file['name']      = file.servicio
-        file['lat']       = file.lat
-        file['lon']       = file.lon
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+        # Identify healthsites country names
+        if overlap == "country":
+            name =  pd.concat(infrastructure).isoalpha3.unique().tolist()
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Guyana
-        #--------------------------------------------------------
-        # Import data
-            # Define inputs
-        file  = [file for file in official if "GUY" in file][0]
+    # OSM records
+    # Import data
+    # Note: files are downloaded concurrently
+    file_  = [file for file in public if "OSM" in file]
+    osm_   = storage.prefetch([f"{path}/{file}" for file in file_])
+    for file in file_:
         path_ = f"{path}/{file}"
-        obj   = s3.get_object(Bucket = sclbucket, Key = path_)
+        file  = pd.read_csv(io.BytesIO(osm_[path_]), low_memory = False)
 
-            # Read data
-        excel_data = obj['Body'].read()
-        excel_file = io.BytesIO(excel_data)
-        file       = pd.read_excel(excel_file, engine = 'openpyxl')
+        # Keep IADB countries
+        file = file[file.isoalpha3.isin(data.isoalpha3.unique())]
+
+        # Keeps countries without healthsites.io records
+        file = file[~file.isoalpha3.isin(name)]
 
         # Create variables
-        file['isoalpha3'] = "GUY"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = ['GUY' + str(i) for i in range(len(file))]
-        file['amenity']   = file["Facility Type"]
-        file['name']      = file.Name
-        file['lat']       = file[" latitude"]
-        file['lon']       = file[" longitude"]
+        file['source']    = "OSM"
+        file['source_id'] = file.id
 
         # Keep variables of interest
-        file = file[file.columns[-7::]]
+        file = file[['isoalpha3','source','source_id','amenity','name','lat','lon']]
 
         # Add to master table
         infrastructure.append(file)
-        
-        # Haiti
-        #--------------------------------------------------------
-        file  = [file for file in official if "HTI" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
-        
-        # Create variables
-        file['isoalpha3'] = "HTI"
-        file['source']    = file.SourceHosp
-        file['source_id'] = file.HealthC_ID
-        file['amenity']   = file.Categorie
-        file['name']      = file[['NomInstitu','Commune','DistrictNo']].apply(lambda x : '{}, {}, {}'.format(x[0], x[1], x[2]), axis = 1)
-        file['lat']       = file.X_DDS
-        file['lon']       = file.Y_DDS
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    # Generate master table
+    infrastructure = pd.concat(infrastructure)
+    infrastructure = infrastructure.reset_index(drop = True)
 
-        # Add to master table
-        infrastructure.append(file)
+    return infrastructure
 
-        # Honduras
-        #--------------------------------------------------------        
-        # Import data 
-        file       = [file for file in official if "HND" in file][0]
-        path_      = f"{path}/{file}"
-        obj        = s3.get_object(Bucket = sclbucket, Key = path_)
-        excel_data = obj['Body'].read()
-        excel_file = io.BytesIO(excel_data)
-        file       = pd.read_excel(excel_file, engine = 'openpyxl', sheet_name = "coordenadas")
-        
-        # Create variables
-        file['isoalpha3'] = "HND"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.codigo
-        file['amenity']   = np.nan
-        file['name']      = file["Nombre US"]
-        file['lat']       = file.lat
-        file['lon']       = file.lon
+# Local cache
+#------------------------------------------------------------
+# Version of the processing methods of each table group, bump it when the built tables change
+# (e.g. source registry, normalization), tables built by a different version are built again
+_VERSIONS = {"official": 1,
+             "public"  : 1}
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+def _fingerprint(objects, version):
+    # Fingerprint of raw objects (key, ETag, size and modification time) and processing version
+    return {"version": version, "objects": sorted([obj["key"], obj["etag"], obj["size"], obj["last_modified"]] for obj in objects)}
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Jamaica 
-        #--------------------------------------------------------
-        # Import data
-        file  = [file for file in official if "JAM" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
+def _cached(name, fingerprint, build, force = False):
+    # Table stored together with the fingerprint of its raw objects,
+    # it is only built again if the fingerprint changes
+    # Note: object columns with mixed types (e.g. numeric and text source ids) are stored as text,
+    # built tables are returned as read back so that they match the cached ones (values and dtypes)
+    path     = get_cache_dir("infrastructure")
+    table    = path / f"{name}.parquet"
+    manifest = path / f"{name}.json"
 
-        # Create variables
-        file['isoalpha3'] = "JAM"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = ['JAM' + str(i) for i in range(len(file))]
-        file['amenity']   = file.Type.str.lower()
-        file['name']      = file[['H_Name','Parish']].apply(lambda x : '{} in {}'.format(x[0],x[1]), axis = 1)
-        file['lat']       = file.GeoJSON.apply(lambda x: re.findall(r"\d+\.\d+", x)[1]).astype(float)
-        file['lon']       = file.GeoJSON.apply(lambda x: re.findall(r"\d+\.\d+", x)[0]).astype(float) * -1
+    if (not force) and table.exists() and manifest.exists():
+        if json.loads(manifest.read_text()) == fingerprint:
+            return pd.read_parquet(table), False
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    data  = build()
+    mixed = [col for col in data.columns if data[col].dtype == object and data[col].dropna().map(type).nunique() > 1]
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Mexico 
-        #--------------------------------------------------------
-        # Import data
-            # Define inputs
-        file  = [file for file in official if "MEX" in file][0]
-        path_ = f"{path}/{file}"
-        obj   = s3.get_object(Bucket = sclbucket, Key = path_)
+    # Manifest is written last, an interrupted write is rebuilt on the next call
+    data.astype({col: "str" for col in mixed}).to_parquet(table, index = False)
+    manifest.write_text(json.dumps(fingerprint))
 
-            # Read data
-        excel_data = obj['Body'].read()
-        excel_file = io.BytesIO(excel_data)
-        file       = pd.read_excel(excel_file, engine = 'openpyxl')
-        
-        # Filter amenities 
-        clave = ["CAF","99","W","F","OFI","ALM","BS","X","ANT","NES","UM","HM","OTR","UM TEMPORAL COVID","OTCE","BS","MR","NA","P","PERICIALES"]
-        file  = file[~file["CLAVE DE TIPOLOGIA"].isin(clave)]
+    return pd.read_parquet(table), True
 
-        # Create variables
-        file['isoalpha3'] = "MEX"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.ID
-        file['amenity']   = file["NOMBRE TIPO ESTABLECIMIENTO"].str.replace("DE ","")
-        file['name']      = file["NOMBRE DE LA UNIDAD"]
-        file['lat']       = file["LATITUD"]
-        file['lon']       = file["LONGITUD"]
+def refresh_amenity(amenity, group, countries = None, force = False, max_workers = 8, overlap = "country", ttl = 3600):
+    """
+    gets the infrastructure data from the local cache, refreshing only the
+    tables whose raw objects changed in the Data Lake (ETag, size or modification time)
+    official records are cached per country, public records as a single table
+    raw objects are discovered from the cached prefix listing (see `Storage.list_cached`)
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+    Parameters
+    ----------
+    amenity : str
+        string with amenity name, including:
+            financial
+            healthcare
+    group : str
+        string wtth data group name, including:
+            official
+            public
+    countries : list, optional
+        list of isoalpha3 codes (default is every country)
+    force : bool, optional
+        refresh every table and the prefix listing (default is False)
+    max_workers : int, optional
+        number of countries processed concurrently (default is 8)
+    overlap : str, optional
+        overlap between public sources (see `get_amenity_public`, default is `country`)
+    ttl : float, optional
+        maximum age of the prefix listing in seconds (default is 3600)
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # Peru 
-        #--------------------------------------------------------
-        # Import data
-        file  = [file for file in official if "PER" in file][0]
-        path_ = f"{scldatalake}{path}/{file}"
-        file  = pd.read_csv(path_)
+    Returns
+    ----------
+    tuple
+        infrastructure dataframe (see `get_amenity`) and list of refreshed
+        tables (isoalpha3 codes for official records, `public` for public records)
+    """
+
+    # Inputs
+    amenity = amenity.title()
+    storage = get_storage()
+    path    = f"Geospatial infrastructure/{amenity} Facilities"
+    if force:
+        storage.invalidate(path)
+    objects = [dict(obj, file = obj["key"].split(path + "/")[1]) for obj in storage.list_cached(path, ttl)]
 
-        # Dictionary with amenity names
-        n_before  = ['I-1','I-2','I-3','I-4','II-1','II-2','II-E','III-1','III-2','III-E','SD'] 
-        n_after   = ["Primary care"] * 4 + ["Secondary care"] * 3 + ["Tertiary care"] * 3 + [""]
-        d_amenity = dict(zip(n_before,n_after))
+    # Identify records by categories
+    official = [obj for obj in objects if "official" in obj["file"]]
+    public   = [obj for obj in objects if "healthsites" in obj["file"] or "OSM" in obj["file"]]
 
-        # Create variables
-        file['isoalpha3'] = "PER"
-        file['source']    = "Ministry of Health"
-        file['source_id'] = file.codigo_renaes
-        file['amenity']   = file.categoria.replace(d_amenity)
-        file['name']      = file[['nombre','diresa']].apply(lambda x : '{} in {}'.format(x[0].title(),x[1].title()), axis = 1)
-        file['lat']       = file.latitud
-        file['lon']       = file.longitud
+    # Official records by country
+    if group == "official":
+        sources = OFFICIAL_SOURCES.get(amenity, {})
+        files   = [obj["file"] for obj in official]
+        codes   = [code for code in sources if any(sources[code]["pattern"] in file for file in files)]
+        if countries is not None:
+            codes = [code for code in codes if code in [country.upper() for country in countries]]
+        if len(codes) == 0:
+            return pd.DataFrame(columns = ['isoalpha3','source','source_id','amenity','name','lat','lon']), []
 
-        # Keep variables of interest
-        file = file[file.columns[-7::]]
+        # Note: every file of the country is fingerprinted (including shapefile sidecars)
+        def refresh(code):
+            objects_ = [obj for obj in official if sources[code]["pattern"] in obj["file"]]
+            return _cached(f"{amenity.lower()}-official-{code.lower()}", _fingerprint(objects_, _VERSIONS["official"]),
+                           lambda : get_official_country(amenity, code, files, storage), force)
 
-        # Add to master table
-        infrastructure.append(file)
-        
-        # El Salvador 
-        #--------------------------------------------------------
-        # Import data 
-        file_ = [file for file in official if "SLV" in file]
-        id_n = 0
- 
-        for file in file_:
-            path_ = f"{scldatalake}{path}/{file}"
-            file  = pd.read_csv(path_)
-
-            # Create variables
-            file['isoalpha3'] = "SLV"
-            file['source']    = "Ministry of Health"
-            file['source_id'] = ['SLV' + str(i) for i in range(id_n, id_n + len(file))]
-            file['amenity']   = file.ESPECIALIZACION.str.lower()
-            file['name']      = file[['Name','MUNICIPIO','REGION']].apply(lambda x : '{}, {}, {}'.format(x[0], x[1], x[2]), axis = 1)
-            file['lat']       = file.Y
-            file['lon']       = file.X
-
-            # Keep variables of interest
-            file = file[file.columns[-7::]]
-
-            # Add to master table
-            infrastructure.append(file)
-            id_n += len(file)
-        
-        # Trinidad and Tobago
-        #--------------------------------------------------------
-        file_ = [file for file in official if ("TTO" in file) and (".shp" in file)]
-        id_n = 0
-        
-        for file in file_:
-            type_ = file.split("/")[-1].split(".")[0]
-            path_ = f"{scldatalake}{path}/{file}"
-            file  = gpd.read_file(path_)
-
-            # Create variables
-            file['isoalpha3'] = "TTO"
-            file['source']    = "Ministry of Health"
-            file['source_id'] = ['TTO' + str(i) for i in range(id_n, id_n + len(file))]
-            file['amenity']   = type_
-            file['name']      = file.Name
-            file['lat']       = file['geometry'].y
-            file['lon']       = file['geometry'].x
-
-            # Keep variables of interest
-            file = file[file.columns[-7::]]
-
-            # Add to master table
-            infrastructure.append(file)
-            id_n += len(file)
-        
-        # Master table 
-        #--------------------------------------------------------
-        # Generate master table 
-        infrastructure = pd.concat(infrastructure)
-        infrastructure = infrastructure.reset_index(drop = True)
-        
-        # Convert lat-lon to numeric
-        infrastructure.lat = infrastructure.lat.apply(pd.to_numeric, errors = 'coerce', downcast = 'float')
-        infrastructure.lon = infrastructure.lon.apply(pd.to_numeric, errors = 'coerce', downcast = 'float')
-        
-        # Remove NAs
-        infrastructure = infrastructure[~infrastructure.lat.isna()] 
-        
-        # Add country code to soure_id
-        infrastructure['source_id'] = infrastructure.apply(
-            lambda row: str(row['isoalpha3']) + str(int(row['source_id'])) if re.match(r'^\d', str(row['source_id'])) else row['source_id'], 
-            axis = 1)
-    
-    return infrastructure
+        with ThreadPoolExecutor(max_workers = max_workers) as pool:
+            tables = list(pool.map(refresh, codes))
 
-def get_amenity(amenity, group):
+        refreshed      = [code for code, (_, built) in zip(codes, tables) if built]
+        infrastructure = pd.concat([table for table, _ in tables])
+
+    # Public records
+    elif group == "public":
+        files = [obj["file"] for obj in public]
+        name = f"{amenity.lower()}-public" if overlap == "country" else f"{amenity.lower()}-public-{overlap}"
+        infrastructure, built = _cached(name, _fingerprint(public, _VERSIONS["public"]),
+                                        lambda : get_amenity_public(amenity, files, overlap), force)
+        refreshed = ["public"] if built else []
+
+        # Keep countries of interest
+        if countries is not None:
+            infrastructure = infrastructure[infrastructure.isoalpha3.isin([country.upper() for country in countries])]
+
+    else:
+        raise ValueError("Group must be within ['official','public']")
+
+    infrastructure = infrastructure.reset_index(drop = True)
+
+    return infrastructure, refreshed
+
+def get_amenity(amenity, group, countries = None, force = False):
     """
     gets the infrastructure data based on official and public records
-    
+    tables are served from the local cache and only refreshed when their raw
+    files change (see `refresh_amenity`)
+
     Parameters
     ----------
     amenity : str
@@ -497,7 +641,12 @@ def get_amenity(amenity, group):
         string wtth data group name, including:
             official
             public
-    
+    countries : list, optional
+        list of isoalpha3 codes (default is every country),
+        official records are only downloaded for these countries
+    force : bool, optional
+        refresh every table (default is False)
+
     Returns
     ----------
     pandas.DataFrame
@@ -508,79 +657,382 @@ def get_amenity(amenity, group):
             lat      : latitude
             lon      : longitude
     """
-    
+
     # Inputs
-    data    = get_iadb()
     amenity = amenity.title()
-    
-    # Get files by bucket
-    path  = f"Geospatial infrastructure/{amenity} Facilities"
-    files = [file.key.split(path + "/")[1] for file in s3_bucket.objects.filter(Prefix = path).all()]
-    
-    # Identify records by categories
-    official = [file for file in files if "official" in file]
-    public   = [file for file in files if "healthsites" in file or "OSM" in file]
-    
-    # Create master table 
-    infrastructure = []
-    name           = []
-    
-    # Select group of interest 
-    if group == "official":
-        # Process official records 
-        if len(official) > 0:
-            infrastructure = get_amenity_official(amenity, official)
-        else:
-            print(f"No official records for {amenity} infrastructure")
-            
-    elif group == "public":    
-        # Process public records
-        # Records different from OSM
-        file = [file for file in public if "OSM" not in file]
-        if len(file) > 0:
-            # Import data
-            file  = file[0]
-            path_ = f"{scldatalake}{path}/{file}"
-            file  = pd.read_csv(path_)
-
-            # Keep rows of interest
-            file = file[~file.isoalpha3.isin(name)]
-            file = file[~file.isoalpha3.isna()]
-
-            # Keep variables of interest
-            file = file.drop(columns = "geometry")
-
-            # Add to master tables
-            infrastructure.append(file)
-
-            # Identify healthsites country names
-            name =  pd.concat(infrastructure).isoalpha3.unique().tolist()
-        
-        # OSM records
-        # Import data
-        file_  = [file for file in public if "OSM" in file]
-        for file in file_:
-            path_ = f"{scldatalake}{path}/{file}"
-            file  = pd.read_csv(path_, low_memory = False)
 
-            # Keep IADB countries
-            file = file[file.isoalpha3.isin(data.isoalpha3.unique())]
+    # Cached tables
+    infrastructure, refreshed = refresh_amenity(amenity, group, countries, force)
+    if len(infrastructure) == 0:
+        print(f"No {group} records for {amenity} infrastructure")
+    elif len(refreshed) > 0:
+        print(f"Refreshed {group} records for {amenity} infrastructure: {', '.join(refreshed)}")
+
+    return infrastructure
+
+# Deduplication
+#------------------------------------------------------------
+def _name_key(names):
+    # Names compared without accents, punctuation and place suffixes
+    # (e.g. "Hospital San Juan, Municipio, Provincia" -> "hospital san juan")
+    names = names.astype("string").fillna("").str.split(",").str[0]
+    names = normalize_text(names).str.replace(r"[^a-z0-9]+", " ", regex = True).str.strip()
+
+    return names.fillna("").tolist()
+
+def _trigrams(names):
+    # Character trigrams of names (vectorized), as arrays of distinct trigram codes per name
+    # sorted by name and the offset of each name
+    padded = pd.Series([f" {name} " if name else "" for name in names], dtype = object)
+    length = int(padded.str.len().max()) if len(padded) > 0 else 0
+    grams  = [pd.DataFrame({"name": np.arange(len(padded)), "gram": padded.str[k:k + 3]}) for k in range(length - 2)]
+    grams  = pd.concat(grams, ignore_index = True) if grams else pd.DataFrame({"name": np.empty(0, dtype = "int64"), "gram": np.empty(0, dtype = object)})
+    grams  = grams[grams.gram.str.len() == 3].drop_duplicates().sort_values("name", kind = "stable")
+    counts = np.bincount(grams.name.to_numpy(dtype = "int64"), minlength = len(padded))
+
+    return pd.factorize(grams.gram)[0], np.concatenate([[0], np.cumsum(counts)])
+
+def _gather(offsets, ids):
+    # Positions of the trigrams of several names (concatenated) and their count per name
+    counts = offsets[ids + 1] - offsets[ids]
+    starts = np.repeat(offsets[ids] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+
+    return starts + np.arange(counts.sum()), counts
+
+def _similarity(names, i, j):
+    # Trigram overlap coefficient of record pairs (0 if a name is missing)
+    # Note: computed once per distinct pair of names, shared trigrams are the duplicated (pair, trigram) keys
+    codes, names = pd.factorize(pd.Series(names, dtype = object))
+    inverse, pairs = pd.factorize(codes[i].astype("int64") * len(names) + codes[j])
+    pairs = np.stack([pairs // max(len(names), 1), pairs % max(len(names), 1)], axis = 1)
+    grams, offsets = _trigrams(names)
+
+    pos_a, count_a = _gather(offsets, pairs[:, 0])
+    pos_b, count_b = _gather(offsets, pairs[:, 1])
+    pair = np.concatenate([np.repeat(np.arange(len(pairs)), count_a), np.repeat(np.arange(len(pairs)), count_b)])
+    keys = np.sort(pair * (grams.max(initial = 0) + 1) + np.concatenate([grams[pos_a], grams[pos_b]]))
+    dup  = keys[1:][keys[1:] == keys[:-1]] // (grams.max(initial = 0) + 1)
+
+    shared = np.bincount(dup, minlength = len(pairs))
+    size   = np.minimum(count_a, count_b)
+    sim    = np.where(size > 0, shared / np.maximum(size, 1), 0.0)
+
+    return sim[inverse]
+
+def _candidates(x, y, distance):
+    # Pairs of records in the same or neighbouring grid cells (i < j)
+    ix  = np.floor(x / distance).astype("int64")
+    iy  = np.floor(y / distance).astype("int64")
+    key = lambda ix, iy : ix * 2**32 + iy
+    idx = np.arange(len(x))
+
+    cells = pd.DataFrame({"key": key(ix, iy), "i": idx})
+    pairs = []
+    for dx, dy in [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]:
+        shifted = pd.DataFrame({"key": key(ix + dx, iy + dy), "j": idx})
+        pair    = cells.merge(shifted, on = "key")[["i","j"]].to_numpy()
+        pairs.append(pair[pair[:, 0] != pair[:, 1]])
+    pairs = np.concatenate(pairs)
+    pairs = np.unique(np.sort(pairs, axis = 1), axis = 0)
+
+    return pairs[:, 0], pairs[:, 1]
+
+def _haversine(lon1, lat1, lon2, lat2):
+    # Great-circle distance in meters
+    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+
+    return 2 * 6371008.8 * np.arcsin(np.sqrt(a))
+
+def deduplicate_amenity(tables, distance = 100, threshold = 0.8):
+    """
+    entity resolution of facilities from several sources
+    candidate pairs are blocked with a metric grid (cell size `distance`), only
+    records in neighbouring cells are compared, so the cost is near-linear
+    pairs from different sources match if they are within `distance` meters
+    and their names are similar (character trigrams overlap coefficient)
+    each record is linked only to its best match (highest similarity, then
+    priority and distance) among the sources with a higher priority, so records
+    of the same source are never merged through a third record; each group of
+    linked records is a facility represented by its highest priority record
+
+    Parameters
+    ----------
+    tables : list
+        list of dataframes with isoalpha3, source, source_id, amenity, name,
+        lat and lon, in priority order (e.g. official, healthsites.io and OSM)
+    distance : float, optional
+        maximum distance between records of the same facility in meters (default is 100)
+    threshold : float, optional
+        minimum name similarity between 0 and 1 (default is 0.8)
+
+    Returns
+    ----------
+    tuple
+        deduplicated facilities dataframe (with facility_id, i.e. isoalpha3, source
+        and source_id of the representative record, and n_records) and
+        match links dataframe between records (left and right source, source_id,
+        distance and similarity), the left record has the higher priority
+    """
+
+    # Records with priority
+    records = pd.concat([table.assign(priority = i) for i, table in enumerate(tables)], ignore_index = True)
+    records = records[~(records.lat.isna() | records.lon.isna())].reset_index(drop = True)
+    lat     = records.lat.to_numpy(dtype = "float64")
+    lon     = records.lon.to_numpy(dtype = "float64")
+
+    # Spatial blocking (metric coordinates)
+    # Note: longitudes are scaled at the highest latitude, cells are never narrower than `distance`
+    scale = np.cos(np.radians(min(np.abs(lat).max(initial = 0), 85)))
+    x = lon * 111320 * scale
+    y = lat * 110574
+    i, j = _candidates(x, y, distance)
+
+    # Nearby records from different sources
+    priority = records.priority.to_numpy()
+    dist     = _haversine(lon[i], lat[i], lon[j], lat[j])
+    keep     = (dist <= distance) & (priority[i] != priority[j])
+    i, j, dist = i[keep], j[keep], dist[keep]
+
+    # Name similarity
+    sim  = _similarity(_name_key(records.name), i, j)
+    keep = sim >= threshold
+    i, j, dist, sim = i[keep], j[keep], dist[keep], sim[keep]
+
+    # Links from each record to its single best match of a higher priority source
+    # Note: links are never transitive across records of the same source, a lower priority
+    # record close to two official facilities joins only the most similar (then nearest) one
+    swap = priority[i] > priority[j]
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+    best = pd.DataFrame({"i": i, "j": j, "dist": dist, "sim": sim, "priority": priority[i]})
+    best = best.sort_values(["j","sim","priority","dist"], ascending = [True, False, True, True], kind = "stable")
+    best = best.drop_duplicates("j")
+    i, j, dist, sim = (best[col].to_numpy() for col in ["i","j","dist","sim"])
+
+    # Facilities: records follow their links up to a record without a higher priority match
+    # Note: priorities strictly increase along the links, so len(tables) steps reach every root
+    group = np.arange(len(records))
+    group[j] = i
+    for _ in range(len(tables)):
+        group = group[group]
+
+    # Representative record: highest priority source, then first record
+    records["facility"]  = group
+    records["n_records"] = records.groupby("facility").facility.transform("size")
+    facilities = records.sort_values(["facility","priority"], kind = "stable").drop_duplicates("facility")
+    facilities = facilities.sort_index()
+    # Note: the source is part of the id, sources of the same country may reuse ids (e.g. OSM and registry codes)
+    facilities.insert(0, "facility_id", facilities.isoalpha3.astype(str) + "-" + facilities.source.astype(str) + "-" + facilities.source_id.astype(str))
+    facilities = facilities.drop(columns = ["facility","priority"]).reset_index(drop = True)
+
+    # Match links
+    links = pd.DataFrame({"left_source"    : records.source.to_numpy()[i],
+                          "left_source_id" : records.source_id.to_numpy()[i],
+                          "right_source"   : records.source.to_numpy()[j],
+                          "right_source_id": records.source_id.to_numpy()[j],
+                          "distance"       : dist,
+                          "similarity"     : sim})
+
+    return facilities, links
+
+def get_facilities(amenity, countries = None, distance = 100, threshold = 0.8, force = False):
+    """
+    gets the deduplicated facilities from official and public records
+    (official, then healthsites.io, then OSM records are preferred)
+
+    Parameters
+    ----------
+    amenity : str
+        string with amenity name, including:
+            financial
+            healthcare
+    countries : list, optional
+        list of isoalpha3 codes (default is every country)
+    distance : float, optional
+        maximum distance between records of the same facility in meters (default is 100)
+    threshold : float, optional
+        minimum name similarity between 0 and 1 (default is 0.8)
+    force : bool, optional
+        refresh every cached table (default is False)
+
+    Returns
+    ----------
+    tuple
+        deduplicated facilities dataframe and match links dataframe (see `deduplicate_amenity`)
+    """
+
+    # Official and public records
+    official, _ = refresh_amenity(amenity, "official", countries, force)
+    public, _   = refresh_amenity(amenity, "public", countries, force, overlap = "record")
+
+    # Sources in priority order
+    tables = [official, public[public.source != "OSM"], public[public.source == "OSM"]]
+    tables = [table[['isoalpha3','source','source_id','amenity','name','lat','lon']] for table in tables]
+
+    return deduplicate_amenity(tables, distance, threshold)
+
+# OSM extracts
+#------------------------------------------------------------
+# OSM tags by amenity (same as the Overpass queries in `1-infrastructure.ipynb`)
+OSM_TAGS = {"Financial" : {"amenity": ["atm"]},
+            "Healthcare": {"amenity": ["hospital"]}}
+
+class _OsmHandler:
+    # Collects tagged nodes, ways and relations (located with the node index)
+    def __init__(self, tags, index):
+        import osmium
+
+        self.tags      = {key: (set(values) if values else None) for key, values in tags.items()}
+        self.index     = index
+        self.errors    = (KeyError, osmium.InvalidLocationError)
+        self.records   = []
+        self.relations = []
+        self.ways      = {}
 
-            # Keeps countries without healthsites.io records
-            file = file[~file.isoalpha3.isin(name)]
+    def _match(self, obj):
+        # Value of the first matching tag
+        for key, values in self.tags.items():
+            value = obj.tags.get(key)
+            if (value is not None) and (values is None or value in values):
+                return value
 
-            # Create variables
-            file['source']    = "OSM"
-            file['source_id'] = file.id
+    def _bbox(self, coords):
+        # Center of the bounding box (as Overpass `out center`)
+        coords = [coord for coord in coords if coord is not None]
+        if len(coords) == 0:
+            return None
+        lon, lat = zip(*coords)
+        return ((min(lon) + max(lon)) / 2, (min(lat) + max(lat)) / 2)
 
-            # Keep variables of interest
-            file = file[['isoalpha3','source','source_id','amenity','name','lat','lon']]
+    def _location(self, ref):
+        # Node location from the index
+        try:
+            location = self.index.get(ref)
+            return (location.lon, location.lat)
+        except self.errors:
+            return None
 
-            # Add to master table
-            infrastructure.append(file)
+    def _add(self, type_, obj, value, coords):
+        if coords is not None:
+            self.records.append((f"{type_}/{obj.id}", value, obj.tags.get("name"), coords[0], coords[1]))
 
-        # Generate master table 
-        infrastructure = pd.concat(infrastructure)
-        infrastructure = infrastructure.reset_index(drop = True)
-    
-    return infrastructure
\ No newline at end of file
+    def node(self, n):
+        value = self._match(n)
+        if value is not None:
+            self._add("node", n, value, (n.location.lon, n.location.lat))
+
+    def way(self, w):
+        value = self._match(w)
+        if value is not None:
+            self._add("way", w, value, self._bbox([self._location(node.ref) for node in w.nodes]))
+
+    def relation(self, r):
+        value = self._match(r)
+        if value is not None:
+            members = [(member.type, member.ref) for member in r.members if member.type in ["n","w"]]
+            self.relations.append((f"relation/{r.id}", value, r.tags.get("name"), members))
+
+class _OsmWays:
+    # Bounding boxes of relation member ways
+    def __init__(self, handler, refs):
+        self.handler = handler
+        self.refs    = refs
+
+    def way(self, w):
+        if w.id in self.refs:
+            coords = [self.handler._location(node.ref) for node in w.nodes]
+            coords = [coord for coord in coords if coord is not None]
+            if len(coords) > 0:
+                lon, lat = zip(*coords)
+                self.handler.ways[w.id] = [(min(lon), min(lat)), (max(lon), max(lat))]
+
+def get_amenity_osm(path, amenity, code = None, tags = None):
+    """
+    extracts amenities from a local OSM PBF file (e.g. Geofabrik country extracts)
+    nodes, ways and relations are streamed in one pass, nodes are stored in a
+    compact location index (osmium `flex_mem`) used to locate ways; relations
+    are located from their member nodes and ways, since relations come after
+    the ways in PBF files, a second pass over the ways is made when relations
+    match (files without matching relations are read once)
+    ways and relations are located at the center of their bounding box, as the
+    Overpass `out center` statement
+    requires pyosmium (imported on first use)
+
+    Parameters
+    ----------
+    path : str
+        path to the OSM PBF file
+    amenity : str
+        string with amenity name, including:
+            financial
+            healthcare
+    code : str, optional
+        country's isoalpha3 code (default is the admin-0 boundary of each site)
+    tags : dict, optional
+        dictionary with OSM key and list of values, None for any value
+        (default is `OSM_TAGS` for the amenity)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe amenity information per country and site, including:
+            isoalpha3: country name
+            source   : source name
+            source_id: OSM type and id (e.g. node/123)
+            amenity  : tag value
+            name     : amenity name
+            lat      : latitude
+            lon      : longitude
+    """
+
+    import osmium
+
+    # Inputs
+    tags  = tags or OSM_TAGS[amenity.title()]
+    index = osmium.index.create_map("flex_mem")
+    nodes = osmium.NodeLocationsForWays(index)
+    nodes.ignore_errors()
+
+    # Stream nodes, ways and relations
+    handler = _OsmHandler(tags, index)
+    reader  = osmium.io.Reader(path, osmium.osm.osm_entity_bits.NODE | osmium.osm.osm_entity_bits.WAY | osmium.osm.osm_entity_bits.RELATION)
+    osmium.apply(reader, nodes, handler)
+    reader.close()
+
+    # Relations: member ways, second pass over the ways (node locations from the index)
+    refs = {ref for *_, members in handler.relations for type_, ref in members if type_ == "w"}
+    if len(refs) > 0:
+        reader = osmium.io.Reader(path, osmium.osm.osm_entity_bits.WAY)
+        osmium.apply(reader, _OsmWays(handler, refs))
+        reader.close()
+
+    for source_id, value, name, members in handler.relations:
+        coords = []
+        for type_, ref in members:
+            if type_ == "n":
+                coords.append(handler._location(ref))
+            else:
+                coords.extend(handler.ways.get(ref, []))
+        coords = handler._bbox(coords)
+        if coords is not None:
+            handler.records.append((source_id, value, name, coords[0], coords[1]))
+
+    # Master table
+    infrastructure = pd.DataFrame(handler.records, columns = ['source_id','amenity','name','lon','lat'])
+    infrastructure['source'] = "OSM"
+
+    # Country codes
+    if code is not None:
+        infrastructure['isoalpha3'] = code.upper()
+    else:
+        points = gpd.GeoDataFrame(infrastructure, geometry = gpd.points_from_xy(infrastructure.lon, infrastructure.lat), crs = "EPSG:4326")
+        points = get_boundaries().sjoin(points, "", 0)
+        points = points[~points.index.duplicated()]
+        infrastructure = infrastructure.loc[points.index]
+        infrastructure['isoalpha3'] = points.ADM0_PCODE
+
+    # Keep variables of interest
+    infrastructure = infrastructure[['isoalpha3','source','source_id','amenity','name','lat','lon']]
+    infrastructure = infrastructure.reset_index(drop = True)
+
+    return infrastructure
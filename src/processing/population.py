@@ -1,4 +1,22 @@
-def get_meta_url(data, code):
+import io
+import re
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import requests
+from bs4 import BeautifulSoup
+
+import rasterio
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.windows import Window
+from shapely.geometry import box
+from shapely.prepared import prep
+
+from src.utilities import get_iadb, get_country_shp, get_storage
+
+def get_meta_url(data, code, fmt = "csv"):
     """
     gets the HTML content from the high density population datasets in HDX
     https://data.humdata.org/organization/facebook?q=high%20resolution%20population%20density
@@ -9,6 +27,10 @@ def get_meta_url(data, code):
         dataframe with IADB country names (EN/SP) and isoalpha3 codes
     code : str
         country's isoalpha3 code
+    fmt : str, optional
+        resource format (default is `csv`), including:
+            csv
+            tif
     
     Returns
     ----------
@@ -43,7 +65,7 @@ def get_meta_url(data, code):
         url  = [item.find_all('div', attrs = {"class":"hdx-btn-group hdx-btn-group-fixed"})[0].find('a')['href'] for item in soup]
 
         # Processing URL
-        url = [item for item in url if "csv" in item]
+        url = [item for item in url if fmt in item]
         url = [f"https://data.humdata.org{item}" for item in url]
 
         # Processing file names
@@ -51,7 +73,8 @@ def get_meta_url(data, code):
         for item in url: 
             item_ = item.split("/")[-1]
             item_ = item_.replace("_csv",".csv")
-            item_ = item_.replace(".zip",".gz")
+            item_ = item_.replace("_geotiff",".tif")
+            item_ = item_.replace(".zip",".gz") if fmt == "csv" else item_.replace(".zip","")
             item_ = re.sub("(_|-)\d+", "", item_)
             item_ = item_.replace("population","total_population")
             item_ = item_.replace("general","total_population")
@@ -65,7 +88,7 @@ def get_meta_url(data, code):
             files.append(item_)
 
         # Create dictionary 
-        keys_ = [x.replace(f"{code.upper()}_","").replace(".csv.gz","") for x in files]
+        keys_ = [x.replace(f"{code.upper()}_","").replace(".csv.gz","").replace(".tif","") for x in files]
         vals_ = [[x,y] for x,y in zip(files,url)]
         dict_ = dict(zip(keys_,vals_))
         
@@ -155,7 +178,148 @@ def get_population(data, code, group = "total_population"):
     file = pop_geo_adj_.copy()
     file = file.drop(columns = "geometry")
     path = "Development Data Partnership/Facebook - High resolution population density map/public-fb-data/csv"
-    path = scldatalake + f"{path}/{code.upper()}/{name}"
-    file.to_csv(path, compression = 'gzip')
+    buff = io.BytesIO()
+    file.to_csv(buff, compression = 'gzip')
+    get_storage().write(f"{path}/{code.upper()}/{name}", buff.getvalue())
+    
+    return file
+
+def _gdal_path(path):
+    # GDAL virtual file systems for remote and zipped files
+    if path.startswith("http"):
+        path = f"/vsicurl/{path}"
+    if path.endswith(".zip"):
+        path = f"/vsizip/{path}"
+    
+    return path
+
+def get_raster_windows(path, shp, id_col = "ADM0_PCODE", chunk = 2048):
+    """
+    reads a population raster by windows that intersect each boundary
+    only the blocks covering the boundary are requested from the file, 
+    cells outside the boundary (or with no data) are set to zero
+    
+    Parameters
+    ----------
+    path : str
+        raster path or URL (zipped URLs are read through GDAL's /vsizip/)
+    shp : geopandas.GeoDataFrame
+        boundaries used to define and mask the windows
+    id_col : str, optional
+        boundary identifier (default is `ADM0_PCODE`)
+    chunk : int, optional
+        maximum window size in pixels per side (default is 2048)
+    
+    Yields
+    ----------
+    tuple
+        boundary identifier, masked array (numpy.ndarray) and window transform
+    """
+    
+    with rasterio.open(_gdal_path(path)) as src:
+        # Boundaries in the raster coordinate system
+        shp_ = shp.to_crs(src.crs) if shp.crs is not None and src.crs is not None else shp
+        
+        for code, geom in zip(shp_[id_col], shp_.geometry):
+            # Window covering the boundary, bounded by the raster extent
+            try:
+                window = geometry_window(src, [geom])
+            except WindowError:
+                continue
+            
+            # Split large windows and skip blocks outside the boundary
+            geom_ = prep(geom)
+            for row in range(int(window.row_off), int(window.row_off + window.height), chunk):
+                for col in range(int(window.col_off), int(window.col_off + window.width), chunk):
+                    block     = Window(col, row, 
+                                       min(chunk, int(window.col_off + window.width) - col), 
+                                       min(chunk, int(window.row_off + window.height) - row))
+                    transform = src.window_transform(block)
+                    if not geom_.intersects(box(*rasterio.windows.bounds(block, src.transform))):
+                        continue
+                    
+                    # Read block and mask cells outside boundary
+                    array  = src.read(1, window = block, masked = True).astype("float64").filled(0)
+                    inside = geometry_mask([geom], out_shape = array.shape, transform = transform, invert = True)
+                    array  = np.where(inside & (array > 0), array, 0)
+                    
+                    yield code, array, transform
+
+def get_population_raster(data, code, group = "total_population", level = 0, isochrone = None):
+    """
+    META population estimations (GeoTIFF)
+    gets the population by admin unit reading the raster by windows
+    the point .csv round-trip is skipped, arrays are aggregated directly
+    https://data.humdata.org/organization/facebook?q=high%20resolution%20population%20density
+    
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        dataframe with IADB country names (EN/SP) and isoalpha3 codes
+    code : str
+        country's isoalpha3 code
+    group: str
+        population group (default is `total_population`), including:
+            total_population
+            women
+            men
+            children_under_five
+            youth_15_24
+            elderly_60_plus
+            women_of_reproductive_age_15_49
+    level : int, optional
+        administrative level (default is 0)
+    isochrone : geopandas.GeoDataFrame, optional
+        covered area, if provided covered population is also calculated
+    
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with population by admin unit, including:
+            pop_tot  : total population
+            pop_cov  : covered population (if isochrone)
+            pop_uncov: uncovered population (if isochrone)
+            per_cov  : percentage of covered population (if isochrone)
+            per_uncov: percentage of uncovered population (if isochrone)
+    """
+    
+    # Inputs
+    meta   = get_meta_url(data, code, fmt = "tif")
+    id_col = f"ADM{level}_PCODE"
+    shp_   = get_country_shp(code, level = level)
+    
+    # Aggregate windows by admin unit 
+    # Note: group must match exactly to avoid double counting (e.g. women)
+    totals = {}
+    for group_ in [name for name in meta.keys() if name == group]:
+        path = meta[group_][1]
+        
+        # Covered area in the raster coordinate system
+        covered_area = None
+        if isochrone is not None:
+            with rasterio.open(_gdal_path(path)) as src:
+                covered_area = (isochrone.to_crs(src.crs) if isochrone.crs is not None and src.crs is not None else isochrone).geometry.union_all()
+        
+        for pcode, array, transform in get_raster_windows(path, shp_, id_col):
+            pop_tot, pop_cov = totals.get(pcode, (0, 0))
+            pop_tot += array.sum()
+            
+            # Population inside covered area in the same window
+            if covered_area is not None and not covered_area.is_empty:
+                covered  = geometry_mask([covered_area], out_shape = array.shape, transform = transform, invert = True)
+                pop_cov += array[covered].sum()
+                
+            totals[pcode] = (pop_tot, pop_cov)
+    
+    # Population by admin unit 
+    population = pd.DataFrame([[k, v[0], v[1]] for k,v in totals.items()], columns = [id_col, "pop_tot", "pop_cov"])
+    
+    # Create coverage features
+    if isochrone is not None:
+        population["pop_uncov"] = population.pop_tot   - population.pop_cov
+        population["per_cov"]   = population.pop_cov   * 100 / population.pop_tot
+        population["per_uncov"] = population.pop_uncov * 100 / population.pop_tot
+    else:
+        population = population.drop(columns = "pop_cov")
     
-    return file
\ No newline at end of file
+    return population
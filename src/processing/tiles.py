@@ -0,0 +1,612 @@
+import os
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyogrio
+import shapely
+import h3
+
+from src.utilities.general import get_cache_dir
+from src.processing.connectivity import get_tile_url
+from src.utilities.boundaries import get_boundaries
+from src.statistics.aggregate import weighted_aggregate
+
+# Quadkeys
+#------------------------------------------------------------
+# Note: Ookla tiles are zoom-16 web mercator tiles identified by their quadkey
+def quadkey_to_tile(quadkeys):
+    """
+    converts quadkeys to tile coordinates (vectorized)
+
+    Parameters
+    ----------
+    quadkeys : array-like
+        quadkeys with the same zoom level (e.g. Ookla zoom-16 tiles)
+
+    Returns
+    ----------
+    tuple
+        arrays with tile x, tile y and the zoom level
+    """
+
+    quadkeys = np.asarray(quadkeys, dtype = str)
+    zoom     = len(quadkeys[0]) if len(quadkeys) > 0 else 0
+    digits   = np.frombuffer(quadkeys.astype(f"S{zoom}").tobytes(), dtype = np.uint8).reshape(-1, zoom) - ord("0")
+
+    # Each digit adds one bit to x (bit 0) and y (bit 1)
+    weights = 2 ** np.arange(zoom - 1, -1, -1, dtype = "int64")
+    x = (digits & 1).astype("int64") @ weights
+    y = (digits >> 1).astype("int64") @ weights
+
+    return x, y, zoom
+
+def tile_to_quadkey(x, y, zoom):
+    """
+    converts tile coordinates to quadkeys (vectorized)
+
+    Parameters
+    ----------
+    x : array-like
+        tile x
+    y : array-like
+        tile y
+    zoom : int
+        zoom level
+
+    Returns
+    ----------
+    numpy.ndarray
+        quadkeys
+    """
+
+    x = np.asarray(x, dtype = "int64")
+    y = np.asarray(y, dtype = "int64")
+    shifts = np.arange(zoom - 1, -1, -1)
+    digits = ((x[:, None] >> shifts) & 1) + 2 * ((y[:, None] >> shifts) & 1)
+    digits = (digits + ord("0")).astype(np.uint8)
+
+    return digits.view(f"S{zoom}").ravel().astype(str)
+
+def tile_bounds(x, y, zoom):
+    """
+    gets the bounds of tiles (EPSG:4326)
+
+    Parameters
+    ----------
+    x : array-like
+        tile x
+    y : array-like
+        tile y
+    zoom : int
+        zoom level
+
+    Returns
+    ----------
+    tuple
+        arrays with minimum longitude, minimum latitude, maximum longitude and maximum latitude
+    """
+
+    n   = 2.0 ** zoom
+    x   = np.asarray(x, dtype = "float64")
+    y   = np.asarray(y, dtype = "float64")
+    lat = lambda y : np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+def get_lac_quadkeys(zoom = 7):
+    """
+    gets the quadkey prefixes of the tiles covering the LAC-26 region
+
+    Parameters
+    ----------
+    zoom : int, optional
+        prefix zoom level (default is 7, tiles of ~300 km)
+
+    Returns
+    ----------
+    list
+        quadkey prefixes of the tiles intersecting the LAC-26 admin-0 boundaries
+    """
+
+    if zoom not in _prefixes:
+        # Tiles in the region's bounding box
+        shp  = get_boundaries().get("", 0, "coarse")
+        minx, miny, maxx, maxy = shp.total_bounds
+        n    = 2 ** zoom
+        x0, x1 = [int(np.clip(np.floor((lon + 180) / 360 * n), 0, n - 1)) for lon in [minx, maxx]]
+        y0, y1 = [int(np.clip(np.floor((1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n), 0, n - 1)) for lat in [maxy, miny]]
+        x, y = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        x, y = x.ravel(), y.ravel()
+
+        # Tiles intersecting the boundaries
+        boxes = shapely.box(*tile_bounds(x, y, zoom))
+        idx   = np.unique(shapely.STRtree(boxes).query(shp.geometry.values, predicate = "intersects")[1])
+        _prefixes[zoom] = sorted(tile_to_quadkey(x[idx], y[idx], zoom).tolist())
+
+    return _prefixes[zoom]
+
+# LAC-26 quadkey prefixes by zoom level
+_prefixes = {}
+
+# Ookla tile attributes
+TILE_COLUMNS = ["quadkey","avg_d_kbps","avg_u_kbps","avg_lat_ms","tests","devices"]
+
+def get_tiles(service, year, q, zoom = 7, geometry = False, path = None, batch_size = 65536):
+    """
+    gets the LAC-26 Ookla tiles for a quarter
+    the worldwide zip is streamed in record batches (attributes only) and each
+    batch is filtered by the LAC-26 quadkey prefixes before it is kept, tile
+    geometries are never read, they are rebuilt from the quadkey on demand;
+    the compact table is written to `path` (default is the local cache) and
+    reused on later calls
+
+    Parameters
+    ----------
+    service : str
+        type of the service - fixed or mobile
+    year : int
+        year
+    q : int
+        quarter
+    zoom : int, optional
+        zoom level of the quadkey prefixes (default is 7)
+    geometry : bool, optional
+        return tile polygons as a GeoDataFrame (default is False)
+    path : str, optional
+        parquet file for the compact table (default is the local cache)
+    batch_size : int, optional
+        number of records per batch (default is 65536)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with one row per tile, including:
+            quadkey   : tile quadkey (zoom 16)
+            avg_d_kbps: average download speed (kbps)
+            avg_u_kbps: average upload speed (kbps)
+            avg_lat_ms: average latency (ms)
+            tests     : number of tests
+            devices   : number of devices
+            lon       : tile centroid longitude
+            lat       : tile centroid latitude
+            avg_d_mbps: average download speed (Mbps)
+            avg_u_mbps: average upload speed (Mbps)
+    """
+
+    path = path or get_cache_dir("connectivity", "tiles") / f"{service}-{year}-q{q}.parquet"
+    if os.path.exists(path):
+        data = pd.read_parquet(path)
+    else:
+        # Stream records of tiles in LAC-26 (no geometry)
+        # Note: the zip is read through HTTP range requests, it is not downloaded
+        prefixes = pa.array(get_lac_quadkeys(zoom))
+        url      = f"/vsizip//vsicurl/{get_tile_url(service, year, q)}"
+        batches  = []
+        with pyogrio.open_arrow(url, columns = TILE_COLUMNS, read_geometry = False, batch_size = batch_size, use_pyarrow = True) as (_, reader):
+            for batch in reader:
+                prefix = pc.utf8_slice_codeunits(batch.column("quadkey"), 0, zoom)
+                batches.append(batch.filter(pc.is_in(prefix, value_set = prefixes)))
+        data = pa.Table.from_batches(batches, schema = reader.schema).to_pandas()
+
+        # Tiles intersecting the region's bounding box
+        x, y, zoom_ = quadkey_to_tile(data.quadkey.to_numpy())
+        minx, miny, maxx, maxy = tile_bounds(x, y, zoom_)
+        bbox = get_boundaries().get("", 0, "coarse").total_bounds
+        keep = (maxx >= bbox[0]) & (minx <= bbox[2]) & (maxy >= bbox[1]) & (miny <= bbox[3])
+
+        # Tile centroids and compact types
+        data = data.assign(lon = (minx + maxx) / 2, lat = (miny + maxy) / 2)[keep].reset_index(drop = True)
+        data = data.astype({col: "int32" for col in TILE_COLUMNS[1:]})
+        data.to_parquet(path, index = False)
+
+    # Change units
+    data["avg_d_mbps"] = data.avg_d_kbps / 1000
+    data["avg_u_mbps"] = data.avg_u_kbps / 1000
+
+    if geometry:
+        x, y, zoom_ = quadkey_to_tile(data.quadkey.to_numpy())
+        data = gpd.GeoDataFrame(data, geometry = shapely.box(*tile_bounds(x, y, zoom_)), crs = "EPSG:4326")
+
+    return data
+
+# Admin crosswalk
+#------------------------------------------------------------
+# Note: the zoom-16 tile grid never changes, tiles are intersected with the
+# admin boundaries once and the crosswalk is reused for every quarter
+CROSSWALK_COLUMNS = ["quadkey","ADM0_PCODE","ADM1_PCODE","ADM2_PCODE","weight"]
+
+def _admin_units(code = "", resolution = "full"):
+    # Admin-2 units and their index, admin-1 units without admin-2 boundaries
+    # (e.g. BHS, BRB, BLZ, JAM, TTO) use the admin-1 code as admin-2 code (see `BoundaryRepository.units`)
+    return get_boundaries().units(code, resolution)
+
+def _intersect_tiles(quadkeys, code = "", resolution = "full"):
+    # Admin-2 units and area fractions of tiles (unmatched tiles are kept with weight 0)
+    shp, tree = _admin_units(code, resolution)
+    geoms = np.asarray(shp.geometry.values)
+    x, y, zoom = quadkey_to_tile(quadkeys)
+    boxes = shapely.box(*tile_bounds(x, y, zoom))
+
+    # Candidate pairs, tiles fully inside a unit need no overlay
+    idx, jdx = tree.query(boxes, predicate = "intersects")
+    weight   = np.ones(len(idx))
+    partial  = ~shapely.covers(geoms[jdx], boxes[idx])
+    # Note: tiles are ~600 m wide, planar areas in degrees are exact enough for fractions
+    weight[partial] = shapely.area(shapely.intersection(geoms[jdx[partial]], boxes[idx[partial]])) / shapely.area(boxes[idx[partial]])
+    keep = weight > 0
+
+    data = pd.DataFrame({"quadkey"   : quadkeys[idx[keep]],
+                         "ADM0_PCODE": shp.ADM0_PCODE.to_numpy()[jdx[keep]],
+                         "ADM1_PCODE": shp.ADM1_PCODE.to_numpy()[jdx[keep]],
+                         "ADM2_PCODE": shp.ADM2_PCODE.to_numpy()[jdx[keep]],
+                         "weight"    : weight[keep].astype("float32")})
+
+    # Tiles outside every unit (e.g. sea) are recorded so they are not intersected again
+    outside = quadkeys[np.bincount(idx[keep], minlength = len(quadkeys)) == 0]
+    outside = pd.DataFrame({"quadkey": outside, "weight": np.zeros(len(outside), dtype = "float32")})
+
+    return pd.concat([data, outside], ignore_index = True)[CROSSWALK_COLUMNS]
+
+# Crosswalk writes
+_crosswalk_lock = threading.Lock()
+
+def _stored_crosswalk(path, quadkeys, build, columns):
+    # Stored crosswalk, extended only with unseen quadkeys (`build`)
+    # Note: membership is tested on object arrays, much faster than on arrow-backed strings
+    quadkeys = pd.unique(np.asarray(quadkeys, dtype = str).astype(object))
+
+    # Note: the lock keeps concurrent quarters (see `update_panel`) from writing the file at the same time
+    with _crosswalk_lock:
+        data    = pd.read_parquet(path) if path.exists() else pd.DataFrame(columns = columns)
+        missing = quadkeys[~pd.Index(quadkeys, dtype = object).isin(pd.Index(data.quadkey, dtype = object))]
+        if len(missing) > 0:
+            new  = build(missing)
+            data = pd.concat([data, new], ignore_index = True) if len(data) > 0 else new
+            data = data.astype({col: "string" for col in columns[:-1]}).astype({"weight": "float32"})
+
+            # Note: written to a temporary file first, an interrupted write keeps the previous crosswalk
+            tmp = path.with_suffix(".tmp")
+            data.to_parquet(tmp, index = False)
+            os.replace(tmp, path)
+
+    # Requested tiles with overlap
+    data = data[pd.Index(data.quadkey, dtype = object).isin(quadkeys) & (data.weight > 0)].reset_index(drop = True)
+
+    return data
+
+def get_crosswalk(quadkeys, code = "", resolution = "full"):
+    """
+    gets the quadkey to admin units crosswalk
+    the crosswalk is stored locally and only extended with quadkeys that were
+    not seen before, tiles crossing admin borders get one row per unit with the
+    fraction of the tile area inside it
+
+    Parameters
+    ----------
+    quadkeys : array-like
+        zoom-16 quadkeys (e.g. `get_tiles(...).quadkey`)
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    resolution : str, optional
+        boundary resolution (default is `full`), including:
+            full
+            fine
+            medium
+            coarse
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with one row per tile and admin-2 unit (admin-1 units without
+        admin-2 boundaries count as their own admin-2 unit), including:
+            quadkey   : tile quadkey
+            ADM0_PCODE: admin-0 code
+            ADM1_PCODE: admin-1 code
+            ADM2_PCODE: admin-2 code
+            weight    : fraction of the tile area inside the unit
+    """
+
+    name = code.lower() if code else "lac"
+    # Note: version 2 adds the admin-1 units without admin-2 boundaries (older crosswalks are rebuilt)
+    path = get_cache_dir("connectivity", "crosswalk") / f"{name}-{resolution}-v2.parquet"
+
+    return _stored_crosswalk(path, quadkeys, lambda missing : _intersect_tiles(missing, code, resolution), CROSSWALK_COLUMNS)
+
+def join_admin(tiles, code = "", resolution = "full"):
+    """
+    joins tiles to their admin units through the crosswalk (no geometry work)
+    equivalent to the spatial join of tile polygons against admin-2 units, but
+    tiles crossing borders are split by area instead of duplicated
+
+    Parameters
+    ----------
+    tiles : pandas.DataFrame
+        dataframe with a `quadkey` column (e.g. `get_tiles`)
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    resolution : str, optional
+        boundary resolution (default is `full`)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        tiles with ADM0_PCODE, ADM1_PCODE, ADM2_PCODE and `weight` (fraction of
+        the tile inside the unit), one row per tile and unit; use `tests * weight`
+        as aggregation weights
+    """
+
+    crosswalk = get_crosswalk(tiles.quadkey, code, resolution)
+    data      = pd.DataFrame(tiles).merge(crosswalk, on = "quadkey", how = "inner")
+
+    return data
+
+
+# Connectivity panel
+#------------------------------------------------------------
+# Note: the panel is a Parquet dataset per region and boundary resolution, partitioned by
+# service, admin level, year and quarter,
+# e.g. panel/lac-full/service=fixed/level=2/year=2022/quarter=1/part-0.parquet
+LEVELS = [["ADM0_PCODE"],
+          ["ADM0_PCODE","ADM1_PCODE"],
+          ["ADM0_PCODE","ADM1_PCODE","ADM2_PCODE"]]
+
+def _panel(path, code, resolution):
+    # Panel folder of a region (country or LAC-26) and boundary resolution
+    name = code.lower() if code else "lac"
+
+    return (Path(path) if path else get_cache_dir("connectivity", "panel")) / f"{name}-{resolution}"
+
+def _partition(root, service, level, year, q):
+    return root / f"service={service}" / f"level={level}" / f"year={year}" / f"quarter={q}" / "part-0.parquet"
+
+def _published(years = None):
+    # Quarters since Ookla's first release (2019 Q1) that have already ended
+    today = datetime.today()
+    years = years or range(2019, today.year + 1)
+
+    return [(year, q) for year in years for q in [1, 2, 3, 4]
+            if (datetime(year + q // 4, q % 4 * 3 + 1, 1) <= today)]
+
+def aggregate_tiles(tiles, code = "", resolution = "full"):
+    """
+    aggregates Ookla tiles to admin-0, admin-1 and admin-2 units
+    tiles are joined through the crosswalk (see `join_admin`), speeds and
+    latency are averaged weighted by tests, tests and devices of tiles crossing
+    admin borders are apportioned by area
+
+    Parameters
+    ----------
+    tiles : pandas.DataFrame
+        dataframe with Ookla tiles (see `get_tiles`)
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    resolution : str, optional
+        boundary resolution (default is `full`)
+
+    Returns
+    ----------
+    list
+        dataframes per admin level (0, 1 and 2) with the admin codes,
+        avg_d_mbps_wt, avg_u_mbps_wt, avg_lat_ms_wt, tests, devices and count
+        (number of tiles, tiles crossing admin borders are apportioned by area
+        so that counts add up across units and levels)
+    """
+
+    data = join_admin(tiles, code, resolution)
+    data[["tests","devices"]] = data[["tests","devices"]].mul(data.weight, axis = 0)
+    data["count"] = data.weight
+
+    return weighted_aggregate(data, LEVELS, means = ["avg_d_mbps","avg_u_mbps","avg_lat_ms"], weight = "tests",
+                              sums = ["tests","devices","count"])
+
+def update_panel(services = ("fixed","mobile"), years = None, code = "", resolution = "full", force = False, max_workers = 4, path = None):
+    """
+    updates the connectivity panel with the quarters that are missing
+    quarters are ingested concurrently (see `get_tiles` and `aggregate_tiles`),
+    quarters already in the panel are not processed again unless `force`
+
+    Parameters
+    ----------
+    services : list, optional
+        services, fixed and/or mobile (default is both)
+    years : list, optional
+        years (default is every year since 2019, only quarters that already ended)
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    resolution : str, optional
+        boundary resolution (default is `full`)
+    force : bool, optional
+        process every quarter again, e.g. after a change of method (default is False)
+    max_workers : int, optional
+        number of quarters processed concurrently (default is 4)
+    path : str, optional
+        panel folder, with one panel per region and resolution (default is the local cache)
+
+    Returns
+    ----------
+    list
+        (service, year, quarter) ingested in this call
+    """
+
+    # Missing quarters (every admin level must be in the panel)
+    root    = _panel(path, code, resolution)
+    quarter = [(service, year, q) for service in services for year, q in _published(years)]
+    missing = [item for item in quarter
+               if force or not all(_partition(root, item[0], level, item[1], item[2]).exists() for level in range(len(LEVELS)))]
+
+    def ingest(item):
+        service, year, q = item
+        tiles  = get_tiles(service, year, q)
+        tables = aggregate_tiles(tiles, code, resolution)
+        for level, table in enumerate(tables):
+            file = _partition(root, service, level, year, q)
+            file.parent.mkdir(parents = True, exist_ok = True)
+
+            # Note: rows are sorted by admin code so that row group statistics can skip them on filtered reads
+            tmp = file.with_suffix(".tmp")
+            table.sort_values(LEVELS[level]).to_parquet(tmp, index = False, row_group_size = 10_000)
+            os.replace(tmp, file)
+        return item
+
+    # Boundaries and quadkey prefixes are loaded before the workers start (shared, read-only)
+    if len(missing) > 0:
+        get_lac_quadkeys()
+        _admin_units(code, resolution)
+
+    # Note: quarters not yet published by Ookla are skipped
+    ingested = []
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        futures = {item: pool.submit(ingest, item) for item in missing}
+        for item, future in futures.items():
+            try:
+                ingested.append(future.result())
+            except (pyogrio.errors.DataSourceError, OSError) as error:
+                print(f"Skipped {item[0]} {item[1]} Q{item[2]}: {error}")
+
+    return ingested
+
+def read_panel(service, level = 2, columns = None, filters = None, code = "", resolution = "full", path = None):
+    """
+    reads the connectivity panel
+    only the requested columns and the matching partitions (and row groups) are read
+
+    Parameters
+    ----------
+    service : str
+        type of the service - fixed or mobile
+    level : int, optional
+        admin level (default is 2)
+    columns : list, optional
+        columns to read (default is every column), e.g. ['year','quarter','avg_d_mbps_wt']
+    filters : list, optional
+        pyarrow filters, e.g. [('ADM2_PCODE','==','CO05001'), ('year','>=',2019)]
+    code : str, optional
+        country's isoalpha3 code the panel was built for (default is the LAC-26 region)
+    resolution : str, optional
+        boundary resolution the panel was built with (default is `full`)
+    path : str, optional
+        panel folder, with one panel per region and resolution (default is the local cache)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with one row per admin unit and quarter, including:
+            year         : year
+            quarter      : quarter
+            ADM*_PCODE   : admin codes
+            avg_d_mbps_wt: average download speed weighted by tests (Mbps)
+            avg_u_mbps_wt: average upload speed weighted by tests (Mbps)
+            avg_lat_ms_wt: average latency weighted by tests (ms)
+            tests        : number of tests
+            devices      : number of devices
+            count        : number of tiles (border tiles apportioned by area)
+    """
+
+    root = _panel(path, code, resolution) / f"service={service}" / f"level={level}"
+    data = pd.read_parquet(root, columns = columns, filters = filters, partitioning = "hive")
+
+    # Partition keys as integers, sorted by time
+    for col in ["year","quarter"]:
+        if col in data.columns:
+            data[col] = data[col].astype("int64")
+    keys = [col for col in ["year","quarter"] + LEVELS[level] if col in data.columns]
+    data = data[keys + [col for col in data.columns if col not in keys]]
+    data = data.sort_values(keys).reset_index(drop = True)
+
+    return data
+
+# H3 crosswalk
+#------------------------------------------------------------
+H3_COLUMNS = ["quadkey","hex_id","weight"]
+
+def _intersect_h3(quadkeys, resolution = 6, zoom = 11):
+    # H3 cells and area fractions of tiles, processed in blocks of nearby tiles
+    # (tiles sharing a zoom-11 quadkey prefix, ~20 km)
+    # Note: cells overlapping a block have their centre within one circumradius (~ edge length)
+    # of it, cells are taken from the block buffered by 1.5 edge lengths
+    edge   = 1.5 * h3.edge_length(resolution, "km") / 111.32
+    blocks = pd.Series(np.arange(len(quadkeys))).groupby(pd.Series(quadkeys).str[:zoom].to_numpy()).indices
+    data   = []
+
+    for prefix, idx in blocks.items():
+        # Candidate cells
+        x, y, zoom_ = quadkey_to_tile([prefix])
+        minx, miny, maxx, maxy = [bound[0] for bound in tile_bounds(x, y, zoom_)]
+        dx    = edge / np.cos(np.radians(max(abs(miny), abs(maxy)) + edge))
+        block = shapely.box(minx - dx, miny - edge, maxx + dx, maxy + edge)
+        cells = np.array(sorted(h3.polyfill(shapely.geometry.mapping(block), resolution, geo_json_conformant = True)), dtype = object)
+        hexes = np.array([shapely.Polygon(h3.h3_to_geo_boundary(cell, geo_json = True)) for cell in cells])
+
+        # Overlay, vectorized within the block
+        tiles    = quadkeys[idx]
+        x, y, zoom_ = quadkey_to_tile(tiles)
+        boxes    = shapely.box(*tile_bounds(x, y, zoom_))
+        i, j     = shapely.STRtree(hexes).query(boxes, predicate = "intersects")
+        weight   = shapely.area(shapely.intersection(boxes[i], hexes[j])) / shapely.area(boxes[i])
+        keep     = weight > 0
+        data.append(pd.DataFrame({"quadkey": tiles[i[keep]], "hex_id": cells[j[keep]], "weight": weight[keep]}))
+
+    return pd.concat(data, ignore_index = True)[H3_COLUMNS]
+
+def get_h3_crosswalk(quadkeys, resolution = 6):
+    """
+    gets the quadkey to H3 cells crosswalk
+    the crosswalk is stored locally per H3 resolution and only extended with
+    quadkeys that were not seen before, tiles get one row per overlapping cell
+    with the fraction of the tile area inside it
+
+    Parameters
+    ----------
+    quadkeys : array-like
+        zoom-16 quadkeys (e.g. `get_tiles(...).quadkey`)
+    resolution : int, optional
+        H3 resolution (default is 6, as in `get_access`)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with one row per tile and H3 cell, including:
+            quadkey: tile quadkey
+            hex_id : H3 cell
+            weight : fraction of the tile area inside the cell
+    """
+
+    path = get_cache_dir("connectivity", "h3") / f"res-{resolution}.parquet"
+
+    return _stored_crosswalk(path, quadkeys, lambda missing : _intersect_h3(missing, resolution), H3_COLUMNS)
+
+def aggregate_h3(tiles, resolution = 6):
+    """
+    reapportions Ookla tiles onto H3 cells
+    tiles are joined through the crosswalk (see `get_h3_crosswalk`), speeds and
+    latency are averaged weighted by tests, tests and devices are apportioned
+    by area; the result can be merged with population coverage on `hex_id`
+
+    Parameters
+    ----------
+    tiles : pandas.DataFrame
+        dataframe with Ookla tiles (see `get_tiles`)
+    resolution : int, optional
+        H3 resolution (default is 6)
+
+    Returns
+    ----------
+    pandas.DataFrame
+        dataframe with hex_id, avg_d_mbps_wt, avg_u_mbps_wt, avg_lat_ms_wt,
+        tests, devices and count (number of tiles, tiles crossing cells are
+        apportioned by area)
+    """
+
+    data = pd.DataFrame(tiles).merge(get_h3_crosswalk(tiles.quadkey, resolution), on = "quadkey", how = "inner")
+    data[["tests","devices"]] = data[["tests","devices"]].mul(data.weight, axis = 0)
+    data["count"] = data.weight
+
+    return weighted_aggregate(data, ["hex_id"], means = ["avg_d_mbps","avg_u_mbps","avg_lat_ms"], weight = "tests",
+                              sums = ["tests","devices","count"])
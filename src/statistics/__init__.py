@@ -1,9 +1,29 @@
-from .stats import calculate_stats, palettes, expand_colors, create_bivariate
-
-__all__ = [
-    'calculate_stats',
-    'palettes',
-    'expand_colors',
-    'create_bivariate'
-]
-            
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first access (see `__getattr__`)
+_modules = {
+    'calculate_stats'    : '.stats',
+    'weighted_aggregate' : '.aggregate',
+    'palettes'           : '.stats',
+    'expand_colors'      : '.stats',
+    'create_bivariate'   : '.stats',
+    'project_geometries' : '.render',
+    'rasterize_polygons' : '.render',
+    'bivariate_legend'   : '.render',
+    'export_maps'        : '.export',
+    'QuantileSketch'     : '.classing',
+    'iter_parquet'       : '.classing',
+    'quantile_breaks'    : '.classing',
+    'classify'           : '.classing',
+    'bivariate_classes'  : '.classing'
+}
+
+__all__ = list(_modules)
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return __all__
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+def weighted_aggregate(data, levels, means = None, weight = "tests", sums = None, count = False):
+    """
+    weighted means, sums and counts by group in a single vectorized pass
+    partial sums (weight, value * weight) are computed once at the finest level
+    and rolled up to the coarser levels, without per-group Python code
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        dataframe to aggregate
+    levels : list
+        list of group fields, or list of lists of group fields for several
+        levels, ordered from coarse to fine, e.g.
+        [['ADM0_PCODE'], ['ADM0_PCODE','ADM1_PCODE'], ['ADM0_PCODE','ADM1_PCODE','ADM2_PCODE']]
+        every level must be a subset of the finest one
+    means : list, optional
+        columns to average, stored as `{column}_wt` (default is None)
+    weight : str or array-like, optional
+        weight column name or values, e.g. tests * area weight (default is `tests`)
+    sums : list, optional
+        columns to sum (default is None)
+    count : bool, optional
+        add the number of rows per group as `count` (default is False)
+
+    Returns
+    ----------
+    pandas.DataFrame or list
+        dataframe with the group fields and aggregates (a list of dataframes,
+        one per level, if several levels are given)
+    """
+
+    # Inputs
+    single = not isinstance(levels[0], (list, tuple))
+    levels = [list(levels)] if single else [list(level) for level in levels]
+    finest = max(levels, key = len)
+    means  = means or []
+    sums   = sums or []
+    weight = data[weight] if isinstance(weight, str) else pd.Series(np.asarray(weight, dtype = "float64"), index = data.index)
+
+    # Partial sums per row
+    # Note: missing values are left out of both the numerator and the weights (as in `np.nansum`)
+    parts = {f"{col}_wt": data[col] * weight for col in means}
+    parts.update({f"{col}_w": weight.where(data[col].notna(), 0) for col in means})
+    parts.update({f"{col}_sum": data[col] for col in sums})
+    parts = pd.DataFrame(parts, index = data.index)
+    if count:
+        parts["count"] = 1
+    parts = pd.concat([data[finest], parts], axis = 1)
+
+    # Finest level, then roll up
+    partial = parts.groupby(finest, sort = True, observed = True).sum(min_count = 0)
+
+    results = []
+    for level in levels:
+        table = partial if len(level) == len(finest) else partial.groupby(level = level, sort = True).sum()
+        table = table.reset_index()
+        for col in means:
+            table[f"{col}_wt"] = table[f"{col}_wt"] / table.pop(f"{col}_w")
+        table = table.rename(columns = {f"{col}_sum": col for col in sums})
+        results.append(table[level + [f"{col}_wt" for col in means] + sums + (["count"] if count else [])])
+
+    return results[0] if single else results
@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+class QuantileSketch:
+    """
+    streaming quantile sketch with bounded memory (deterministic compactors)
+    values are kept in levels, level i holds values with weight 2**i; a full
+    level is sorted and every other value (alternating offsets) is promoted,
+    the rank error is about log2(n / capacity) / capacity, sketches of chunks
+    or partitions can be merged
+
+    Parameters
+    ----------
+    capacity : int, optional
+        values per level (default is 4096)
+    """
+
+    def __init__(self, capacity = 4096):
+        self.capacity = capacity
+        self.levels   = [np.empty(0)]
+        self.offsets  = [0]
+        self.count    = 0
+        self.min      = np.inf
+        self.max      = -np.inf
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) <= self.capacity:
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+                self.offsets.append(0)
+
+            # Promote every other value, an odd value out stays in the level
+            values = np.sort(values)
+            keep   = values[-1:] if len(values) % 2 else values[:0]
+            values = values[:len(values) - len(keep)]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], values[self.offsets[level]::2]])
+            self.levels[level]     = keep
+            self.offsets[level]    = 1 - self.offsets[level]
+            level += 1
+
+    def update(self, values):
+        """
+        adds values (missing values are ignored)
+
+        Parameters
+        ----------
+        values : array-like
+            values
+
+        Returns
+        ----------
+        QuantileSketch
+            the sketch
+        """
+
+        values = np.asarray(values, dtype = "float64").ravel()
+        values = values[~np.isnan(values)]
+        if len(values) > 0:
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+        self.count    += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+        return self
+
+    def merge(self, other):
+        """
+        merges another sketch (e.g. from another partition)
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            sketch
+
+        Returns
+        ----------
+        QuantileSketch
+            the sketch
+        """
+
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+                self.offsets.append(0)
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self.min    = min(self.min, other.min)
+        self.max    = max(self.max, other.max)
+        self._compact()
+
+        return self
+
+    def quantile(self, q):
+        """
+        gets approximate quantiles
+
+        Parameters
+        ----------
+        q : float or array-like
+            quantiles between 0 and 1
+
+        Returns
+        ----------
+        numpy.ndarray
+            quantile values (lowest value above the requested rank, the
+            minimum and maximum are exact)
+        """
+
+        values  = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2.0 ** level) for level, values in enumerate(self.levels)])
+        order   = np.argsort(values, kind = "stable")
+        values  = values[order]
+        ranks   = np.cumsum(weights[order]) / weights.sum()
+        q       = np.atleast_1d(q)
+        values  = values[np.clip(np.searchsorted(ranks, q, side = "left"), 0, len(values) - 1)]
+
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, values))
+
+def iter_parquet(path, columns, batch_size = 1_000_000):
+    """
+    reads a Parquet file in batches of rows (only the selected columns)
+
+    Parameters
+    ----------
+    path : str
+        Parquet file
+    columns : list
+        columns to read
+    batch_size : int, optional
+        rows per batch (default is 1,000,000)
+
+    Returns
+    ----------
+    generator
+        pandas.DataFrame per batch
+    """
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size = batch_size, columns = columns):
+        yield batch.to_pandas()
+
+def _chunks(data, column = None):
+    # Values from an array, a Series, a DataFrame or an iterable of chunks
+    if isinstance(data, (np.ndarray, pd.Series, pd.DataFrame)):
+        data = [data]
+    for chunk in data:
+        yield np.asarray(chunk[column] if column is not None else chunk, dtype = "float64")
+
+def quantile_breaks(data, size, column = None, method = "exact", capacity = 4096):
+    """
+    computes the quantile breaks of a variable, over a whole array or over
+    chunks (e.g. `iter_parquet` or table partitions) without loading the
+    tables whole; missing values are ignored
+
+    Parameters
+    ----------
+    data : array-like or iterable
+        values, or iterable of chunks (arrays, Series or DataFrames)
+    size : int
+        number of classes
+    column : str, optional
+        column of the DataFrames (default is None)
+    method : str, optional
+        method (default is `exact`), including:
+            exact      : exact quantiles (only the column is kept in memory)
+            approximate: streaming sketch with bounded memory (see `QuantileSketch`)
+    capacity : int, optional
+        values per sketch level for `approximate` (default is 4096)
+
+    Returns
+    ----------
+    numpy.ndarray
+        size + 1 breaks, from the minimum to the maximum
+    """
+
+    q = np.linspace(0, 1, size + 1)
+
+    if method == "exact":
+        values = np.concatenate([chunk[~np.isnan(chunk)] for chunk in _chunks(data, column)])
+        return np.quantile(values, q)
+    elif method == "approximate":
+        sketch = QuantileSketch(capacity)
+        for chunk in _chunks(data, column):
+            sketch.update(chunk)
+        return sketch.quantile(q)
+    else:
+        raise ValueError("Method must be within ['exact','approximate']")
+
+def classify(values, breaks):
+    """
+    assigns classes with the quantile breaks (vectorized)
+    classes are right-closed as in `pandas.qcut`, the minimum falls in the
+    first class; tied values always get the same class, whatever the order of
+    the rows, so classes are reproducible
+
+    Parameters
+    ----------
+    values : array-like
+        values
+    breaks : array-like
+        breaks (see `quantile_breaks`)
+
+    Returns
+    ----------
+    numpy.ndarray
+        class per value, from 0 to len(breaks) - 2 (-1 for missing values)
+    """
+
+    values  = np.asarray(values, dtype = "float64")
+    breaks  = np.asarray(breaks, dtype = "float64")
+    classes = np.searchsorted(breaks[1:-1], values, side = "left")
+    classes = np.clip(classes, 0, len(breaks) - 2)
+
+    return np.where(np.isnan(values), -1, classes)
+
+def bivariate_classes(x, y, breaks_x, breaks_y, palette, missing = "#d3d3d3"):
+    """
+    assigns bivariate classes and colours with vectorized lookups
+
+    Parameters
+    ----------
+    x : array-like
+        first variable
+    y : array-like
+        second variable
+    breaks_x : array-like
+        breaks of the first variable
+    breaks_y : array-like
+        breaks of the second variable
+    palette : list
+        colours ordered by x class and then by y class (size * size)
+    missing : str, optional
+        colour for missing values (default is `#d3d3d3`)
+
+    Returns
+    ----------
+    tuple
+        arrays with x class, y class (-1 for missing values) and colour
+    """
+
+    size  = len(breaks_x) - 1
+    cx    = classify(x, breaks_x)
+    cy    = classify(y, breaks_y)
+    valid = (cx >= 0) & (cy >= 0)
+    color = np.asarray(list(palette) + [missing], dtype = object)[np.where(valid, cx * size + cy, -1)]
+
+    return cx, cy, color
@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import geopandas as gpd
+
+from src.utilities.boundaries import get_boundaries
+
+def _init_worker():
+    # Headless rendering in every worker
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _read(data):
+    # Map data from a GeoDataFrame or a file (GeoParquet or any vector format)
+    if isinstance(data, gpd.GeoDataFrame):
+        return data
+    if str(data).endswith(".parquet"):
+        return gpd.read_parquet(data)
+
+    return gpd.read_file(data)
+
+def _render(spec, folder, fmt, dpi, backend):
+    # Renders and saves one map, returns its timing
+    import matplotlib.pyplot as plt
+    from src.statistics.stats import create_bivariate
+
+    start = time.perf_counter()
+    data  = _read(spec["data"])
+    data  = data.rename(columns = {spec.get("x", "x"): "x", spec.get("y", "y"): "y"})
+    read  = time.perf_counter() - start
+
+    fig = create_bivariate(data,
+                           size         = spec.get("size", 3),
+                           palette_name = spec.get("palette_name", "cividis"),
+                           labels       = spec.get("labels", ("varx","vary")),
+                           backend      = spec.get("backend", backend),
+                           breaks       = spec.get("breaks"),
+                           show         = False)
+
+    # Basemap boundaries (outline), read from the local boundaries cache
+    if spec.get("level") is not None:
+        ax  = fig.axes[0]
+        lim = ax.get_xlim(), ax.get_ylim()
+        shp = get_boundaries().get(spec.get("code", ""), spec["level"], spec.get("resolution", "medium"))
+        shp.to_crs("EPSG:3857").boundary.plot(ax = ax, color = "black", linewidth = 0.3)
+        ax.set_xlim(lim[0])
+        ax.set_ylim(lim[1])
+
+    path = os.path.join(folder, f"{spec['name']}.{fmt}")
+    fig.savefig(path, dpi = dpi, bbox_inches = "tight")
+    plt.close(fig)
+
+    return {"name": spec["name"], "path": path, "rows": len(data), "read": read, "seconds": time.perf_counter() - start}
+
+def export_maps(specs, folder, fmt = "png", dpi = 100, backend = "raster", max_workers = None):
+    """
+    renders a batch of bivariate maps (see `create_bivariate`) to files
+    maps are rendered concurrently in a process pool on the headless Agg backend,
+    the basemap boundaries of every map are cached locally before the pool
+    starts so workers share them (see `get_boundaries`)
+
+    Parameters
+    ----------
+    specs : list
+        list of map specifications (dict), including:
+            name        : output file name (without extension)
+            data        : GeoDataFrame or file with the map data (GeoParquet or any vector format)
+            x           : column for the first variable (default is `x`)
+            y           : column for the second variable (default is `y`)
+            size        : number of classes (default is 3)
+            palette_name: palette name (default is `cividis`)
+            labels      : axis labels (default is ('varx','vary'))
+            backend     : rendering backend (default is `backend`)
+            breaks      : x and y quantile breaks, e.g. shared by a map series (default is the map's own)
+            code        : country's isoalpha3 code for the basemap (default is the LAC-26 region)
+            level       : admin level of the basemap boundaries (default is None, no basemap)
+            resolution  : basemap resolution (default is `medium`)
+    folder : str
+        output folder
+    fmt : str, optional
+        output format, png or svg (default is `png`)
+    dpi : int, optional
+        output resolution (default is 100)
+    backend : str, optional
+        default rendering backend, raster or matplotlib (default is `raster`)
+    max_workers : int, optional
+        number of processes (default is the number of CPUs)
+
+    Returns
+    ----------
+    list
+        timing per map (name, path, rows, read and total seconds), in completion order
+    """
+
+    os.makedirs(folder, exist_ok = True)
+
+    # Cache basemaps once (local GeoParquet), workers read them from disk
+    repo = get_boundaries()
+    for key in {(spec.get("code", ""), spec["level"], spec.get("resolution", "medium")) for spec in specs if spec.get("level") is not None}:
+        repo.get(*key)
+
+    # Render
+    start   = time.perf_counter()
+    timings = []
+    with ProcessPoolExecutor(max_workers = max_workers, initializer = _init_worker) as pool:
+        futures = {pool.submit(_render, spec, folder, fmt, dpi, backend): spec["name"] for spec in specs}
+        for future in as_completed(futures):
+            try:
+                timing = future.result()
+            except Exception as error:
+                print(f"{futures[future]}: failed ({error})")
+                continue
+            timings.append(timing)
+            print(f"{timing['name']}: {timing['seconds']:.2f} s ({timing['rows']:,} rows)")
+
+    print(f"{len(timings)} of {len(specs)} maps in {time.perf_counter() - start:.2f} s")
+
+    return timings
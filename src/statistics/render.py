@@ -0,0 +1,154 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import shapely
+import matplotlib.colors as colors
+from rasterio.features import rasterize
+from rasterio.transform import from_bounds
+
+# Rendered layers (polygon ids and edges) by geometry content, width and CRS
+# Note: maps of the same layer (e.g. several indicators) only recolour the cached ids
+_layers  = OrderedDict()
+_maxsize = 8
+
+def _digest(geoms):
+    # Content hash of geometries (WKB)
+    return hashlib.md5(b"".join(shapely.to_wkb(geoms))).hexdigest()
+
+def project_geometries(geometry, crs = "EPSG:3857", width = 1600):
+    """
+    projects and simplifies geometries for rendering
+    vertices closer than half a pixel are removed
+
+    Parameters
+    ----------
+    geometry : geopandas.GeoSeries
+        geometries (any CRS)
+    crs : str, optional
+        output CRS (default is `EPSG:3857`)
+    width : int, optional
+        output width in pixels, defines the simplification tolerance (default is 1600)
+
+    Returns
+    ----------
+    tuple
+        array of projected geometries and their bounds (minx, miny, maxx, maxy)
+    """
+
+    geoms     = np.asarray(geometry.to_crs(crs).values)
+    bounds    = tuple(shapely.total_bounds(geoms))
+    tolerance = (bounds[2] - bounds[0]) / width / 2
+
+    return shapely.simplify(geoms, tolerance), bounds
+
+def _layer(geometry, width, crs):
+    # Polygon ids (row number + 1, 0 is background) and edges burned once per layer
+    key = (_digest(np.asarray(geometry.values)), str(geometry.crs), crs, width)
+    if key in _layers:
+        _layers.move_to_end(key)
+        return _layers[key]
+
+    geoms, (minx, miny, maxx, maxy) = project_geometries(geometry, crs, width)
+    height    = max(1, int(round(width * (maxy - miny) / (maxx - minx))))
+    transform = from_bounds(minx, miny, maxx, maxy, width, height)
+    valid     = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+
+    labels = rasterize(zip(geoms[valid], np.flatnonzero(valid) + 1), out_shape = (height, width),
+                       transform = transform, fill = 0, dtype = "int32")
+
+    # Edges: pixels whose right or lower neighbour belongs to another polygon (or the background)
+    edges = np.zeros((height, width), dtype = bool)
+    diff  = labels[:, 1:] != labels[:, :-1]
+    edges[:, 1:] |= diff
+    edges[:, :-1] |= diff
+    diff  = labels[1:] != labels[:-1]
+    edges[1:] |= diff
+    edges[:-1] |= diff
+    edges &= labels > 0
+
+    _layers[key] = {"labels": labels, "edges": edges, "extent": (minx, maxx, miny, maxy)}
+    while len(_layers) > _maxsize:
+        _layers.popitem(last = False)
+
+    return _layers[key]
+
+def rasterize_polygons(geometry, color, width = 1600, edgecolor = None, linewidth = 0.1, dpi = 100, crs = "EPSG:3857"):
+    """
+    renders polygons straight into an RGBA image buffer (no matplotlib patches)
+    polygons are projected, simplified and burned with their row number once
+    per layer (in-memory LRU), colours are applied with a lookup table, edges
+    are blended with the pixel coverage of a line of `linewidth` points
+
+    Parameters
+    ----------
+    geometry : geopandas.GeoSeries
+        polygons (any CRS)
+    color : array-like
+        colour per polygon (hex or any matplotlib colour, missing values are transparent)
+    width : int, optional
+        image width in pixels (default is 1600)
+    edgecolor : str, optional
+        edge colour (default is None, no edges)
+    linewidth : float, optional
+        edge width in points (default is 0.1)
+    dpi : int, optional
+        resolution used to convert the edge width to pixels (default is 100)
+    crs : str, optional
+        output CRS (default is `EPSG:3857`)
+
+    Returns
+    ----------
+    tuple
+        RGBA image (uint8, height x width x 4) and its extent (minx, maxx, miny, maxy)
+    """
+
+    layer = _layer(geometry, width, crs)
+
+    # Colour lookup table, one entry per unique colour
+    codes, unique = pd.factorize(pd.Series(color, dtype = object), use_na_sentinel = True)
+    palette = np.zeros((len(unique) + 1, 4), dtype = "uint8")
+    if len(unique) > 0:
+        palette[1:] = np.round(colors.to_rgba_array(list(unique)) * 255)
+    lut   = np.concatenate([[0], codes + 1])
+    image = palette[lut[layer["labels"]]]
+
+    # Edges, blended with their pixel coverage
+    if edgecolor is not None:
+        edges = layer["edges"]
+        alpha = min(1, linewidth * dpi / 72)
+        edge  = np.array(colors.to_rgba(edgecolor)) * 255
+        image[edges] = np.round(image[edges] * (1 - alpha) + edge * alpha).astype("uint8")
+
+    return image, layer["extent"]
+
+def bivariate_legend(palette, size, alpha = 0.8, cell = 32):
+    """
+    renders the bivariate legend matrix into an RGBA image buffer
+    columns follow the x classes and rows the y classes (origin at the bottom left)
+
+    Parameters
+    ----------
+    palette : list
+        colours ordered by x class and then by y class (size * size)
+    size : int
+        number of classes
+    alpha : float, optional
+        legend opacity (default is 0.8)
+    cell : int, optional
+        pixels per class (default is 32)
+
+    Returns
+    ----------
+    numpy.ndarray
+        RGBA image (uint8)
+    """
+
+    rgba = np.round(colors.to_rgba_array(palette) * 255).astype("uint8")
+    rgba[:, 3] = round(alpha * 255)
+
+    # Matrix (x class by column, y class by row from the bottom)
+    matrix = rgba.reshape(size, size, 4).transpose(1, 0, 2)[::-1]
+
+    return np.repeat(np.repeat(matrix, cell, axis = 0), cell, axis = 1)
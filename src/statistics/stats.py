@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import numpy as np 
 import pandas as pd 
 import geopandas as gpd
@@ -8,6 +10,10 @@ import matplotlib.colors
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 
+from src.statistics.aggregate import weighted_aggregate
+from src.statistics.render import rasterize_polygons, bivariate_legend
+from src.statistics.classing import quantile_breaks, bivariate_classes
+
 sns.set_style("darkgrid")
 
 def calculate_stats(data, group_fields):
@@ -15,6 +21,7 @@ def calculate_stats(data, group_fields):
     code based on Ookla's Github repository tutorials
     https://github.com/teamookla/ookla-open-data/blob/master/tutorials
     calculates weighted average of the download and upload speeds and total tests
+    (see `weighted_aggregate`)
 
     Parameters
     ----------
@@ -29,23 +36,7 @@ def calculate_stats(data, group_fields):
         GeoDataFrame with the calculated stats
     """
     
-    return (
-        data.groupby(group_fields)
-        .apply(
-            lambda x: pd.Series(
-                {"avg_d_mbps_wt": np.average(x["avg_d_mbps"], weights=x["tests"]),
-                "avg_u_mbps_wt": np.average(x["avg_u_mbps"], weights=x["tests"])
-                }
-            )
-        )
-        .reset_index()
-        .merge(
-            data.groupby(group_fields)
-            .agg(tests=("tests", "sum"))
-            .reset_index(),
-            on=group_fields,
-        )
-    )
+    return weighted_aggregate(data, list(group_fields), means = ["avg_d_mbps","avg_u_mbps"], weight = "tests", sums = ["tests"])
 
 # Define color palettes
 color_sets = {
@@ -72,85 +63,79 @@ def palettes():
     plt.tight_layout()
     plt.show()
 
+@lru_cache(maxsize = 64)
+def _expand_colors(base_colors, new_size):
+    # Bilinear interpolation of the whole grid (memoized per palette and size)
+    original_size = int(len(base_colors)**0.5)
+    base = colors.to_rgba_array(list(base_colors)).reshape(original_size, original_size, 4)
+    
+    # Position of every output row (i) and column (j) in the base grid
+    x  = np.arange(new_size) / (new_size - 1) * (original_size - 1)
+    x0 = x.astype(int)
+    x1 = np.minimum(x0 + 1, original_size - 1)
+    wx = (x - x0)[:, None, None]
+    wy = (x - x0)[None, :, None]
+    
+    # Note: same operations and order as the cell-by-cell formula, hex values are identical
+    interpolated = (
+        base[x0][:, x0] * (1 - wx) * (1 - wy) +
+        base[x0][:, x1] * (1 - wx) * wy +
+        base[x1][:, x0] * wx * (1 - wy) +
+        base[x1][:, x1] * wx * wy
+    )
+    rgb = np.round(interpolated[..., :3].reshape(-1, 3) * 255).astype(int)
+    
+    return tuple(f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb)
+
 def expand_colors(base_colors, new_size):
     original_size = int(len(base_colors)**0.5)
     assert new_size > original_size, "New size must be larger than original size"
     
-    new_colors = []
-    for i in range(new_size):
-        for j in range(new_size):
-            x = i / (new_size - 1) * (original_size - 1)
-            y = j / (new_size - 1) * (original_size - 1)
-            x0, x1 = int(x), min(int(x) + 1, original_size - 1)
-            y0, y1 = int(y), min(int(y) + 1, original_size - 1)
-            
-            f00 = base_colors[x0 * original_size + y0]
-            f01 = base_colors[x0 * original_size + y1]
-            f10 = base_colors[x1 * original_size + y0]
-            f11 = base_colors[x1 * original_size + y1]
-            
-            c0 = np.array(colors.to_rgba(f00))
-            c1 = np.array(colors.to_rgba(f01))
-            c2 = np.array(colors.to_rgba(f10))
-            c3 = np.array(colors.to_rgba(f11))
-            
-            weight_x = x - x0
-            weight_y = y - y0
-            
-            interpolated_color = (
-                c0 * (1 - weight_x) * (1 - weight_y) +
-                c1 * (1 - weight_x) * weight_y +
-                c2 * weight_x * (1 - weight_y) +
-                c3 * weight_x * weight_y
-            )
-            new_colors.append(colors.to_hex(interpolated_color))
-    
-    return new_colors
+    return list(_expand_colors(tuple(base_colors), new_size))
 
 # Note: base on public notebook
 # Source: https://github.com/mikhailsirenko/bivariate-choropleth/blob/main/bivariate-choropleth.ipynb
-def create_bivariate(data, x = 'x', y = 'y', size = 3, palette_name = 'cividis', labels = ('varx','vary')):
-    # Add small noise to avoid duplicate bin edges
-    data['x'] = data['x'] + np.random.normal(0, 1e-6, len(data))
-    data['y'] = data['y'] + np.random.normal(0, 1e-6, len(data))
-    
-    # Create bins
-    var1_lab = [str(i+1) for i in range(size)]
-    var2_lab = [chr(i).upper() for i in range(ord('a'),ord('z')+1)][:size]
-    
-    data['Var1_Class'] = pd.qcut(data['x'], size, labels = var1_lab).astype(str)
-    data['Var2_Class'] = pd.qcut(data['y'], size, labels = var2_lab).astype(str)
-    data['Bi_Class']   = data['Var1_Class'] + data['Var2_Class']
-    data['Bi_Class']   = np.where(data['Var1_Class'] == "nan",np.nan,data['Bi_Class'])
-    data['Bi_Class']   = np.where(data['Var2_Class'] == "nan",np.nan,data['Bi_Class'])
-    
+def create_bivariate(data, x = 'x', y = 'y', size = 3, palette_name = 'cividis', labels = ('varx','vary'), backend = 'matplotlib', show = True, breaks = None):
+    # Note: backend `raster` burns the polygons into an image buffer (see `rasterize_polygons`),
+    # much faster and lighter than matplotlib patches for LAC-wide admin-2 or H3 maps
+    # Note: classes come from exact quantile breaks, tied values share their class (no random noise),
+    # `breaks` (x and y breaks) can be computed beforehand over a larger table (see `quantile_breaks`)
     # Define colors for matrix legend
-    base    = [f"{i}{j}" for i in var1_lab for j in var2_lab]
     palette = color_sets[palette_name]
-    
-    if len(base) == len(palette):
-        # Create color column
-        data['Bi_Color'] = data['Bi_Class'].replace(dict(zip(base, palette)))
-        all_colors       = palette
-    else: 
-        # Create color column
-        ncolor = expand_colors(palette, size)
-        data['Bi_Color'] = data['Bi_Class'].replace(dict(zip(base, ncolor)))
-        all_colors       = ncolor  
-    
-    # Missing values
-    data['Bi_Color'] = np.where(data['Bi_Class'].isna(),"#d3d3d3",data['Bi_Color'])
+    if size * size != len(palette):
+        palette = expand_colors(palette, size)
+    all_colors = palette
+
+    # Create bins
+    # Note: the caller's frame is not modified
+    breaks_x, breaks_y = breaks if breaks is not None else (quantile_breaks(data[x], size), quantile_breaks(data[y], size))
+    cx, cy, color = bivariate_classes(data[x], data[y], breaks_x, breaks_y, palette)
+
+    var1_lab = np.array([str(i+1) for i in range(size)] + ['nan'], dtype = object)
+    var2_lab = np.array([chr(i).upper() for i in range(ord('a'),ord('z')+1)][:size] + ['nan'], dtype = object)
+    bi_class = np.where((cx >= 0) & (cy >= 0), var1_lab[cx] + var2_lab[cy], np.nan)
+
+    data = data.assign(Var1_Class = var1_lab[cx], Var2_Class = var2_lab[cy], Bi_Class = bi_class, Bi_Color = color)
     
     # Map 
     fig, ax = plt.subplots(figsize = (8,8))
 
     # Step 1: Map
-    data.to_crs('EPSG:3857').plot(ax    = ax, 
-                                  color = data['Bi_Color'],
-                                  categorical = True, 
-                                  legend      = False,
-                                  linewidth   = 0.1,
-                                  edgecolor   = 'black') 
+    if backend == 'raster':
+        width = int(fig.get_size_inches()[0] * fig.dpi)
+        image, extent = rasterize_polygons(data.geometry, data['Bi_Color'], width = width, edgecolor = 'black', linewidth = 0.1, dpi = fig.dpi)
+        ax.imshow(image, extent = extent, interpolation = 'nearest')
+        ax.use_sticky_edges = False
+        ax.margins(0.05)
+    elif backend == 'matplotlib':
+        data.to_crs('EPSG:3857').plot(ax    = ax, 
+                                      color = data['Bi_Color'],
+                                      categorical = True, 
+                                      legend      = False,
+                                      linewidth   = 0.1,
+                                      edgecolor   = 'black') 
+    else:
+        raise ValueError("Backend must be within ['matplotlib','raster']")
     #ctx.add_basemap(ax = ax, source = ctx.providers.CartoDB.Positron) 
     plt.tight_layout() 
     plt.axis('off') 
@@ -165,14 +150,17 @@ def create_bivariate(data, x = 'x', y = 'y', size = 3, palette_name = 'cividis',
     ax2   = fig.add_axes([legend_x, legend_y, legend_width, legend_height]) 
     alpha = .8
     
-    for col in range(size):
-        for row in range(size):
-            xmin = col / size
-            xmax = (col + 1) / size
-            ymin = row / size
-            ymax = (row + 1) / size
-            color_index = col * size + row
-            ax2.axvspan(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, alpha=alpha, color=all_colors[color_index])
+    if backend == 'raster':
+        ax2.imshow(bivariate_legend(all_colors, size, alpha), extent = (0, 1, 0, 1), aspect = 'auto', interpolation = 'nearest')
+    else:
+        for col in range(size):
+            for row in range(size):
+                xmin = col / size
+                xmax = (col + 1) / size
+                ymin = row / size
+                ymax = (row + 1) / size
+                color_index = col * size + row
+                ax2.axvspan(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, alpha=alpha, color=all_colors[color_index])
     
     # Step 3: Legend text
     ax2.tick_params(axis='both', which='both', length=0) # remove ticks from the big box
@@ -182,4 +170,7 @@ def create_bivariate(data, x = 'x', y = 'y', size = 3, palette_name = 'cividis',
     ax2.text(s=labels[0], x=0.1, y=-0.25, fontsize = 8) # annotate x axis
     ax2.text(s=labels[1], x=-0.25, y=0.1, rotation=90, fontsize = 8); # annotate y axis
     
-    plt.show()
\ No newline at end of file
+    if show:
+        plt.show()
+
+    return fig
\ No newline at end of file
@@ -1,15 +1,37 @@
-from .auxiliary_data import get_iadb, get_country_shp
-from .general        import quarter_start, find_best_match, normalize_text
-from .metadata       import get_metadata
-from .example        import get_data_types
-
-__all__ = [
-    'get_iadb',
-    'get_country_shp',
-    'quarter_start',
-    'find_best_match',
-    'normalize_text',
-    'get_metadata',
-    'get_data_types'
-]
-            
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first access (see `__getattr__`)
+_modules = {
+    'get_iadb'          : '.auxiliary_data',
+    'get_iadb_lookup'   : '.auxiliary_data',
+    'get_country_shp'   : '.auxiliary_data',
+    'get_boundaries'    : '.boundaries',
+    'get_env'           : '.clients',
+    'get_s3'            : '.clients',
+    'get_s3_bucket'     : '.clients',
+    'get_storage'       : '.storage',
+    'set_storage'       : '.storage',
+    'S3Storage'         : '.storage',
+    'LocalStorage'      : '.storage',
+    'MemoryStorage'     : '.storage',
+    'quarter_start'     : '.general',
+    'find_best_match'   : '.general',
+    'normalize_text'    : '.general',
+    'get_cache_dir'     : '.general',
+    'check_import_time' : '.general',
+    'get_metadata'      : '.metadata',
+    'extract_metadata'  : '.metadata',
+    'read_defaults'     : '.metadata',
+    'catalog_metadata'  : '.metadata',
+    'get_data_types'    : '.example'
+}
+
+__all__ = list(_modules)
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return __all__
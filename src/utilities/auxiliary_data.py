@@ -1,24 +1,25 @@
-import os
-import io
-import boto3
-import dotenv
+import json
 
 import pandas as pd
-import geopandas as gpd
 
-dotenv.load_dotenv()
-s3          = boto3.client('s3')
-sclbucket   = os.environ.get("sclbucket")
-scldatalake = os.environ.get("scldatalake")
+from .general    import get_cache_dir, normalize_text
+from .storage    import get_storage
+from .boundaries import get_boundaries
 
-def get_iadb():
+# In-process cache for IADB country names
+_iadb = {}
+
+def get_iadb(refresh = False):
     """
     process data to obtain the spanish and english country names for IADB countries
+    results are memoized in-process and on disk, the disk copy is reused 
+    while the S3 object's ETag does not change
     TODO: dataset must be updated directly in the Data Lake to eliminate this step
     
     Parameters
     ----------
-    None
+    refresh : bool, optional
+        ignore cached copies and read the file from S3 (default is False)
     
     Returns
     ----------
@@ -26,15 +27,32 @@ def get_iadb():
         dataframe with IADB country names (EN/SP) and isoalpha3 codes 
     """
     
+    # In-process cache 
+    if "data" in _iadb and not refresh:
+        return _iadb["data"].copy()
+    
     # Import country names
         # Define path and S3 object 
     path = "Manuals and Standards/IADB country and area codes for statistical use"
     file = "IADB_country_codes_admin_0.xlsx"
-    obj  = s3.get_object(Bucket = sclbucket, Key = f"{path}/{file}")
     
-        # Load excel file from S3 into memory and create file-like object from the bytes read
-    excel_data = obj['Body'].read()
-    excel_file = io.BytesIO(excel_data)
+        # On-disk cache, valid while the ETag matches
+    storage = get_storage()
+    cache   = get_cache_dir("iadb")
+    try: 
+        etag = storage.head(f"{path}/{file}")["etag"]
+    except Exception:
+        etag = None
+    
+    meta = cache / "iadb.json"
+    if not refresh and meta.exists() and (cache / "iadb.pkl").exists():
+        cached = json.loads(meta.read_text()).get("etag")
+        if etag is None or etag == cached:
+            _iadb["data"] = pd.read_pickle(cache / "iadb.pkl")
+            return _iadb["data"].copy()
+    
+        # Load excel file from storage into a seekable file-like object 
+    excel_file = storage.open(f"{path}/{file}", seekable = True)
     
         # Datafile
     data = pd.read_excel(excel_file, engine = 'openpyxl')
@@ -62,11 +80,75 @@ def get_iadb():
     data = data.sort_values(by = "isoalpha3")
     data = data.reset_index(drop = True)
     
-    return data
+    # Update caches
+    data.to_pickle(cache / "iadb.pkl")
+    meta.write_text(json.dumps({"etag": etag}))
+    _iadb["data"] = data
+    _iadb.pop("lookup", None)
+    
+    return data.copy()
+
+class IadbLookup:
+    """
+    preloaded IADB country names with O(1) lookups (isoalpha3 <-> names)
+    
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        dataframe with IADB country names (EN/SP) and isoalpha3 codes
+    """
+    
+    def __init__(self, data):
+        self.codes    = data.isoalpha3.tolist()
+        self._name_es = dict(zip(data.isoalpha3, data.country_name_es))
+        self._name_en = dict(zip(data.isoalpha3, data.country_name_en))
+        
+        # Names (EN/SP) normalized to isoalpha3
+        self._code = {}
+        for col in ["country_name_es", "country_name_en"]:
+            self._code.update({normalize_text(name): code for name, code in zip(data[col], data.isoalpha3)})
+    
+    def __contains__(self, code):
+        return code in self._name_es
+    
+    def name_es(self, code):
+        """spanish country name for isoalpha3 code"""
+        return self._name_es[code]
+    
+    def name_en(self, code):
+        """english country name for isoalpha3 code"""
+        return self._name_en[code]
+    
+    def code(self, name):
+        """isoalpha3 code for a country name (EN/SP), None if not found"""
+        return self._code.get(normalize_text(name))
+
+def get_iadb_lookup():
+    """
+    get the memoized IADB country lookup
+    hot loops should use this object instead of calling `get_iadb`
+    
+    Parameters
+    ----------
+    None
+    
+    Returns
+    ----------
+    IadbLookup
+        lookup object with IADB country names (EN/SP) and isoalpha3 codes
+    """
+    
+    if "lookup" not in _iadb:
+        _iadb["lookup"] = IadbLookup(get_iadb())
+    
+    return _iadb["lookup"]
 
-def get_country_shp(code = "", level = 0):
+def get_country_shp(code = "", level = 0, resolution = "full"):
     """
     get the country's shapefile at the selected admin level 
+    layers are cached locally (GeoParquet) and in memory, see `get_boundaries`
+    geometries are repaired, coarser resolutions are simplified keeping 
+    shared edges (e.g. `coarse` for rendering and bbox prefiltering)
     
     Parameters
     ----------
@@ -74,6 +156,12 @@ def get_country_shp(code = "", level = 0):
         country's isoalpha3 code
     level: int, optional 
         administrative level (default is 0)
+    resolution : str, optional
+        boundary resolution (default is `full`), including:
+            full  : all vertices
+            fine  : ~100m tolerance
+            medium: ~500m tolerance
+            coarse: ~2km tolerance
     
     Returns
     ----------
@@ -81,24 +169,4 @@ def get_country_shp(code = "", level = 0):
         geo pandas dataframe with geo data at determined admin level (default 0)
     """
     
-    # Import data
-    if code == "":
-        file = f"Geospatial Basemaps/Cartographic Boundary Files/LAC-26/region/level-{level}/lac-level-{level}.shp"
-    else:
-        code = code.lower()
-        file = f"Geospatial Basemaps/Cartographic Boundary Files/LAC-26/level-{level}/{code}-level-{level}.shp"
-    
-    # Import data
-    path = scldatalake + file
-    shp  = gpd.read_file(path) 
-    
-    # Adjust country codes 
-    shp.ADM0_PCODE = shp.ADM0_PCODE.replace({'BZ':'BLZ','BO':'BOL','BR':'BRA','BB':'BRB',
-                                             'CL':'CHL','CO':'COL','CR':'CRI','DO':'DOM',
-                                             'EC':'ECU','GT':'GTM','GY':'GUY','HN':'HND',
-                                             'HT':'HTI','MX':'MEX','NI':'NIC','PA':'PAN',
-                                             'PE':'PER','PY':'PRY','SV':'SLV','SR':'SUR',
-                                             'TT':'TTO','UY':'URY','VE':'VEN'})
-    
-    return shp
-            
\ No newline at end of file
+    return get_boundaries().get(code, level, resolution)
\ No newline at end of file
@@ -0,0 +1,393 @@
+import os
+import pickle
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow.parquet as pq
+import shapely
+from shapely import STRtree
+from shapely.geometry import MultiPolygon
+
+from .general import get_cache_dir
+from .storage import get_storage
+
+# ADM0_PCODE adjustments (isoalpha2 to isoalpha3)
+ADM0_PCODE = {'BZ':'BLZ','BO':'BOL','BR':'BRA','BB':'BRB',
+              'CL':'CHL','CO':'COL','CR':'CRI','DO':'DOM',
+              'EC':'ECU','GT':'GTM','GY':'GUY','HN':'HND',
+              'HT':'HTI','MX':'MEX','NI':'NIC','PA':'PAN',
+              'PE':'PER','PY':'PRY','SV':'SLV','SR':'SUR',
+              'TT':'TTO','UY':'URY','VE':'VEN'}
+
+# Countries without admin-2 boundaries (admin-1 units are used as admin-2 units)
+NO_ADM2 = ["BHS","BRB","BLZ","JAM","TTO"]
+
+# Simplification tolerance (degrees) by resolution
+# Note: `full` keeps every vertex, use it for exact point tests near edges
+RESOLUTIONS = {"full"  : 0,
+               "fine"  : 0.001,
+               "medium": 0.005,
+               "coarse": 0.02}
+
+def read_country_shp(code = "", level = 0):
+    """
+    reads the country's shapefile at the selected admin level from the Data Lake
+
+    Parameters
+    ----------
+    code : str, optional
+        country's isoalpha3 code (default is the LAC-26 region)
+    level: int, optional
+        administrative level (default is 0)
+
+    Returns
+    ----------
+    geopandas.GeoDataFrame
+        geo pandas dataframe with geo data at determined admin level
+    """
+
+    # Import data
+    if code == "":
+        file = f"Geospatial Basemaps/Cartographic Boundary Files/LAC-26/region/level-{level}/lac-level-{level}.shp"
+    else:
+        code = code.lower()
+        file = f"Geospatial Basemaps/Cartographic Boundary Files/LAC-26/level-{level}/{code}-level-{level}.shp"
+
+    # Import data
+    path = get_storage().uri(file)
+    shp  = gpd.read_file(path)
+
+    # Adjust country codes
+    shp.ADM0_PCODE = shp.ADM0_PCODE.replace(ADM0_PCODE)
+
+    return shp
+
+def prepare_boundaries(shp, tolerance = 0):
+    """
+    repairs invalid geometries and simplifies the boundaries
+    simplification preserves the shared edges between admin units
+    (coverage simplification), no gaps or overlaps are introduced
+
+    Parameters
+    ----------
+    shp : geopandas.GeoDataFrame
+        admin boundaries
+    tolerance : float, optional
+        simplification tolerance in CRS units (default is 0, no simplification)
+
+    Returns
+    ----------
+    geopandas.GeoDataFrame
+        geo pandas dataframe with repaired (and simplified) geometries
+    """
+
+    shp   = shp.copy()
+    geoms = np.asarray(shp.geometry.values)
+
+    # Repair invalid geometries, keep polygonal parts only
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        repaired = shapely.make_valid(geoms[invalid])
+        repaired = [_polygonal(geom) for geom in repaired]
+        geoms    = geoms.copy()
+        geoms[invalid] = repaired
+
+    # Simplify keeping topology between neighbours
+    if tolerance > 0:
+        if hasattr(shapely, "coverage_simplify"):
+            geoms = shapely.coverage_simplify(geoms, tolerance)
+        else:
+            geoms = shapely.simplify(geoms, tolerance, preserve_topology = True)
+
+    shp = shp.set_geometry(gpd.GeoSeries(geoms, index = shp.index, crs = shp.crs))
+
+    return shp
+
+def _polygonal(geom):
+    # Polygons from geometry collections returned by `make_valid`
+    if geom.geom_type in ["Polygon", "MultiPolygon"]:
+        return geom
+    parts = [part for part in shapely.get_parts(geom) if part.geom_type in ["Polygon", "MultiPolygon"]]
+    parts = [poly for part in parts for poly in shapely.get_parts(part)]
+
+    return MultiPolygon(parts) if len(parts) > 1 else (parts[0] if parts else geom)
+
+class BoundaryRepository:
+    """
+    admin boundaries cache
+    each (code, level, resolution) layer is stored locally as GeoParquet and 
+    kept in an in-memory LRU together with its spatial index (STRtree), 
+    country layers are served from the region layer when it is already cached
+    geometries are repaired, and simplified for resolutions other than `full`
+    spatial indexes of stored layers are persisted next to them and reused by
+    new processes (the layer geometries are restored from the index); local
+    files are kept per storage backend (see `get_storage`)
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        number of layers kept in memory (default is 8)
+    """
+
+    def __init__(self, maxsize = 8):
+        self.maxsize = maxsize
+        self._layers = OrderedDict()
+
+    def _key(self, code, level, resolution):
+        return (code.upper(), int(level), resolution)
+
+    def _folder(self):
+        # Local files of the active storage backend
+        backend = hashlib.md5((get_storage().name or "memory").encode()).hexdigest()[:12]
+        return get_cache_dir("boundaries", backend)
+
+    def _path(self, code, level, resolution):
+        name = code.lower() if code else "lac"
+        return self._folder() / f"{name}-level-{level}-{resolution}.parquet"
+
+    def _tree_path(self, path):
+        return path.with_name(f"{path.stem}.strtree.pkl")
+
+    def _store(self, path, shp):
+        # Layer as GeoParquet and its spatial index, written atomically
+        tree = STRtree(np.asarray(shp.geometry.values))
+        for file, write in [(path, lambda tmp : shp.to_parquet(tmp)),
+                            (self._tree_path(path), lambda tmp : tmp.write_bytes(pickle.dumps({"crs": shp.crs, "geometry": shp.geometry.name, "tree": tree})))]:
+            tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+            write(tmp)
+            os.replace(tmp, file)
+
+        return tree
+
+    def _read(self, path):
+        # Stored layer, geometries come from the persisted index when it is up to date
+        # Note: unpickling the index is faster than decoding the GeoParquet geometries
+        index = self._tree_path(path)
+        if index.exists() and index.stat().st_mtime >= path.stat().st_mtime:
+            index   = pickle.loads(index.read_bytes())
+            columns = pq.read_schema(path).names
+            attrs   = pd.read_parquet(path, columns = [col for col in columns if col != index["geometry"]])
+            attrs[index["geometry"]] = gpd.GeoSeries(index["tree"].geometries, index = attrs.index, crs = index["crs"])
+            shp = gpd.GeoDataFrame(attrs[[col for col in columns if col in attrs.columns]], geometry = index["geometry"], crs = index["crs"])
+            return shp, index["tree"]
+
+        shp = gpd.read_parquet(path)
+        return shp, self._store(path, shp)
+
+    def _cache(self, key, shp, tree = None):
+        # Add layer to LRU, spatial index is built on first use (unless stored)
+        self._layers[key] = {"shp": shp, "tree": tree}
+        self._layers.move_to_end(key)
+        while len(self._layers) > self.maxsize:
+            self._layers.popitem(last = False)
+
+        return self._layers[key]
+
+    def _layer(self, code, level, resolution = "full"):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Resolution must be within {list(RESOLUTIONS)}")
+        key = self._key(code, level, resolution)
+
+        # In-memory layer
+        if key in self._layers:
+            self._layers.move_to_end(key)
+            return self._layers[key]
+
+        # Country subset from cached region layer
+        region = self._key("", level, resolution)
+        if code and (region in self._layers or self._path("", level, resolution).exists()):
+            shp = self._layer("", level, resolution)["shp"]
+            shp = shp[shp.ADM0_PCODE == code.upper()].reset_index(drop = True)
+            if len(shp) > 0:
+                return self._cache(key, shp)
+
+        # Local GeoParquet, simplified from full layer or Data Lake
+        path = self._path(code, level, resolution)
+        if path.exists():
+            shp, tree = self._read(path)
+        elif resolution != "full":
+            shp  = self._layer(code, level, "full")["shp"]
+            shp  = prepare_boundaries(shp, RESOLUTIONS[resolution])
+            tree = self._store(path, shp)
+        else:
+            shp  = read_country_shp(code, level)
+            shp  = prepare_boundaries(shp)
+            tree = self._store(path, shp)
+
+        return self._cache(key, shp, tree)
+
+    def get(self, code = "", level = 0, resolution = "full"):
+        """
+        gets the admin boundaries (copy, safe to modify)
+
+        Parameters
+        ----------
+        code : str, optional
+            country's isoalpha3 code (default is the LAC-26 region)
+        level: int, optional
+            administrative level (default is 0)
+        resolution : str, optional
+            boundary resolution (default is `full`), including:
+                full
+                fine
+                medium
+                coarse
+
+        Returns
+        ----------
+        geopandas.GeoDataFrame
+            geo pandas dataframe with geo data at determined admin level
+        """
+
+        return self._layer(code, level, resolution)["shp"].copy()
+
+    def tree(self, code = "", level = 0, resolution = "full"):
+        """
+        gets the layer's spatial index, built once and reused across calls
+        (and across processes for stored layers)
+
+        Parameters
+        ----------
+        code : str, optional
+            country's isoalpha3 code (default is the LAC-26 region)
+        level: int, optional
+            administrative level (default is 0)
+        resolution : str, optional
+            boundary resolution (default is `full`), including:
+                full
+                fine
+                medium
+                coarse
+
+        Returns
+        ----------
+        shapely.STRtree
+            spatial index with the layer geometries (same order as `get`)
+        """
+
+        layer = self._layer(code, level, resolution)
+        if layer["tree"] is None:
+            layer["tree"] = STRtree(layer["shp"].geometry.values)
+
+        return layer["tree"]
+
+    def units(self, code = "", resolution = "full"):
+        """
+        gets the admin-2 units and their spatial index, admin-1 units without
+        admin-2 boundaries (see `NO_ADM2`) use the admin-1 code as admin-2 code
+        the admin-2 layer is not read for countries without admin-2 boundaries
+
+        Parameters
+        ----------
+        code : str, optional
+            country's isoalpha3 code (default is the LAC-26 region)
+        resolution : str, optional
+            boundary resolution (default is `full`), including:
+                full
+                fine
+                medium
+                coarse
+
+        Returns
+        ----------
+        tuple
+            geo pandas dataframe with ADM0_PCODE, ADM1_PCODE, ADM2_PCODE and
+            geometry (copy, safe to modify), and its shapely.STRtree
+        """
+
+        # In-memory units
+        key = (code.upper(), "units", resolution)
+        if key in self._layers:
+            self._layers.move_to_end(key)
+            return self._layers[key]["shp"].copy(), self._layers[key]["tree"]
+
+        # Admin-2 layer, plus admin-1 units without children
+        columns = ["ADM0_PCODE","ADM1_PCODE","ADM2_PCODE","geometry"]
+        adm1    = self._layer(code, 1, resolution)["shp"]
+        adm2    = self._layer(code, 2, resolution)["shp"] if code.upper() not in NO_ADM2 else adm1.iloc[:0].assign(ADM2_PCODE = adm1.ADM1_PCODE.iloc[:0])
+        missing = adm1[~adm1.ADM1_PCODE.isin(adm2.ADM1_PCODE)]
+        if len(missing) == 0:
+            layer = self._cache(key, adm2[columns], self.tree(code, 2, resolution))
+        else:
+            shp   = pd.concat([adm2[columns], missing.assign(ADM2_PCODE = missing.ADM1_PCODE)[columns]], ignore_index = True)
+            layer = self._cache(key, shp, STRtree(np.asarray(shp.geometry.values)))
+
+        return layer["shp"].copy(), layer["tree"]
+
+    def sjoin(self, points, code = "", level = 0, predicate = "intersects", resolution = "full"):
+        """
+        spatial join of geometries against a layer using its cached index
+        equivalent to `gpd.sjoin(points, get_country_shp(code, level))`
+
+        Parameters
+        ----------
+        points : geopandas.GeoDataFrame
+            geometries to join (same CRS as the boundaries)
+        code : str, optional
+            country's isoalpha3 code (default is the LAC-26 region)
+        level: int, optional
+            administrative level (default is 0)
+        resolution : str, optional
+            boundary resolution (default is `full`), including:
+                full
+                fine
+                medium
+                coarse
+        predicate : str, optional
+            binary predicate (default is `intersects`)
+
+        Returns
+        ----------
+        geopandas.GeoDataFrame
+            input geometries with the attributes of the matching admin units
+        """
+
+        # Query cached index
+        shp      = self._layer(code, level, resolution)["shp"]
+        idx, jdx = self.tree(code, level, resolution).query(points.geometry.values, predicate = predicate)
+
+        # Join attributes
+        left  = points.iloc[idx]
+        right = shp.drop(columns = "geometry").iloc[jdx]
+        right = right.rename(columns = {col: f"{col}_right" for col in right.columns if col in left.columns})
+        right.index = left.index
+        data  = pd.concat([left, right], axis = 1)
+        data.insert(len(left.columns), "index_right", shp.index[jdx])
+
+        return gpd.GeoDataFrame(data, geometry = points.geometry.name, crs = points.crs)
+
+    def clear(self, disk = False):
+        """
+        clears the in-memory layers (and the local files of the active
+        storage backend if `disk`)
+        """
+
+        self._layers.clear()
+        if disk:
+            for path in [*self._folder().glob("*.parquet"), *self._folder().glob("*.strtree.pkl")]:
+                path.unlink()
+
+# Shared repository
+_repository = {}
+
+def get_boundaries():
+    """
+    gets the shared admin boundaries repository
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    ----------
+    BoundaryRepository
+        repository with cached admin boundaries and spatial indexes
+    """
+
+    if "default" not in _repository:
+        _repository["default"] = BoundaryRepository()
+
+    return _repository["default"]
@@ -0,0 +1,81 @@
+import os
+import threading
+
+# Shared clients, created on first use
+_clients = {}
+_lock    = threading.Lock()
+
+def get_env(name, default = None):
+    """
+    gets an environment variable, loading the `.env` file on first use
+
+    Parameters
+    ----------
+    name : str
+        variable name (e.g. `sclbucket`, `scldatalake`, `access_token_dp`)
+    default : str, optional
+        value if the variable is not defined
+
+    Returns
+    ----------
+    str
+        variable value
+    """
+
+    if "dotenv" not in _clients:
+        with _lock:
+            if "dotenv" not in _clients:
+                import dotenv
+                dotenv.load_dotenv()
+                _clients["dotenv"] = True
+
+    return os.environ.get(name, default)
+
+def get_s3(max_pool_connections = 32):
+    """
+    gets the shared S3 client (thread-safe, created on first use)
+    the connection pool is sized for concurrent reads
+
+    Parameters
+    ----------
+    max_pool_connections : int, optional
+        connection pool size, used when the client is created (default is 32)
+
+    Returns
+    ----------
+    botocore.client.S3
+        boto3 S3 client
+    """
+
+    if "s3" not in _clients:
+        with _lock:
+            if "s3" not in _clients:
+                import boto3
+                from botocore.config import Config
+                _clients["s3"] = boto3.client("s3", config = Config(max_pool_connections = max_pool_connections))
+
+    return _clients["s3"]
+
+def get_s3_bucket():
+    """
+    gets the shared S3 bucket resource for `sclbucket` (created on first use)
+    Note: boto3 resources are not thread-safe, use `get_s3` inside threads
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    ----------
+    boto3.resources.factory.s3.Bucket
+        boto3 S3 bucket resource
+    """
+
+    if "bucket" not in _clients:
+        bucket = get_env("sclbucket")
+        with _lock:
+            if "bucket" not in _clients:
+                import boto3
+                _clients["bucket"] = boto3.resource("s3").Bucket(bucket)
+
+    return _clients["bucket"]
@@ -1,3 +1,8 @@
+import os
+import sys
+import subprocess
+import unicodedata
+from pathlib import Path
 from datetime import datetime
 
 def quarter_start(year: int, q: int) -> datetime:
@@ -81,17 +86,80 @@ def find_best_match(data1, data2, priority_vars):
 
 def normalize_text(text):
     '''
-    normalize text
+    normalize text (accents removed, lower case)
 
     Parameters
     ----------
-    text : str
-        text without normalize
+    text : str or pandas.Series
+        text without normalize, series are normalized with vectorized string methods
 
     Returns
     -------
-    text : str
+    text : str or pandas.Series
         normalized text
     '''
     
-    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8').lower()
\ No newline at end of file
+    # Series of texts
+    if hasattr(text, "str"):
+        return text.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('utf-8').str.lower()
+
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8').lower()
+
+def get_cache_dir(*parts):
+    '''
+    gets (and creates) a local cache folder
+    the root folder is defined by the `sclcache` environment variable
+    (default is ~/.cache/geospatial_analytics_scl)
+
+    Parameters
+    ----------
+    *parts : str
+        sub-folders inside the cache root
+
+    Returns
+    -------
+    pathlib.Path
+        path to the cache folder
+    '''
+    
+    root = os.environ.get("sclcache", "~/.cache/geospatial_analytics_scl")
+    path = Path(root).expanduser().joinpath(*parts)
+    path.mkdir(parents = True, exist_ok = True)
+    
+    return path
+
+def check_import_time(module = "src", budget = 0.5, heavy = ("boto3","rasterio","fiona","geopandas","matplotlib","bs4","sodapy")):
+    '''
+    measures the import time of a module in a fresh interpreter 
+    raises an error if it exceeds the budget or loads heavy libraries
+
+    Parameters
+    ----------
+    module : str, optional
+        module to import (default is `src`)
+    budget : float, optional
+        maximum import time in seconds (default is 0.5)
+    heavy : tuple, optional
+        libraries that must not be imported 
+
+    Returns
+    -------
+    float
+        import time in seconds
+    '''
+    
+    # Import module in a new process
+    code   = (f"import sys, time; t = time.perf_counter(); import {module}; "
+              f"print(time.perf_counter() - t); print(','.join(m for m in {list(heavy)} if m in sys.modules))")
+    out    = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True)
+    lines  = out.stdout.splitlines()
+    secs   = float(lines[0])
+    loaded = lines[1] if len(lines) > 1 else ""
+    
+    # Check budget
+    if loaded:
+        raise RuntimeError(f"Importing {module} loads {loaded}")
+    if secs > budget:
+        raise RuntimeError(f"Importing {module} takes {secs:.3f}s (budget is {budget}s)")
+    
+    return secs
\ No newline at end of file
@@ -1,70 +1,193 @@
-# Standard 
+# Standard
+import os
+import hashlib
+import threading
+from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Data management and processing
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 
-# Geospatial 
+# Geospatial
+import pyogrio
 import rasterio
+from pyogrio.errors import DataSourceError, DataLayerError
+from rasterio.errors import RasterioIOError
+from pyproj import CRS, Transformer
 
-def get_metadata(file_path):
+from .general import get_cache_dir
+from .storage import get_storage
+
+# Metadata elements (same order as `metadata-sample.csv`)
+ELEMENTS = ["Title", "Summary", "Description", "Tags", "Category", "Credits", "Date of creation",
+            "Date of last update", "Responsible party", "Coordinate system", "Geographic extent",
+            "Lineage", "Attribute information", "Feature types", "Resolution", "Update frequency",
+            "Usage information", "Metadata date", "Metadata contact"]
+
+# Elements read from the file headers (never taken from the defaults)
+EXTRACTED = ["Title", "Coordinate system", "Geographic extent", "Attribute information", "Feature types", "Resolution"]
+
+# Supported formats
+VECTOR = ('.shp', '.geojson', '.gpkg', '.fgb', '.kml', '.zip')
+RASTER = ('.tif', '.tiff', '.asc', '.nc')
+
+def read_defaults(file_path):
+    '''
+    reads the descriptive metadata defaults (e.g. summary, credits, contacts)
+
+    Parameters
+    ----------
+    file_path : str
+        CSV file shaped like `metadata-sample.csv` (Element, Description and Value columns)
+
+    Returns
+    -------
+    dict
+        dictionary with element and value (empty values are skipped)
+    '''
+
+    defaults = pd.read_csv(file_path, dtype = str)
+    defaults = defaults.dropna(subset = ["Value"])
+
+    return dict(zip(defaults.Element.str.strip(), defaults.Value.str.strip()))
+
+def _gdal_path(path):
+    # GDAL virtual file systems for remote and zipped files
+    if path.startswith("http"):
+        path = f"/vsicurl/{path}"
+    if path.endswith(".zip"):
+        path = f"/vsizip/{path}"
+
+    return path
+
+def _extent(crs, bounds):
+    # Bounds in geographic coordinates (EPSG:4326) when the coordinate system is known
+    if bounds is None or np.any(np.isnan(bounds)):
+        return None, "Unknown"
+    if crs is not None:
+        bounds = Transformer.from_crs(crs, "EPSG:4326", always_xy = True).transform_bounds(*bounds)
+    minx, miny, maxx, maxy = bounds
+
+    return tuple(bounds), f"Lat: {miny} to {maxy}, Lon: {minx} to {maxx}"
+
+def _vector_headers(path, layer = None, force_bounds = False):
+    # Header of every layer (or a single layer), no features are read
+    layers  = [layer] if layer is not None else pyogrio.list_layers(path)[:, 0].tolist()
+    headers = []
+    for layer_ in layers:
+        info   = pyogrio.read_info(path, layer = layer_, force_total_bounds = force_bounds)
+        crs    = CRS.from_user_input(info["crs"]) if info["crs"] else None
+        bounds, extent = _extent(crs, info["total_bounds"])
+        fields = [f"{name}: {dtype}" for name, dtype in zip(info["fields"], info["dtypes"])]
+        if info["geometry_type"] is not None:
+            fields.append("geometry: geometry")
+
+        headers.append({"layer"                : layer_,
+                        "format"               : info["driver"],
+                        "features"             : info["features"] if info["features"] >= 0 else None,
+                        "bounds"               : bounds,
+                        "Coordinate system"    : crs.to_string() if crs else "Unknown",
+                        "Geographic extent"    : extent,
+                        "Attribute information": ", ".join(fields),
+                        "Feature types"        : info["geometry_type"]})
+
+    return headers
+
+def _raster_headers(path):
+    # Raster profile (no pixels are read)
+    with rasterio.open(path) as src:
+        crs    = CRS.from_user_input(src.crs.to_wkt()) if src.crs else None
+        bounds, extent = _extent(crs, tuple(src.bounds))
+
+        return [{"layer"                : None,
+                 "format"               : src.driver,
+                 "features"             : None,
+                 "bounds"               : bounds,
+                 "Coordinate system"    : src.crs.to_string() if src.crs else "Unknown",
+                 "Geographic extent"    : extent,
+                 "Resolution"           : f"{src.res[0]} x {src.res[1]}",
+                 "Attribute information": f"Bands: {src.count}, Data Type: {src.dtypes[0]}"}]
+
+def extract_metadata(file_path, defaults = None, layer = None, force_bounds = False, last_modified = None):
+    '''
+    extracts the metadata of a geospatial file without user input
+    only the layer headers (vector) or the raster profile are read, descriptive
+    elements come from the defaults; multi-layer files (e.g. GeoPackage) get
+    one record per layer
+
+    Parameters
+    ----------
+    file_path : str
+        path or URL to the geospatial file (shapefile, GeoJSON, GeoPackage, raster, etc.)
+    defaults : dict or str, optional
+        default values by element or defaults file (see `read_defaults`, default is None)
+    layer : str, optional
+        vector layer (default is every layer)
+    force_bounds : bool, optional
+        scan the features of vector formats without bounds in their header,
+        e.g. GeoJSON (default is False, the extent is `Unknown`)
+    last_modified : str, optional
+        date of last update, e.g. the object modification time (default is today)
+
+    Returns
+    -------
+    list
+        list of dictionaries with the metadata elements, plus layer, format,
+        features (number of features, if known) and bounds (EPSG:4326)
     '''
-    extract metadata from a geospatial file 
+
+    if isinstance(defaults, (str, Path)):
+        defaults = read_defaults(defaults)
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    # Headers based on file type
+    path = _gdal_path(str(file_path))
+    if str(file_path).lower().endswith(VECTOR):
+        headers = _vector_headers(path, layer, force_bounds)
+    elif str(file_path).lower().endswith(RASTER):
+        headers = _raster_headers(path)
+    else:
+        raise ValueError(f"Format must be within {list(VECTOR + RASTER)}")
+
+    # Metadata: file headers, then defaults
+    title   = os.path.splitext(os.path.basename(str(file_path)))[0]
+    records = []
+    for header in headers:
+        metadata = {element: (defaults or {}).get(element) if element not in EXTRACTED else None for element in ELEMENTS}
+        metadata["Date of creation"]    = metadata["Date of creation"] or today
+        metadata["Date of last update"] = (last_modified or today)[:10]
+        metadata["Metadata date"]       = today
+        metadata["Title"]               = title if header["layer"] in (None, title) else f"{title} ({header['layer']})"
+        metadata.update({element: header[element] for element in EXTRACTED if element in header})
+        records.append(dict(metadata, **{key: header[key] for key in ["layer", "format", "features", "bounds"]}))
+
+    return records
+
+def get_metadata(file_path, defaults = None, interactive = True):
+    '''
+    extract metadata from a geospatial file (header only, see `extract_metadata`)
     prompt the user for missing information
-    
+
     Parameters
     ----------
     file_path : str
         path to the geospatial file (shapefile, GeoJSON, raster, etc.)
-    
+    defaults : dict or str, optional
+        default values by element or defaults file (see `read_defaults`, default is None)
+    interactive : bool, optional
+        prompt the user for the elements missing from the defaults (default is True)
+
     Returns
     -------
     metadata_df : pandas.DataFrame
-        dataframe containing the metadata for the geospatial file
+        dataframe containing the metadata for the geospatial file (first layer)
         this includes manual inputs from user
     '''
-    
-    # Placeholder for metadata
-    metadata = {
-        "Title"                : file_path.split('/')[-1].split('.')[0],  # Use the file name without extension
-        "Summary"              : None,
-        "Description"          : None,
-        "Tags"                 : None,
-        "Category"             : None,
-        "Credits"              : None,
-        "Date of creation"     : datetime.now().strftime("%Y-%m-%d"),
-        "Date of last update"  : datetime.now().strftime("%Y-%m-%d"),
-        "Responsible party"    : None,
-        "Coordinate system"    : None,
-        "Geographic extent"    : None,
-        "Lineage"              : None,
-        "Attribute information": None,
-        "Feature types"        : None,
-        "Resolution"           : None,
-        "Update frequency"     : None,
-        "Usage information"    : None,
-        "Metadata date"        : datetime.now().strftime("%Y-%m-%d"),
-        "Metadata contact"     : None
-    }
-    
-    # Extract metadata based on file type
-    if file_path.endswith(('.shp', '.geojson')):
-        # Handle vector data
-        gdf = gpd.read_file(file_path)
-        metadata["Coordinate system"]     = gdf.crs.to_string() if gdf.crs else "Unknown"
-        metadata["Geographic extent"]     = f"Lat: {gdf.total_bounds[1]} to {gdf.total_bounds[3]}, Lon: {gdf.total_bounds[0]} to {gdf.total_bounds[2]}"
-        metadata["Attribute information"] = ", ".join([f"{col}: {dtype}" for col, dtype in gdf.dtypes.items()])
-        metadata["Feature types"]         = ", ".join(gdf.geometry.type.unique())
-        
-    elif file_path.endswith(('.tif', '.tiff', '.asc', '.nc')):
-        # Handle raster data
-        with rasterio.open(file_path) as src:
-            metadata["Coordinate system"]     = src.crs.to_string() if src.crs else "Unknown"
-            metadata["Geographic extent"]     = f"Lat: {src.bounds.bottom} to {src.bounds.top}, Lon: {src.bounds.left} to {src.bounds.right}"
-            metadata["Resolution"]            = f"{src.res[0]} x {src.res[1]}"
-            metadata["Attribute information"] = f"Bands: {src.count}, Data Type: {src.dtypes[0]}"
-    
+
+    metadata = {element: value for element, value in extract_metadata(file_path, defaults)[0].items() if element in ELEMENTS}
+
     # Prompt user for missing metadata
     descriptions = {
         "Summary"          : "Enter a one-line summary of the data layer: ",
@@ -78,12 +201,105 @@ def get_metadata(file_path):
         "Usage information": "Enter information about layer format, accessibility, and usage constraints: ",
         "Metadata contact" : "Enter the contact information of the person responsible for the metadata: "
     }
-    
-    for key, prompt in descriptions.items():
-        if metadata[key] is None:
-            metadata[key] = input(prompt)
+
+    if interactive:
+        for key, prompt in descriptions.items():
+            if metadata[key] is None:
+                metadata[key] = input(prompt)
 
     # Create a DataFrame
     metadata_df = pd.DataFrame(list(metadata.items()), columns=["Element", "Value"])
 
-    return metadata_df
\ No newline at end of file
+    return metadata_df
+
+def _catalog_object(storage, obj, defaults, force_bounds):
+    # Catalog records of one object (a single record with the error if it can't be read)
+    base = {"key": obj["key"], "etag": obj["etag"], "size": obj["size"], "error": None}
+    try:
+        records = extract_metadata(storage.uri(obj["key"]), defaults, force_bounds = force_bounds,
+                                   last_modified = obj["last_modified"])
+    except (DataSourceError, DataLayerError, RasterioIOError, ValueError, OSError) as error:
+        print(f"{obj['key']}: skipped ({error})")
+        return [dict(base, error = str(error))]
+
+    # Bounds as columns
+    for record in records:
+        bounds = record.pop("bounds")
+        record.update(zip(["minx","miny","maxx","maxy"], bounds if bounds is not None else [np.nan] * 4))
+
+    return [dict(base, **record) for record in records]
+
+def catalog_metadata(prefixes, defaults = None, force_bounds = False, force = False, max_workers = 16, ttl = 3600, path = None):
+    '''
+    catalogs the geospatial layers under Data Lake prefixes without user input
+    objects are discovered from the cached prefix listings (see `Storage.list_cached`)
+    and their headers are read concurrently (see `extract_metadata`); the
+    catalog is stored locally and only objects whose fingerprint changed
+    (ETag or size) are read again
+
+    Parameters
+    ----------
+    prefixes : list
+        key prefixes (e.g. `Geospatial infrastructure/`)
+    defaults : dict or str, optional
+        default values by element or defaults file (see `read_defaults`, default is None)
+    force_bounds : bool, optional
+        scan the features of vector formats without bounds in their header (default is False)
+    force : bool, optional
+        read every object and list the prefixes again (default is False)
+    max_workers : int, optional
+        number of concurrent reads (default is 16)
+    ttl : float, optional
+        maximum age of the prefix listings in seconds (default is 3600)
+    path : str, optional
+        catalog file, shared by every prefix of the storage backend (default
+        is `metadata/catalog-<backend>.parquet` in the cache folder)
+
+    Returns
+    -------
+    pandas.DataFrame
+        catalog with one row per layer (under the prefixes), including key,
+        etag, size, layer, format, features, bounds (minx, miny, maxx, maxy in
+        EPSG:4326), error (if the object could not be read) and the metadata elements
+    '''
+
+    if isinstance(defaults, (str, Path)):
+        defaults = read_defaults(defaults)
+    storage  = get_storage()
+    prefixes = [prefixes] if isinstance(prefixes, str) else list(prefixes)
+    backend  = hashlib.md5((storage.name or "memory").encode()).hexdigest()[:12]
+    path     = Path(path) if path is not None else get_cache_dir("metadata") / f"catalog-{backend}.parquet"
+
+    # Geospatial objects (shapefile sidecars are read with their .shp)
+    objects = []
+    for prefix in prefixes:
+        if force:
+            storage.invalidate(prefix)
+        objects.extend(obj for obj in storage.list_cached(prefix, ttl) if obj["key"].lower().endswith(VECTOR + RASTER))
+    objects = list({obj["key"]: obj for obj in objects}.values())
+
+    # Unchanged objects are kept from the stored catalog (and every object outside the prefixes)
+    stored = pd.read_parquet(path) if path.exists() else pd.DataFrame(columns = ["key","etag","size"])
+    inside = np.array([key.startswith(tuple(prefixes)) for key in stored.key], dtype = bool)
+    known  = set() if force else set(zip(stored.key[inside], stored.etag[inside], stored["size"][inside]))
+    read   = [obj for obj in objects if (obj["key"], obj["etag"], obj["size"]) not in known]
+    keep   = pd.Index([obj["key"] for obj in objects if obj not in read], dtype = object)
+    stored = stored[~inside | pd.Index(stored.key, dtype = object).isin(keep)]
+
+    # Headers
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        records = [record for records in pool.map(lambda obj : _catalog_object(storage, obj, defaults, force_bounds), read) for record in records]
+
+    data = pd.DataFrame(records, columns = ["key","etag","size","layer","format","features","minx","miny","maxx","maxy","error"] + ELEMENTS)
+    data = pd.concat([stored, data], ignore_index = True) if len(stored) > 0 else data
+    data = data.sort_values(["key","layer"], na_position = "first").reset_index(drop = True)
+
+    # Stored atomically (readers never see a partial file)
+    temp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    data.to_parquet(temp, index = False)
+    os.replace(temp, path)
+
+    data = data[[key.startswith(tuple(prefixes)) for key in data.key]].reset_index(drop = True)
+    print(f"{len(read)} of {len(objects)} objects read, {len(data)} layers")
+
+    return data
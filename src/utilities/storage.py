@@ -0,0 +1,374 @@
+import io
+import os
+import json
+import time
+import shutil
+import tempfile
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from .clients import get_env, get_s3
+from .general import get_cache_dir
+
+class Storage(ABC):
+    """
+    storage backend for the Data Lake
+    keys are relative to the Data Lake root (e.g. `Geospatial infrastructure/...`)
+    """
+
+    # Backend identity for shared listing manifests (None disables them)
+    name = None
+
+    @abstractmethod
+    def open(self, key, seekable = False):
+        """
+        opens an object for streamed reading
+
+        Parameters
+        ----------
+        key : str
+            object key
+        seekable : bool, optional
+            return a seekable file (spooled to disk for large objects),
+            required by readers such as `pd.read_excel` (default is False)
+
+        Returns
+        ----------
+        file-like
+            binary file-like object
+        """
+
+        raise NotImplementedError
+
+    def read(self, key):
+        """reads the whole object as bytes"""
+        with self.open(key) as file:
+            return file.read()
+
+    @abstractmethod
+    def write(self, key, data):
+        """writes bytes to an object"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def head(self, key):
+        """
+        gets the object fingerprint
+
+        Returns
+        ----------
+        dict
+            dictionary with key, etag, size and last_modified
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, prefix):
+        """
+        lists objects under a prefix
+
+        Returns
+        ----------
+        list
+            list of dictionaries with key, etag, size and last_modified
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def uri(self, key):
+        """
+        gets a path or URL readable by pandas/GDAL (e.g. shapefiles with sidecar files)
+        """
+
+        raise NotImplementedError
+
+    def _manifests(self):
+        # Listing manifests of the backend
+        if self.name is None:
+            return []
+        backend = hashlib.md5(self.name.encode()).hexdigest()[:12]
+
+        return list(get_cache_dir("listings").glob(f"{backend}-*.json"))
+
+    def _manifest(self, prefix):
+        # Listing manifest path for a prefix
+        backend = hashlib.md5(self.name.encode()).hexdigest()[:12]
+
+        return get_cache_dir("listings") / f"{backend}-{hashlib.md5(prefix.encode()).hexdigest()}.json"
+
+    def list_cached(self, prefix, ttl = 3600):
+        """
+        lists objects under a prefix from a local manifest, the bucket is only
+        listed again after `ttl` seconds or an `invalidate` call
+        manifests are files in the cache folder, shared between processes
+
+        Parameters
+        ----------
+        prefix : str
+            key prefix
+        ttl : float, optional
+            manifest time to live in seconds (default is 3600)
+
+        Returns
+        ----------
+        list
+            list of dictionaries with key, etag, size and last_modified
+        """
+
+        if self.name is None:
+            return self.list(prefix)
+
+        # Valid manifest
+        path = self._manifest(prefix)
+        try:
+            manifest = json.loads(path.read_text())
+            if (manifest["prefix"] == prefix) and (time.time() - manifest["created"] < ttl):
+                return manifest["objects"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # List objects, manifest is replaced atomically (readers never see a partial file)
+        objects = self.list(prefix)
+        temp    = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        temp.write_text(json.dumps({"prefix": prefix, "created": time.time(), "objects": objects}))
+        os.replace(temp, path)
+
+        return objects
+
+    def invalidate(self, prefix = ""):
+        """
+        removes the listing manifests overlapping a prefix (all by default)
+
+        Parameters
+        ----------
+        prefix : str, optional
+            key prefix or object key (default is every prefix)
+
+        Returns
+        ----------
+        None
+        """
+
+        for path in self._manifests():
+            try:
+                prefix_ = json.loads(path.read_text())["prefix"]
+            except (OSError, ValueError, KeyError):
+                prefix_ = ""
+            if prefix.startswith(prefix_) or prefix_.startswith(prefix):
+                path.unlink(missing_ok = True)
+
+    def prefetch(self, keys, max_workers = 8):
+        """
+        reads several objects concurrently
+
+        Parameters
+        ----------
+        keys : list
+            object keys
+        max_workers : int, optional
+            number of concurrent reads (default is 8)
+
+        Returns
+        ----------
+        dict
+            dictionary with object key and bytes
+        """
+
+        keys = list(keys)
+        with ThreadPoolExecutor(max_workers = max_workers) as pool:
+            data = list(pool.map(self.read, keys))
+
+        return dict(zip(keys, data))
+
+def _spool(stream):
+    # Seekable copy of a stream, kept in memory up to 32MB
+    spool = tempfile.SpooledTemporaryFile(max_size = 32 * 2**20)
+    shutil.copyfileobj(stream, spool, 2**20)
+    spool.seek(0)
+
+    return spool
+
+class S3Storage(Storage):
+    """
+    S3 backend, uses the shared pooled client (thread-safe)
+
+    Parameters
+    ----------
+    bucket : str, optional
+        bucket name (default is `sclbucket`)
+    root : str, optional
+        URL prefix used by pandas/GDAL readers (default is `scldatalake`)
+    """
+
+    def __init__(self, bucket = None, root = None):
+        self.bucket = bucket or get_env("sclbucket")
+        self.root   = root   or get_env("scldatalake")
+        self.name   = f"s3://{self.bucket}"
+
+    def open(self, key, seekable = False):
+        body = get_s3().get_object(Bucket = self.bucket, Key = key)["Body"]
+        if seekable:
+            spool = _spool(body)
+            body.close()
+            return spool
+
+        return body
+
+    def write(self, key, data):
+        get_s3().put_object(Bucket = self.bucket, Key = key, Body = data)
+        self.invalidate(key)
+
+    def head(self, key):
+        obj = get_s3().head_object(Bucket = self.bucket, Key = key)
+
+        return {"key": key, "etag": obj["ETag"], "size": obj["ContentLength"], "last_modified": obj["LastModified"].isoformat()}
+
+    def list(self, prefix):
+        pages = get_s3().get_paginator("list_objects_v2").paginate(Bucket = self.bucket, Prefix = prefix)
+
+        return [{"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"], "last_modified": obj["LastModified"].isoformat()}
+                for page in pages for obj in page.get("Contents", [])]
+
+    def uri(self, key):
+        return f"{self.root}{key}"
+
+class LocalStorage(Storage):
+    """
+    local directory standing in for the bucket
+
+    Parameters
+    ----------
+    root : str
+        local folder with the same layout as the Data Lake
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.name = f"file://{self.root.resolve()}"
+
+    def _path(self, key):
+        return self.root / key
+
+    def open(self, key, seekable = False):
+        return open(self._path(key), "rb")
+
+    def write(self, key, data):
+        path = self._path(key)
+        path.parent.mkdir(parents = True, exist_ok = True)
+        path.write_bytes(data)
+        self.invalidate(key)
+
+    def head(self, key):
+        stat = self._path(key).stat()
+        etag = hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+
+        return {"key": key, "etag": etag, "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()}
+
+    def list(self, prefix):
+        # Only the folder of the prefix is walked (the prefix can end in a partial name)
+        folder = self.root / prefix.rsplit("/", 1)[0] if "/" in prefix else self.root
+        files  = [path for path in folder.rglob("*") if path.is_file()] if folder.is_dir() else []
+        keys   = sorted(path.relative_to(self.root).as_posix() for path in files)
+
+        return [self.head(key) for key in keys if key.startswith(prefix)]
+
+    def uri(self, key):
+        return str(self._path(key))
+
+class MemoryStorage(Storage):
+    """
+    in-memory backend (e.g. for tests)
+
+    Parameters
+    ----------
+    objects : dict, optional
+        dictionary with object key and bytes
+    """
+
+    def __init__(self, objects = None):
+        self.objects = dict(objects or {})
+        self._dir    = None
+        self._lock   = threading.Lock()
+
+    def open(self, key, seekable = False):
+        return io.BytesIO(self.objects[key])
+
+    def write(self, key, data):
+        with self._lock:
+            self.objects[key] = bytes(data)
+
+    def head(self, key):
+        data = self.objects[key]
+
+        return {"key": key, "etag": hashlib.md5(data).hexdigest(), "size": len(data), "last_modified": None}
+
+    def list(self, prefix):
+        return [self.head(key) for key in sorted(self.objects) if key.startswith(prefix)]
+
+    def uri(self, key):
+        # Materialize the object and its sidecar files (same stem) in a temporary folder
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix = "scl-storage-")
+
+        stem = os.path.splitext(key)[0]
+        for key_ in [key_ for key_ in self.objects if os.path.splitext(key_)[0] == stem]:
+            path = Path(self._dir) / key_
+            path.parent.mkdir(parents = True, exist_ok = True)
+            path.write_bytes(self.objects[key_])
+
+        return str(Path(self._dir) / key)
+
+# Active storage backend
+_storage = {}
+
+def get_storage():
+    """
+    gets the active storage backend
+    defined by the `sclstorage` environment variable, including:
+        s3            : Data Lake bucket (default)
+        local:<folder>: local folder with the Data Lake layout
+        memory        : in-memory objects
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    ----------
+    Storage
+        storage backend
+    """
+
+    if "default" not in _storage:
+        backend = get_env("sclstorage", "s3")
+        if backend.startswith("local:"):
+            _storage["default"] = LocalStorage(backend.split(":", 1)[1])
+        elif backend == "memory":
+            _storage["default"] = MemoryStorage()
+        else:
+            _storage["default"] = S3Storage()
+
+    return _storage["default"]
+
+def set_storage(storage):
+    """
+    sets the active storage backend (e.g. `LocalStorage` for tests)
+
+    Parameters
+    ----------
+    storage : Storage
+        storage backend
+
+    Returns
+    ----------
+    None
+    """
+
+    _storage["default"] = storage
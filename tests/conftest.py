@@ -0,0 +1,9 @@
+import pytest
+
+@pytest.fixture(autouse = True)
+def cache_dir(tmp_path, monkeypatch):
+    # Local cache (listing manifests, boundaries, tables) in a temporary folder
+    path = tmp_path / "cache"
+    monkeypatch.setenv("sclcache", str(path))
+
+    return path
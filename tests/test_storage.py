@@ -0,0 +1,129 @@
+import pytest
+
+from src.utilities.storage import Storage, LocalStorage, MemoryStorage
+
+OBJECTS = {"Geospatial infrastructure/Healthcare Facilities/official/COL.csv": b"id,name\n1,a\n",
+           "Geospatial infrastructure/Healthcare Facilities/official/JAM.csv": b"id,name\n2,b\n",
+           "Geospatial infrastructure/Healthcare Facilities/healthsites.csv"  : b"id,name\n3,c\n",
+           "Geospatial infrastructure/Financial Facilities/official/COL.csv"  : b"id,name\n4,d\n",
+           "Geospatial Basemaps/lac-level-0.shp"                              : b"shape"}
+
+@pytest.fixture(params = ["local", "memory"])
+def storage(request, tmp_path):
+    # Backend with the same objects
+    if request.param == "memory":
+        return MemoryStorage(OBJECTS)
+
+    storage = LocalStorage(tmp_path / "lake")
+    for key, data in OBJECTS.items():
+        storage.write(key, data)
+
+    return storage
+
+def keys(objects):
+    return [obj["key"] for obj in objects]
+
+def test_storage_is_abstract():
+    class Partial(Storage):
+        def open(self, key, seekable = False):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+@pytest.mark.parametrize("prefix", ["Geospatial infrastructure/Healthcare Facilities/official",
+                                    "Geospatial infrastructure/Healthcare Facilities/",
+                                    "Geospatial infrastructure/Health",
+                                    "Geospatial",
+                                    ""])
+def test_list_prefix(storage, prefix):
+    assert keys(storage.list(prefix)) == sorted(key for key in OBJECTS if key.startswith(prefix))
+
+def test_list_missing_prefix(storage):
+    assert storage.list("Geospatial infrastructure/Education Facilities/") == []
+
+def test_round_trip(storage):
+    key = "Geospatial infrastructure/Education Facilities/official/PER.csv"
+    storage.write(key, b"id,name\n5,e\n")
+
+    assert storage.read(key) == b"id,name\n5,e\n"
+    with storage.open(key, seekable = True) as file:
+        file.seek(3)
+        assert file.read() == b"name\n5,e\n"
+
+    head = storage.head(key)
+    assert head["key"] == key
+    assert head["size"] == len(b"id,name\n5,e\n")
+    assert head in storage.list("Geospatial infrastructure/Education Facilities")
+
+def test_head_changes_with_content(storage):
+    key    = "Geospatial infrastructure/Healthcare Facilities/official/COL.csv"
+    before = storage.head(key)
+    storage.write(key, b"id,name\n1,a\n6,f\n")
+
+    assert storage.head(key)["etag"] != before["etag"]
+    assert storage.head(key)["size"] == len(b"id,name\n1,a\n6,f\n")
+
+def test_uri_is_readable(storage):
+    key = "Geospatial Basemaps/lac-level-0.shp"
+
+    with open(storage.uri(key), "rb") as file:
+        assert file.read() == b"shape"
+
+def test_list_cached_ttl(tmp_path, cache_dir):
+    storage = LocalStorage(tmp_path / "lake")
+    prefix  = "Geospatial infrastructure/Healthcare Facilities"
+    for key, data in OBJECTS.items():
+        storage.write(key, data)
+    listed = storage.list_cached(prefix)
+
+    # Objects added behind the backend's back are not seen until the manifest expires
+    new = tmp_path / "lake" / prefix / "official" / "PER.csv"
+    new.write_bytes(b"id,name\n7,g\n")
+    assert storage.list_cached(prefix) == listed
+    assert len(list(cache_dir.joinpath("listings").glob("*.json"))) == 1
+    assert f"{prefix}/official/PER.csv" in keys(storage.list_cached(prefix, ttl = 0))
+
+def test_list_cached_shared(tmp_path):
+    # Manifests are shared between instances of the same backend
+    prefix = "Geospatial infrastructure/Healthcare Facilities"
+    first  = LocalStorage(tmp_path / "lake")
+    for key, data in OBJECTS.items():
+        first.write(key, data)
+    listed = first.list_cached(prefix)
+
+    (tmp_path / "lake" / prefix / "official" / "PER.csv").write_bytes(b"id,name\n7,g\n")
+    assert LocalStorage(tmp_path / "lake").list_cached(prefix) == listed
+
+def test_invalidate(tmp_path):
+    storage = LocalStorage(tmp_path / "lake")
+    prefix  = "Geospatial infrastructure/Healthcare Facilities"
+    other   = "Geospatial infrastructure/Financial Facilities"
+    for key, data in OBJECTS.items():
+        storage.write(key, data)
+    storage.list_cached(prefix)
+    storage.list_cached(other)
+
+    (tmp_path / "lake" / prefix / "official" / "PER.csv").write_bytes(b"id,name\n7,g\n")
+    (tmp_path / "lake" / other / "official" / "PER.csv").write_bytes(b"id,name\n8,h\n")
+    storage.invalidate(f"{prefix}/official/PER.csv")
+
+    assert f"{prefix}/official/PER.csv" in keys(storage.list_cached(prefix))
+    assert f"{other}/official/PER.csv" not in keys(storage.list_cached(other))
+
+def test_write_invalidates(tmp_path):
+    storage = LocalStorage(tmp_path / "lake")
+    prefix  = "Geospatial infrastructure/Healthcare Facilities"
+    storage.list_cached(prefix)
+    storage.write(f"{prefix}/official/PER.csv", b"id,name\n7,g\n")
+
+    assert keys(storage.list_cached(prefix)) == [f"{prefix}/official/PER.csv"]
+
+def test_memory_list_cached():
+    # Backends without a name are listed on every call
+    storage = MemoryStorage(OBJECTS)
+    prefix  = "Geospatial infrastructure/Healthcare Facilities"
+    storage.list_cached(prefix)
+    storage.write(f"{prefix}/official/PER.csv", b"id,name\n7,g\n")
+
+    assert f"{prefix}/official/PER.csv" in keys(storage.list_cached(prefix))